@@ -0,0 +1,69 @@
+"""
+Constitutive models of reinforcement and concrete
+All functions accept strains of arbitrary shape (e.g. rebar layers, strain steps or batches of sections) and are
+evaluated with whole-array operations
+Units follow MomentCurvatureRC, i.e. stresses in MPa
+"""
+import numpy as np
+
+
+def steel_stress(eps, fy, young_mod_s, k_hard=1.0, eps_sh=0.008, eps_uk=0.075):
+    """
+    Stress of reinforcement, elastic-perfectly plastic up to the onset of hardening, followed by a square-root
+    hardening branch up to the ultimate strain. Beyond the ultimate strain, the hardening branch is mirrored back down
+    to the yield strength, which is an approximation kept for calculation purposes only. Further on, stresses are
+    undefined (NaN)
+    :param eps: float or ndarray            Strains (+ for tension)
+    :param fy: float                        Yield strength
+    :param young_mod_s: float               Young modulus
+    :param k_hard: float                    Hardening slope of reinforcement (i.e. fu/fy)
+    :param eps_sh: float                    Strain at the onset of hardening
+    :param eps_uk: float                    Ultimate strain
+    :return: float or ndarray               Stresses of the shape of eps
+    """
+    eps = np.asarray(eps, dtype=float)
+    fu = k_hard * fy
+
+    # Elastic-perfectly plastic response
+    stress = np.minimum(np.maximum(young_mod_s * eps, -fy), fy)
+    strain = np.abs(eps)
+    if fu == fy and not (strain > eps_uk).any():
+        return stress if stress.ndim else float(stress)
+
+    # Position along the hardening branch
+    with np.errstate(invalid="ignore"):
+        hardening = np.sqrt(np.where(strain <= eps_uk, (strain - eps_sh) / (eps_uk - eps_sh),
+                                     (strain - 2 * (eps_uk - eps_sh)) / (eps_uk - 2 * (eps_uk - eps_sh))))
+    stress = np.where(strain <= eps_sh, stress, np.sign(eps) * (fy + (fu - fy) * hardening))
+    return stress if stress.ndim else float(stress)
+
+
+def stress_block(epsc, epsc_prime):
+    """
+    Parameters of the equivalent rectangular stress block of the parabolic concrete law, the strain ratio is capped at
+    2, i.e. the crushing strain
+    :param epsc: float or ndarray           Strains at the top concrete fiber
+    :param epsc_prime: float                Concrete strain at peak compressive strength
+    :return: float or ndarray, float or ndarray     Block parameters a1*b1 and b1
+    """
+    ratio = np.minimum(np.asarray(epsc, dtype=float) / epsc_prime, 2.)
+    b1 = (4 - ratio) / (6 - 2 * ratio)
+    a1b1 = ratio - 1 / 3 * ratio ** 2
+    if b1.ndim:
+        return a1b1, b1
+    return float(a1b1), float(b1)
+
+
+def concrete_stress(epsc, fc_prime):
+    """
+    Stress of concrete in compression, following Collins and Mitchell (Popovics curve with Thorenfeldt decay)
+    :param epsc: float or ndarray           Compressive strains (+ for compression)
+    :param fc_prime: float                  Concrete compressive strength
+    :return: float or ndarray, float        Compressive stresses and concrete strain at peak compressive strength
+    """
+    young_modulus_rc = (3320 * np.sqrt(fc_prime) + 6900)
+    n = .8 + fc_prime / 17
+    k_parameter = 0.67 + fc_prime / 62
+    epsc_prime = fc_prime / young_modulus_rc * n / (n - 1)
+    sigma_c = fc_prime * n * epsc / epsc_prime / (n - 1 + np.power(epsc / epsc_prime, n * k_parameter))
+    return sigma_c, epsc_prime
@@ -2,18 +2,25 @@
 defines detailing conditions (code-based) for element design
 The detailing phase comes as a phase before an iteration where the SPO curve needs to be updated
 """
+import copy
+
 import numpy as np
 from scipy import optimize
 import pandas as pd
 
 from analysis.momentcurvaturerc import MomentCurvatureRC
 from analysis.plasticity import Plasticity
+from utils.profiler import counted
+
+# Calls are counted when profiling
+fsolve = counted(optimize.fsolve, "fsolve")
 
 
 class Detailing:
     def __init__(self, demands, nst, nbays, fy, fc, bay_widths, heights, n_seismic, mi, dy, sections,
                  rebar_cover=0.04, ductility_class="DCM", young_mod_s=200e3, k_hard=1.0, est_ductilities=True,
-                 direction=0):
+                 direction=0, mphi_cache=None, mphi_surface=None, executor=None, previous_designs=None,
+                 redesign_tol=None):
         """
         initializes detailing phase
         :param demands: dict                Demands on structural elements
@@ -33,6 +40,14 @@ class Detailing:
         :param k_hard: float                Hardening slope of reinforcement (i.e. fu/fy)
         :param est_ductilities: bool        Whether to estimate global ductilities
         :param direction: int               Directivity of elements (X or Y), for 3D approach
+        :param mphi_cache: MPhiCache        Memoisation cache of M-phi relationships (optional)
+        :param mphi_surface: MPhiSurface    Precomputed M-phi response surface (optional)
+        :param executor: Executor           Executor (e.g. a process pool) designing the elements concurrently. If
+                                            None, the elements are designed serially
+        :param previous_designs: dict       Element designs of the previous iteration, see element_designs (optional)
+        :param redesign_tol: dict           Tolerances within which previous element designs are kept, as relative
+                                            tolerance on demands ("demands") and absolute tolerance on section
+                                            dimensions in m ("sections"). If None, all elements are redesigned
         """
         self.demands = demands
         self.nst = nst
@@ -62,6 +77,26 @@ class Detailing:
         self.est_ductilities = est_ductilities
         # Direction of seismic action
         self.direction = direction
+        # Cache of M-phi relationships shared between designs
+        self.mphi_cache = mphi_cache
+        self.mphi_surface = mphi_surface
+        self.executor = executor
+        # Number of distinct designs run and of designs reused for elements sharing identical design inputs
+        self.design_stats = {"designed": 0, "skipped": 0, "reused": 0}
+        # Incremental design, elements whose inputs changed within the tolerances keep their previous designs
+        self.previous_designs = previous_designs if previous_designs is not None else {}
+        self.redesign_tol = redesign_tol
+        # Design inputs and outputs of each element, handed over to the next iteration
+        self.element_designs = {}
+        # Elements redesigned and elements keeping their previous designs
+        self.recomputed = []
+        self.reused = []
+
+    def __getstate__(self):
+        # Design tasks are sent to worker processes along with the instance, but not the executor itself
+        state = self.__dict__.copy()
+        state["executor"] = None
+        return state
 
     def capacity_design(self, Mbi, Mci):
         """
@@ -183,6 +218,19 @@ class Detailing:
                     raise ValueError("[EXCEPTION] Wrong option for ensuring symmetry, must be max, mean or min")
         return MbiPos, MbiNeg, Mci, Nci, NciNeg
 
+    @staticmethod
+    def warn_section(eletype, st, bay, ro_prime):
+        """
+        Warns that the cross-section of an element should be increased, its reinforcement ratio exceeding the maximum
+        :param eletype: str                         Element type, beam or column
+        :param st: int                              Storey level
+        :param bay: int                             Bay level
+        :param ro_prime: float                      Reinforcement ratio
+        :return: None
+        """
+        print(f"[WARNING] Cross-section of {eletype} element at storey {st} and bay {bay} should be increased! "
+              f"ratio: {ro_prime * 100:.2f}%")
+
     def ensure_local_ductility(self, b, h, reinforcement, relation, st, bay, eletype, oppReinf=None, pflag=True):
         """
         Local ductility checks according to Eurocode 8
@@ -267,8 +315,7 @@ class Detailing:
 
         elif ro_max < ro_prime:
             if pflag:
-                print(f"[WARNING] Cross-section of {eletype} element at storey {st} and bay {bay} should be increased! "
-                      f"ratio: {ro_prime * 100:.2f}%")
+                self.warn_section(eletype, st, bay, ro_prime)
                 self.WARN_ELE_MAX = True
                 self.WARN_ELE_MIN = False
                 self.WARNING_MAX = True
@@ -302,8 +349,8 @@ class Detailing:
 
         # Initial guess for the solver
         As = 0.002
-        AsPos = float(optimize.fsolve(get_As, As, mpos, factor=0.1))
-        AsNeg = float(optimize.fsolve(get_As, As, mneg, factor=0.1))
+        AsPos = fsolve(get_As, As, mpos, factor=0.1).item()
+        AsNeg = fsolve(get_As, As, mneg, factor=0.1).item()
         AsTotal = AsPos + AsNeg
         distributions = [AsPos / AsTotal, AsNeg / AsTotal]
         return AsTotal, distributions
@@ -358,6 +405,9 @@ class Detailing:
         # Column demand at each storey level. Moment; Axial load
         column_demands = c
 
+        # Designs of elements sharing identical design inputs are run once
+        designs = {}
+
         # Initialize hinge models
         model = {"Beams": {"Pos": {}, "Neg": {}}, "Columns": {}}
         hinge_models = {"Beams": {"Pos": {}, "Neg": {}}, "Columns": {}}
@@ -377,7 +427,9 @@ class Detailing:
             m_target_neg = beam_demands_neg[st][0]
             b = self.sections[f"bx{st + 1}"]
             h = self.sections[f"hx{st + 1}"]
-            model_pos, hinge_pos, model_neg, hinge_neg, w = self.get_details(b, h, m_target_pos, m_target_neg)
+            model_pos, hinge_pos, model_neg, hinge_neg, w = self.design_once(
+                designs, ("Beams", f"S{st + 1}x"), ("Beam", b, h, m_target_pos, m_target_neg), self.get_details, b, h,
+                m_target_pos, m_target_neg)
             model["Beams"]["Pos"][f"S{st + 1}"]["x"] = model_pos
             model["Beams"]["Neg"][f"S{st + 1}"]["x"] = model_neg
             hinge_models["Beams"]["Pos"][f"S{st + 1}"]["x"] = hinge_pos
@@ -393,7 +445,9 @@ class Detailing:
             m_target_neg = beam_demands_neg[st][1]
             b = self.sections[f"by{st + 1}"]
             h = self.sections[f"hy{st + 1}"]
-            model_pos, hinge_pos, model_neg, hinge_neg, w = self.get_details(b, h, m_target_pos, m_target_neg)
+            model_pos, hinge_pos, model_neg, hinge_neg, w = self.design_once(
+                designs, ("Beams", f"S{st + 1}y"), ("Beam", b, h, m_target_pos, m_target_neg), self.get_details, b, h,
+                m_target_pos, m_target_neg)
             model["Beams"]["Pos"][f"S{st + 1}"]["y"] = model_pos
             model["Beams"]["Neg"][f"S{st + 1}"]["y"] = model_neg
             hinge_models["Beams"]["Pos"][f"S{st + 1}"]["y"] = hinge_pos
@@ -412,28 +466,18 @@ class Detailing:
             # Design compressive internal axial force
             nc_design = column_demands[st][1]
 
-            # Number of reinforcement layers based on section height (may be adjusted manually)
-            nlayers = 0 if h <= 0.3 else 1 if (0.3 < h <= 0.55) else 2
             # Assuming contraflexure at 0.6 of height
             z = 0.6 * self.heights[st]
 
-            mphi = MomentCurvatureRC(b, h, m_target_pos, length=z, p=-nc_design, nlayers=nlayers, d=self.rebar_cover,
-                                     young_mod_s=self.young_mod_s, k_hard=self.k_hard, soft_method="Collins")
-
-            model["Columns"][f"S{st + 1}"] = mphi.get_mphi()
-
+            model["Columns"][f"S{st + 1}"], w = self.design_once(designs, ("Columns", f"S{st + 1}"),
+                                                                 ("Column", b, h, m_target_pos, nc_design, z),
+                                                                 self.get_column_details, b, h, m_target_pos,
+                                                                 nc_design, z)
             hinge_models["Columns"][f"S{st + 1}"] = model["Columns"][f"S{st + 1}"][4]
 
-            '''Local ductility requirement checks (following Eurocode 8 recommendations)'''
-            model_temp = self.ensure_local_ductility(b, h, model["Columns"][f"S{st + 1}"][0]["reinforcement"], mphi,
-                                                     None, None, eletype="Column", pflag=False)
             # Any warnings
-            warnings["MAX"]["Columns"][f"S{st + 1}"] = self.WARN_ELE_MAX
-            warnings["MIN"]["Columns"][f"S{st + 1}"] = self.WARN_ELE_MIN
-
-            if model_temp is not None:
-                model["Columns"][f"S{st + 1}"] = model_temp
-                hinge_models["Columns"][f"S{st + 1}"] = model_temp[4]
+            warnings["MAX"]["Columns"][f"S{st + 1}"] = w[0]
+            warnings["MIN"]["Columns"][f"S{st + 1}"] = w[1]
 
         # Get hinge model information in DataFrame
         columns = ["Element", "Storey", "Direction", "b", "h", "coverNeg", "coverPos", "lp", "phi1Neg", "phi2Neg",
@@ -518,112 +562,19 @@ class Detailing:
                     "MIN": {"Beams": {"Pos": {}, "Neg": {}}, "Columns": {}}}
         hinge_models = {"Beams": {"Pos": {}, "Neg": {}}, "Columns": {}}
 
+        # Once the target moments are fixed, elements are designed independently of each other
+        tasks = []
+
         # Design of beams
+        nbeams = int(round(self.nbays / 2, 0)) if self.nbays > 2 else 1
         for st in range(self.nst):
-            if self.nbays > 2:
-                for bay in range(int(round(self.nbays / 2, 0))):
-                    # Design bending moment
-                    # Note: Negative = bottom, positive = top
-                    m_target_pos = mbiPos[st][bay]
-                    m_target_neg = mbiNeg[st][bay]
-
-                    # Cross-section dimensions
-                    b = self.sections[f"b{st + 1}"]
-                    h = self.sections[f"h{st + 1}"]
-
-                    # Initial guess on the distribution and values of the reinforcements
-                    AsTotal, distributions = self.get_rebar_distribution(b, h, self.rebar_cover, m_target_pos,
-                                                                         m_target_neg)
-
-                    # TODO, modify so that Negative direction is run with the knowledge of AsPos and seeks only AsNeg
-                    # Perform moment-curvature analysis, Positive direction
-                    mphiPos = MomentCurvatureRC(b, h, m_target_pos, d=self.rebar_cover, young_mod_s=self.young_mod_s,
-                                                k_hard=self.k_hard, AsTotal=AsTotal, distAs=distributions)
-                    data["Beams"]["Pos"][f"S{st + 1}B{bay + 1}"] = mphiPos.get_mphi()
-
-                    # Negative direction
-                    mphiNeg = MomentCurvatureRC(b, h, m_target_neg, d=self.rebar_cover, young_mod_s=self.young_mod_s,
-                                                k_hard=self.k_hard, AsTotal=AsTotal, distAs=distributions[::-1])
-                    data["Beams"]["Neg"][f"S{st + 1}B{bay + 1}"] = mphiNeg.get_mphi()
-
-                    # Hinge models
-                    hinge_models["Beams"]["Pos"][f"S{st+1}B{bay+1}"] = data["Beams"]["Pos"][f"S{st+1}B{bay+1}"][4]
-                    hinge_models["Beams"]["Neg"][f"S{st+1}B{bay+1}"] = data["Beams"]["Neg"][f"S{st+1}B{bay+1}"][4]
-
-                    '''Local ductility requirement checks (following Eurocode 8 recommendations)'''
-                    # Positive direction
-                    d_temp = self.ensure_local_ductility(b, h, data["Beams"]["Pos"][f"S{st + 1}B{bay + 1}"][0][
-                        "reinforcement"],  mphiPos, st + 1, bay + 1, eletype="Beam",
-                                                         oppReinf=data["Beams"]["Neg"][f"S{st + 1}B{bay + 1}"][0][
-                                                             "reinforcement"])
-
-                    warnings["MAX"]["Beams"]["Pos"][f"S{st + 1}B{bay + 1}"] = self.WARN_ELE_MAX
-                    warnings["MIN"]["Beams"]["Pos"][f"S{st + 1}B{bay + 1}"] = self.WARN_ELE_MIN
-                    if d_temp is not None:
-                        data["Beams"]["Pos"][f"S{st + 1}B{bay + 1}"] = d_temp
-                        hinge_models["Beams"]["Pos"][f"S{st+1}B{bay+1}"] = d_temp[4]
-
-                    # Negative direction
-                    d_temp = self.ensure_local_ductility(b, h, data["Beams"]["Neg"][f"S{st + 1}B{bay + 1}"][0][
-                        "reinforcement"], mphiNeg, st + 1, bay + 1, eletype="Beam",
-                                                         oppReinf=data["Beams"]["Pos"][f"S{st + 1}B{bay + 1}"][0][
-                                                             "reinforcement"])
-
-                    # TODO, once local ductility is ensured, M-phi relationship might change, also after mphiNeg, pos reinforcement might change
-                    # So, ideally it should go back and forth to correct the reinforcements, however, no iterations are done there
-                    warnings["MAX"]["Beams"]["Neg"][f"S{st + 1}B{bay + 1}"] = self.WARN_ELE_MAX
-                    warnings["MIN"]["Beams"]["Neg"][f"S{st + 1}B{bay + 1}"] = self.WARN_ELE_MIN
-                    if d_temp is not None:
-                        data["Beams"]["Neg"][f"S{st + 1}B{bay + 1}"] = d_temp
-                        hinge_models["Beams"]["Neg"][f"S{st+1}B{bay+1}"] = d_temp[4]
-
-            else:
+            # Cross-section dimensions
+            b = self.sections[f"b{st + 1}"]
+            h = self.sections[f"h{st + 1}"]
+            for bay in range(nbeams):
                 # Design bending moment
-                m_target_pos = mbiPos[st][0]
-                m_target_neg = mbiNeg[st][0]
-
-                # Cross-section dimensions
-                b = self.sections[f"b{st + 1}"]
-                h = self.sections[f"h{st + 1}"]
-
-                # Initial guess on the distribution and values of the reinforcements
-                AsTotal, distributions = self.get_rebar_distribution(b, h, self.rebar_cover, m_target_pos, m_target_neg)
-
-                # Perform moment-curvature analysis, Positive direction
-                mphiPos = MomentCurvatureRC(b, h, m_target_pos, d=self.rebar_cover, young_mod_s=self.young_mod_s,
-                                            k_hard=self.k_hard, AsTotal=AsTotal, distAs=distributions)
-                data["Beams"]["Pos"][f"S{st + 1}B{1}"] = mphiPos.get_mphi()
-                # Negative direction
-                mphiNeg = MomentCurvatureRC(b, h, m_target_neg, d=self.rebar_cover, young_mod_s=self.young_mod_s,
-                                            k_hard=self.k_hard, AsTotal=AsTotal, distAs=distributions[::-1])
-                data["Beams"]["Neg"][f"S{st + 1}B{1}"] = mphiNeg.get_mphi()
-
-                # Hinge models
-                hinge_models["Beams"]["Pos"][f"S{st+1}B{1}"] = data["Beams"]["Pos"][f"S{st+1}B{1}"][4]
-                hinge_models["Beams"]["Neg"][f"S{st+1}B{1}"] = data["Beams"]["Neg"][f"S{st+1}B{1}"][4]
-
-                '''Local ductility requirement checks (following Eurocode 8 recommendations)'''
-                # Positive direction
-                d_temp = self.ensure_local_ductility(b, h, data["Beams"]["Pos"][f"S{st + 1}B{1}"][0]["reinforcement"],
-                                                     mphiPos, st + 1, 1, eletype="Beam",
-                                                     oppReinf=data["Beams"]["Neg"][f"S{st + 1}B{1}"][0][
-                                                         "reinforcement"])
-                warnings["MAX"]["Beams"]["Pos"][f"S{st + 1}B{1}"] = self.WARN_ELE_MAX
-                warnings["MIN"]["Beams"]["Pos"][f"S{st + 1}B{1}"] = self.WARN_ELE_MIN
-                if d_temp is not None:
-                    data["Beams"]["Pos"][f"S{st + 1}B{1}"] = d_temp
-                    hinge_models["Beams"]["Pos"][f"S{st+1}B{1}"] = d_temp[4]
-
-                # Negative direction
-                d_temp = self.ensure_local_ductility(b, h, data["Beams"]["Neg"][f"S{st + 1}B{1}"][0]["reinforcement"],
-                                                     mphiNeg, st + 1, 1, eletype="Beam",
-                                                     oppReinf=data["Beams"]["Pos"][f"S{st + 1}B{1}"][0][
-                                                         "reinforcement"])
-                warnings["MAX"]["Beams"]["Neg"][f"S{st + 1}B{1}"] = self.WARN_ELE_MAX
-                warnings["MIN"]["Beams"]["Neg"][f"S{st + 1}B{1}"] = self.WARN_ELE_MIN
-                if d_temp is not None:
-                    data["Beams"]["Neg"][f"S{st + 1}B{1}"] = d_temp
-                    hinge_models["Beams"]["Neg"][f"S{st+1}B{1}"] = d_temp[4]
+                # Note: Negative = bottom, positive = top
+                tasks.append(("Beams", st, bay, (b, h, mbiPos[st][bay], mbiNeg[st][bay])))
 
         # Design of columns
         for st in range(self.nst):
@@ -632,50 +583,29 @@ class Detailing:
                     b = h = self.sections[f"he{st + 1}"]
                 else:
                     b = h = self.sections[f"hi{st + 1}"]
-                # Design bending moment
-                m_target = myc[st][bay]
-                # Design compressive internal axial force
-                nc_design = nci[st][bay]
-
-                # Get tensile internal axial forces
-                nc_design_neg = nciNeg[st][bay]
-
-                # Number of reinforcement layers based on section height (may be adjusted manually)
-                nlayers = 0 if h <= 0.3 else 1 if (0.3 < h <= 0.55) else 2
                 # Assuming contraflexure at 0.6 of height
                 # todo, may add better estimation of contraflexure point based on Muto's approach
-                # todo, Collins softening method not working well with columns
                 z = 0.6 * self.heights[st]
+                # Design bending moment, compressive and tensile internal axial forces
+                tasks.append(("Columns", st, bay, (b, h, myc[st][bay], nci[st][bay], nciNeg[st][bay], z)))
+
+        # Merge the designs in the order of the tasks, so that the outputs do not depend on the executor
+        for (eletype, st, bay, _), design in zip(tasks, self.run_design_tasks(tasks)):
+            ele = f"S{st + 1}B{bay + 1}"
+            if eletype == "Beams":
+                for direction in ("Pos", "Neg"):
+                    data["Beams"][direction][ele] = design[direction]
+                    hinge_models["Beams"][direction][ele] = design[direction][4]
+                    warnings["MAX"]["Beams"][direction][ele] = design["warnings"][direction][0]
+                    warnings["MIN"]["Beams"][direction][ele] = design["warnings"][direction][1]
+            else:
+                data["Columns"][ele] = design["Pos"]
+                hinge_models["Columns"][ele] = design["Pos"][4]
+                warnings["MAX"]["Columns"][ele] = design["warnings"]["Pos"][0]
+                warnings["MIN"]["Columns"][ele] = design["warnings"]["Pos"][1]
 
-                mphi = MomentCurvatureRC(b, h, m_target, length=z, p=-nc_design, nlayers=nlayers, d=self.rebar_cover,
-                                         young_mod_s=self.young_mod_s, k_hard=self.k_hard, soft_method="Collins")
-
-                temp = {"Pos": mphi.get_mphi()}
-                if nc_design_neg < 0.0:
-                    mphiNeg = MomentCurvatureRC(b, h, m_target, length=z, p=-nc_design_neg, nlayers=nlayers,
-                                                d=self.rebar_cover, young_mod_s=self.young_mod_s, k_hard=self.k_hard,
-                                                soft_method="Collins")
-                    temp["Neg"] = mphiNeg.get_mphi()
-                    # Select the design requiring highest reinforcement
-                    if temp["Neg"][0]["reinforcement"] > temp["Pos"][0]["reinforcement"]:
-                        selection = temp["Neg"]
-                        mphi = mphiNeg
-                    else:
-                        selection = temp["Pos"]
-                else:
-                    selection = temp["Pos"]
-
-                data["Columns"][f"S{st + 1}B{bay + 1}"] = selection
-                hinge_models["Columns"][f"S{st + 1}B{bay + 1}"] = selection[4]
-
-                '''Local ductility requirement checks (following Eurocode 8 recommendations)'''
-                d_temp = self.ensure_local_ductility(b, h, data["Columns"][f"S{st + 1}B{bay + 1}"][0]["reinforcement"],
-                                                     mphi, st + 1, bay + 1, eletype="Column")
-                warnings["MAX"]["Columns"][f"S{st + 1}B{bay + 1}"] = self.WARN_ELE_MAX
-                warnings["MIN"]["Columns"][f"S{st + 1}B{bay + 1}"] = self.WARN_ELE_MIN
-                if d_temp is not None:
-                    data["Columns"][f"S{st + 1}B{bay + 1}"] = d_temp
-                    hinge_models["Columns"][f"S{st + 1}B{bay + 1}"] = d_temp[4]
+            self.WARNING_MAX = self.WARNING_MAX or design["flags"][0]
+            self.WARNING_MIN = self.WARNING_MIN or design["flags"][1]
 
         # Old version, requires improvement
         if self.est_ductilities:
@@ -688,6 +618,270 @@ class Detailing:
 
         return data, hinge_models, mu_c, mu_f, warnings
 
+    def plan_design_tasks(self, tasks):
+        """
+        Groups the design tasks by their design inputs, elements sharing identical inputs are designed once
+        :param tasks: list                      Element type, storey, bay and design inputs of each element
+        :return: list, list                     Distinct tasks and, for each task, the index of its distinct task
+        """
+        groups = {}
+        distinct = []
+        members = []
+        for task in tasks:
+            eletype, _, _, inputs = task
+            key = (eletype, ) + tuple(float(value) for value in inputs)
+            if key not in groups:
+                groups[key] = len(distinct)
+                distinct.append(task)
+            members.append(groups[key])
+        return distinct, members
+
+    def run_design_tasks(self, tasks):
+        """
+        Runs the element design tasks, once per group of identical design inputs and concurrently if an executor was
+        provided
+        :param tasks: list                      Element type, storey, bay and design inputs of each element
+        :return: list                           Designs of the elements, in the order of the tasks
+        """
+        # Elements with design inputs within the tolerances of the previous iteration are not redesigned
+        outputs = [self.get_previous_design((eletype, f"S{st + 1}B{bay + 1}"), inputs)
+                   for eletype, st, bay, inputs in tasks]
+        pending = [idx for idx, design in enumerate(outputs) if design is None]
+
+        distinct, members = self.plan_design_tasks([tasks[idx] for idx in pending])
+        self.design_stats["designed"] += len(distinct)
+        self.design_stats["skipped"] += len(pending) - len(distinct)
+
+        if self.executor is None:
+            designs = [self.design_task(task) for task in distinct]
+        else:
+            futures = [self.executor.submit(self.design_task, task) for task in distinct]
+            designs = [future.result() for future in futures]
+
+        # Fan the designs out to all members of a group, members are given copies of the outputs
+        used = set()
+        for idx, group in zip(pending, members):
+            if group in used:
+                outputs[idx] = copy.deepcopy(designs[group])
+                # The warnings were printed by the design for the first member of the group only
+                self.warn_members(tasks[idx], outputs[idx])
+            else:
+                outputs[idx] = designs[group]
+            used.add(group)
+
+        for idx, (eletype, st, bay, inputs) in enumerate(tasks):
+            ele = (eletype, f"S{st + 1}B{bay + 1}")
+            self.record_design(ele, inputs, outputs[idx], idx in pending)
+        return outputs
+
+    def warn_members(self, task, design):
+        """
+        Prints the warnings of the local ductility checks of an element, whose design is that of another element
+        :param task: tuple                      Element type, storey, bay and design inputs
+        :param design: dict                     M-phi outputs and warnings of the element
+        :return: None
+        """
+        eletype, st, bay, inputs = task
+        b, h = inputs[:2]
+        for direction, (warn_max, _) in design["warnings"].items():
+            if warn_max:
+                ro_prime = design[direction][0]["reinforcement"] / (b * (h - self.rebar_cover))
+                self.warn_section(eletype[:-1], st + 1, bay + 1, ro_prime)
+
+    def design_once(self, designs, ele, key, design, *args):
+        """
+        Runs a design function once per distinct set of design inputs
+        :param designs: dict                    Designs run so far, keyed by their design inputs
+        :param ele: tuple                       Element type and name
+        :param key: tuple                       Design inputs, led by the element type
+        :param design: callable                 Design function
+        :param args:                            Arguments of the design function
+        :return:                                Outputs of the design function (a copy, if reused)
+        """
+        key = tuple(value if isinstance(value, str) else float(value) for value in key)
+        previous = self.get_previous_design(ele, key[1:])
+        if previous is not None:
+            outputs, flags = previous
+            self.record_design(ele, key[1:], (outputs, flags), False)
+        elif key in designs:
+            self.design_stats["skipped"] += 1
+            outputs, flags = copy.deepcopy(designs[key])
+            self.record_design(ele, key[1:], (outputs, flags), True)
+        else:
+            self.design_stats["designed"] += 1
+            outputs, flags = designs[key] = self.run_flagged(design, *args)
+            self.record_design(ele, key[1:], (outputs, flags), True)
+
+        # Warnings raised by the design apply to the reused designs as well
+        self.WARNING_MAX = self.WARNING_MAX or flags[0]
+        self.WARNING_MIN = self.WARNING_MIN or flags[1]
+        return outputs
+
+    def get_previous_design(self, ele, inputs):
+        """
+        Gets the design of an element from the previous iteration, if its design inputs changed within the tolerances
+        :param ele: tuple                       Element type and name
+        :param inputs: tuple                    Design inputs, led by the section dimensions (b, h)
+        :return:                                Copy of the previous design (None, if the element is to be redesigned)
+        """
+        if self.redesign_tol is None or ele not in self.previous_designs:
+            return None
+
+        previous_inputs, design = self.previous_designs[ele]
+        inputs = np.array(inputs, dtype=float)
+        if inputs.shape != previous_inputs.shape:
+            return None
+
+        # Section dimensions, compared in absolute terms
+        if np.any(np.abs(inputs[:2] - previous_inputs[:2]) > self.redesign_tol.get("sections", 0.) + 1e-9):
+            return None
+        # Demands (and the shear span of columns), compared in relative terms
+        tol = self.redesign_tol.get("demands", 0.) * np.abs(previous_inputs[2:]) + 1e-9
+        if np.any(np.abs(inputs[2:] - previous_inputs[2:]) > tol):
+            return None
+
+        return copy.deepcopy(design)
+
+    def record_design(self, ele, inputs, design, recomputed):
+        """
+        Records the design of an element for the next iteration
+        :param ele: tuple                       Element type and name
+        :param inputs: tuple                    Design inputs
+        :param design:                          Design outputs
+        :param recomputed: bool                 Whether the element was redesigned
+        :return: None
+        """
+        name = f"{ele[0]} {ele[1]}"
+        if recomputed:
+            self.recomputed.append(name)
+            # The inputs of the design are kept, so that drifts over several iterations are not accumulated
+            self.element_designs[ele] = (np.array(inputs, dtype=float), design)
+        else:
+            self.reused.append(name)
+            self.design_stats["reused"] += 1
+            self.element_designs[ele] = self.previous_designs[ele]
+
+    def design_task(self, task):
+        """
+        Designs a single element, including the local ductility checks
+        :param task: tuple                      Element type, storey, bay and design inputs
+        :return: dict                           M-phi outputs, warnings of the element and the global warning flags
+        """
+        eletype, st, bay, inputs = task
+        if eletype == "Beams":
+            design, flags = self.run_flagged(self.design_beam, st, bay, *inputs)
+        else:
+            design, flags = self.run_flagged(self.design_column, st, bay, *inputs)
+        design["flags"] = flags
+        return design
+
+    def run_flagged(self, design, *args):
+        """
+        Runs a design function and identifies the global warnings raised by it
+        :param design: callable                 Design function
+        :param args:                            Arguments of the design function
+        :return:                                Outputs of the design function and the warnings raised (max, min)
+        """
+        flags = self.WARNING_MAX, self.WARNING_MIN
+        self.WARNING_MAX = self.WARNING_MIN = False
+        outputs = design(*args)
+        raised = self.WARNING_MAX, self.WARNING_MIN
+        self.WARNING_MAX = flags[0] or raised[0]
+        self.WARNING_MIN = flags[1] or raised[1]
+        return outputs, raised
+
+    def design_beam(self, st, bay, b, h, m_target_pos, m_target_neg):
+        """
+        Designs a beam in both directions
+        :param st: int                          Storey index
+        :param bay: int                         Bay index
+        :param b: float                         Width of element
+        :param h: float                         Height of element
+        :param m_target_pos: float              Positive bending moment demand (top)
+        :param m_target_neg: float              Negative bending moment demand (bottom)
+        :return: dict                           M-phi outputs and warnings for both directions
+        """
+        # Initial guess on the distribution and values of the reinforcements
+        AsTotal, distributions = self.get_rebar_distribution(b, h, self.rebar_cover, m_target_pos, m_target_neg)
+
+        # TODO, modify so that Negative direction is run with the knowledge of AsPos and seeks only AsNeg
+        # Perform moment-curvature analysis, Positive direction
+        mphiPos = MomentCurvatureRC(b, h, m_target_pos, d=self.rebar_cover, young_mod_s=self.young_mod_s,
+                                    k_hard=self.k_hard, AsTotal=AsTotal, distAs=distributions,
+                                    cache=self.mphi_cache, surface=self.mphi_surface)
+        design = {"Pos": mphiPos.get_mphi(), "warnings": {}}
+
+        # Negative direction
+        mphiNeg = MomentCurvatureRC(b, h, m_target_neg, d=self.rebar_cover, young_mod_s=self.young_mod_s,
+                                    k_hard=self.k_hard, AsTotal=AsTotal, distAs=distributions[::-1],
+                                    cache=self.mphi_cache, surface=self.mphi_surface)
+        design["Neg"] = mphiNeg.get_mphi()
+
+        '''Local ductility requirement checks (following Eurocode 8 recommendations)'''
+        # Positive direction
+        d_temp = self.ensure_local_ductility(b, h, design["Pos"][0]["reinforcement"], mphiPos, st + 1, bay + 1,
+                                             eletype="Beam", oppReinf=design["Neg"][0]["reinforcement"])
+        design["warnings"]["Pos"] = (self.WARN_ELE_MAX, self.WARN_ELE_MIN)
+        if d_temp is not None:
+            design["Pos"] = d_temp
+
+        # Negative direction
+        d_temp = self.ensure_local_ductility(b, h, design["Neg"][0]["reinforcement"], mphiNeg, st + 1, bay + 1,
+                                             eletype="Beam", oppReinf=design["Pos"][0]["reinforcement"])
+
+        # TODO, once local ductility is ensured, M-phi relationship might change, also after mphiNeg, pos reinforcement
+        #  might change. So, ideally it should go back and forth to correct the reinforcements, however, no iterations
+        #  are done there
+        design["warnings"]["Neg"] = (self.WARN_ELE_MAX, self.WARN_ELE_MIN)
+        if d_temp is not None:
+            design["Neg"] = d_temp
+
+        return design
+
+    def design_column(self, st, bay, b, h, m_target, nc_design, nc_design_neg, z):
+        """
+        Designs a column for the compressive and, if any, tensile axial forces
+        :param st: int                          Storey index
+        :param bay: int                         Bay index
+        :param b: float                         Width of element
+        :param h: float                         Height of element
+        :param m_target: float                  Bending moment demand
+        :param nc_design: float                 Design compressive internal axial force
+        :param nc_design_neg: float             Tensile internal axial force
+        :param z: float                         Distance to the point of contraflexure
+        :return: dict                           M-phi outputs and warnings
+        """
+        # Number of reinforcement layers based on section height (may be adjusted manually)
+        nlayers = 0 if h <= 0.3 else 1 if (0.3 < h <= 0.55) else 2
+
+        # todo, Collins softening method not working well with columns
+        mphi = MomentCurvatureRC(b, h, m_target, length=z, p=-nc_design, nlayers=nlayers, d=self.rebar_cover,
+                                 young_mod_s=self.young_mod_s, k_hard=self.k_hard, soft_method="Collins",
+                                 cache=self.mphi_cache, surface=self.mphi_surface)
+
+        temp = {"Pos": mphi.get_mphi()}
+        if nc_design_neg < 0.0:
+            mphiNeg = MomentCurvatureRC(b, h, m_target, length=z, p=-nc_design_neg, nlayers=nlayers,
+                                        d=self.rebar_cover, young_mod_s=self.young_mod_s, k_hard=self.k_hard,
+                                        soft_method="Collins", cache=self.mphi_cache, surface=self.mphi_surface)
+            temp["Neg"] = mphiNeg.get_mphi()
+            # Select the design requiring highest reinforcement
+            if temp["Neg"][0]["reinforcement"] > temp["Pos"][0]["reinforcement"]:
+                selection = temp["Neg"]
+                mphi = mphiNeg
+            else:
+                selection = temp["Pos"]
+        else:
+            selection = temp["Pos"]
+
+        '''Local ductility requirement checks (following Eurocode 8 recommendations)'''
+        d_temp = self.ensure_local_ductility(b, h, selection[0]["reinforcement"], mphi, st + 1, bay + 1,
+                                             eletype="Column")
+        if d_temp is not None:
+            selection = d_temp
+
+        return {"Pos": selection, "warnings": {"Pos": (self.WARN_ELE_MAX, self.WARN_ELE_MIN)}}
+
     def get_details(self, b, h, m_pos, m_neg):
         """
         Gets details
@@ -702,12 +896,14 @@ class Detailing:
         AsTotal, distributions = self.get_rebar_distribution(b, h, self.rebar_cover, m_pos, m_neg)
         # Positive direction
         mphiPos = MomentCurvatureRC(b, h, m_pos, d=self.rebar_cover, young_mod_s=self.young_mod_s,
-                                    k_hard=self.k_hard, AsTotal=AsTotal, distAs=distributions)
+                                    k_hard=self.k_hard, AsTotal=AsTotal, distAs=distributions, cache=self.mphi_cache,
+                                    surface=self.mphi_surface)
         model_pos = mphiPos.get_mphi()
 
         # Negative direction
         mphiNeg = MomentCurvatureRC(b, h, m_neg, d=self.rebar_cover, young_mod_s=self.young_mod_s,
-                                    k_hard=self.k_hard, AsTotal=AsTotal, distAs=distributions[::-1])
+                                    k_hard=self.k_hard, AsTotal=AsTotal, distAs=distributions[::-1],
+                                    cache=self.mphi_cache, surface=self.mphi_surface)
         model_neg = mphiNeg.get_mphi()
 
         # Update the hinge models
@@ -736,6 +932,32 @@ class Detailing:
 
         return model_pos, hinge_models_pos, model_neg, hinge_models_neg, w
 
+    def get_column_details(self, b, h, m_target, nc_design, z):
+        """
+        Gets details of a gravity column
+        :param b: float                     Widths of element
+        :param h: float                     Height of element
+        :param m_target: float              Bending moment
+        :param nc_design: float             Design compressive internal axial force
+        :param z: float                     Distance to the point of contraflexure
+        :return: tuple, list                Details and warnings
+        """
+        # Number of reinforcement layers based on section height (may be adjusted manually)
+        nlayers = 0 if h <= 0.3 else 1 if (0.3 < h <= 0.55) else 2
+
+        mphi = MomentCurvatureRC(b, h, m_target, length=z, p=-nc_design, nlayers=nlayers, d=self.rebar_cover,
+                                 young_mod_s=self.young_mod_s, k_hard=self.k_hard, soft_method="Collins",
+                                 cache=self.mphi_cache, surface=self.mphi_surface)
+        model = mphi.get_mphi()
+
+        '''Local ductility requirement checks (following Eurocode 8 recommendations)'''
+        model_temp = self.ensure_local_ductility(b, h, model[0]["reinforcement"], mphi, None, None, eletype="Column",
+                                                 pflag=False)
+        if model_temp is not None:
+            model = model_temp
+
+        return model, [self.WARN_ELE_MAX, self.WARN_ELE_MIN]
+
     def model_to_df(self, model):
         """
         Main purpose of the function is to transform the hinge model dictionary into a DataFrame for use in RCMRF
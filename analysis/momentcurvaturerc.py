@@ -16,16 +16,22 @@ import numpy as np
 from scipy import optimize
 import math
 
+from analysis.constitutive import concrete_stress, steel_stress, stress_block
 from analysis.plasticity import Plasticity
 from utils.ipbsd_utils import getIndex
+from utils.profiler import count, counted
 import warnings
 
 warnings.filterwarnings('ignore')
 
+# Calls are counted when profiling
+fsolve = counted(optimize.fsolve, "fsolve")
+
 
 class MomentCurvatureRC:
     def __init__(self, b, h, m_target, length=0., nlayers=0, p=0., d=.03, fc_prime=25, fy=415, young_mod_s=200e3,
-                 soft_method="Collins", k_hard=1.0, fstiff=0.5, AsTotal=None, distAs=None):
+                 soft_method="Collins", k_hard=1.0, fstiff=0.5, AsTotal=None, distAs=None, cache=None,
+                 surface=None):
         """
         init Moment curvature tool
         :param b: float                         Element sectional width
@@ -43,6 +49,8 @@ class MomentCurvatureRC:
         :param fstiff: float                    Stiffness reduction factor (50% per Eurocode 8), for the model only
         :param AsTotal: float                   Total reinforcement area (for beams only)
         :param distAs: list                     Relative distributions of reinforcement (for beams only)
+        :param cache: MPhiCache                 Memoisation cache of M-phi relationships (optional)
+        :param surface: MPhiSurface             Precomputed M-phi response surface (optional)
         """
         self.b = b
         self.h = h
@@ -65,6 +73,10 @@ class MomentCurvatureRC:
         self.phii = np.nan
         self.AsTotal = AsTotal
         self.distAs = distAs
+        self.cache = cache
+        self.surface = surface
+        # Convergence diagnostics of the reinforcement design
+        self.rebar_diagnostics = None
 
         if self.distAs is None:
             self.distAs = np.array([0.5, 0.5])
@@ -95,16 +107,8 @@ class MomentCurvatureRC:
         return z, rebar
 
     def compute_stress(self, epsc, epsc_prime, c, z, residual=False):
-        # reinforcement properties
-        ey = self.fy / self.young_mod_s
-        fu = self.k_hard * self.fy
-
         # Block parameters
-        b1 = (4 - epsc / epsc_prime) / (6 - 2 * epsc / epsc_prime)
-        a1b1 = epsc / epsc_prime - 1 / 3 * (epsc / epsc_prime) ** 2
-        if epsc > 2 * epsc_prime:
-            b1 = (4 - 2 * epsc_prime / epsc_prime) / (6 - 4 * epsc_prime / epsc_prime)
-            a1b1 = 2 * epsc_prime / epsc_prime - 1 / 3 * (2 * epsc_prime / epsc_prime) ** 2
+        a1b1, b1 = stress_block(epsc, epsc_prime)
 
         # Top rebar strain
         if not residual:
@@ -113,23 +117,7 @@ class MomentCurvatureRC:
             epss = (c - (self.h - z[:-1])) / c * epsc
 
         # Stresses
-        stress = np.zeros(len(epss))
-        for i in range(len(stress)):
-            if abs(epss[i]) <= ey:
-                stress[i] = self.young_mod_s * epss[i]
-            elif ey < abs(epss[i]) <= self.EPSSH:
-                stress[i] = np.sign(epss[i]) * self.fy
-            elif self.EPSSH < abs(epss[i]) <= self.EPSUK:
-                stress[i] = np.sign(epss[i]) * self.fy + (np.sign(epss[i]) * fu - np.sign(epss[i]) * self.fy) * \
-                            np.sqrt((epss[i] - np.sign(epss[i]) * self.EPSSH) / (
-                                    np.sign(epss[i]) * self.EPSUK - np.sign(epss[i]) * self.EPSSH))
-            else:
-                # This is an approximation, generally reinforcement will be sufficient enough not to surpass ultimate
-                # strain. However, for calculation purpose this will be left here for now
-                stress[i] = np.sign(epss[i]) * self.fy + (np.sign(epss[i]) * fu - np.sign(epss[i]) * self.fy) * \
-                            np.sqrt((epss[i] - 2 * (np.sign(epss[i]) * self.EPSUK - np.sign(epss[i]) * self.EPSSH)) / (
-                                    np.sign(epss[i]) * self.EPSUK - 2 * (np.sign(epss[i]) * self.EPSUK
-                                                                         - np.sign(epss[i]) * self.EPSSH)))
+        stress = steel_stress(epss, self.fy, self.young_mod_s, self.k_hard, self.EPSSH, self.EPSUK)
 
         # Internal force in compressed concrete
         cc = c * a1b1 * self.fc_prime * self.b * 1000
@@ -145,8 +133,17 @@ class MomentCurvatureRC:
         :param data: list                       Reinforcement characteristics
         :return: float                          Difference between internal and analysis forces
         """
-        # Force it to look for only positive values of c
-        c = abs(c)
+        return abs(self.residual(c, data))
+
+    def residual(self, c, data):
+        """
+        Signed force residual of the section, increasing with the compressed concrete height
+        :param c: numpy.ndarray                 Compressed concrete height
+        :param data: list                       Reinforcement characteristics
+        :return: float                          Sum of internal and analysis forces
+        """
+        # Force it to look for only positive values of c, a scalar keeps the section computations off array overheads
+        c = abs(np.ravel(c)[0])
         # Concrete strains
         epsc = data[0]
         epsc_prime = data[1]
@@ -161,14 +158,14 @@ class MomentCurvatureRC:
 
         # Forces
         nslist = rebar * stress * 1000
-        nint = cc + sum(nslist)
+        nint = cc + nslist.sum()
 
-        self.mi = (cc * (self.h / 2 - compr_height / 2) + sum(nslist * (z - self.h / 2)))
+        self.mi = (cc * (self.h / 2 - compr_height / 2) + nslist.dot(z - self.h / 2))
         self.fst = abs(stress[-1])
         self.epss = abs(epss[-1])
         self.phii = epsc / c
 
-        return abs(nint + self.p)
+        return nint + self.p
 
     def get_residual_strength(self, c, data):
         """
@@ -179,8 +176,8 @@ class MomentCurvatureRC:
         :param data: list                       Reinforcement characteristics
         :return: float                          Difference between internal and analysis forces
         """
-        # Force it to look for only positive values of c
-        c = abs(c)
+        # Force it to look for only positive values of c, a scalar keeps the section computations off array overheads
+        c = abs(np.ravel(c)[0])
         # Concrete strains
         epsBot = data[0]
         epsc_prime = data[1]
@@ -200,10 +197,10 @@ class MomentCurvatureRC:
         ns = rebar[:-1] * stress * 1000
 
         # Total internal force, concrete + reinforcement
-        nint = cc + sum(ns)
+        nint = cc + ns.sum()
 
         # Internal bending moment and curvature
-        self.mi = float(cc * (self.h / 2 - compr_height / 2) + sum(ns * (z[:-1] - self.h / 2)))
+        self.mi = float(cc * (self.h / 2 - compr_height / 2) + ns.dot(z[:-1] - self.h / 2))
         self.phii = float(epsc / c)
 
         return abs(nint + self.p)
@@ -220,7 +217,7 @@ class MomentCurvatureRC:
         # epss_bot = 0.044
         # Initialize moment and compressed concrete height
         c = 0.01
-        c = float(optimize.fsolve(self.get_residual_strength, c, [epss_bot, epsc_prime, asinit], factor=0.1))
+        c = fsolve(self.get_residual_strength, c, [epss_bot, epsc_prime, asinit], factor=0.1).item()
 
         moment = self.mi
         phii = self.phii
@@ -241,9 +238,114 @@ class MomentCurvatureRC:
         """
         asinit = asi[0]
         c = np.array([0.05])
-        c = float(abs(optimize.fsolve(self.objective, c, [2 * epsc_prime, epsc_prime, asinit], factor=0.1)))
+        c = abs(fsolve(self.objective, c, [2 * epsc_prime, epsc_prime, asinit], factor=0.1).item())
         return abs(self.mi / self.k_hard - self.m_target)
 
+    def get_capacity(self, rebar, epsc, epsc_prime):
+        """
+        Gets the bending moment of the section for a given top concrete strain, bracketing the compressed concrete
+        height between full tensile straining of the bottom reinforcement and a fully compressed section
+        :param rebar: float                         Total reinforcement area
+        :param epsc: float                          Strain at the top concrete fiber
+        :param epsc_prime: float                    Concrete strain at peak compressive strength
+        :return: float                              Bending moment (None, if equilibrium could not be bracketed)
+        """
+        data = [epsc, epsc_prime, rebar]
+        # Bottom reinforcement reaches its ultimate strain
+        c_low = (self.h - self.d) * epsc / (epsc + self.EPSUK)
+        if not self.residual(c_low, data) < 0:
+            return None
+
+        c_high = self.h
+        while not self.residual(c_high, data) > 0:
+            c_high *= 2
+            if c_high > 100 * self.h:
+                return None
+
+        c = optimize.brentq(self.residual, c_low, c_high, args=(data, ), xtol=1e-10)
+        self.residual(c, data)
+        return self.mi
+
+    def get_reinforcement_bounds(self):
+        """
+        Analytic bounds of total reinforcement area based on the rectangular stress block
+        :return: float, float                       Lower and upper estimates of total reinforcement area
+        """
+        # Share of total reinforcement in the tensile (bottom) layer
+        share = {0: self.distAs[0], 1: 3 / 8, 2: 4 / 12}[self.nlayers]
+        # Effective depth
+        depth = self.h - self.d
+        fy = self.fy * 1000
+        fu = self.k_hard * fy
+        # Compressive axial loads add to the capacity by at most p*h/2
+        m_target = max(self.m_target * self.k_hard - max(-self.p, 0.) * self.h / 2, 0.)
+
+        # Lever arm may not exceed the effective depth
+        as_low = m_target / (share * fu * depth)
+
+        # Depth of the rectangular stress block, 0.85fc acting on 0.8 of the compressed height
+        fc = 0.85 * self.fc_prime * 1000
+        disc = 1 - 2 * m_target / (fc * self.b * depth ** 2)
+        if disc > 0:
+            as_high = fc * self.b * depth * (1 - np.sqrt(disc)) / fy / share
+        else:
+            # Beyond a singly-reinforced section, assume half of the effective depth as the lever arm
+            as_high = m_target / (share * fy * depth / 2)
+
+        return as_low, max(as_high * 1.5, as_low * 2, 1e-6)
+
+    def design_reinforcement(self, epsc_prime, xtol=1e-9):
+        """
+        Sizes the total reinforcement area for the target moment using Brent's method. Moment capacity is monotone in
+        reinforcement, so the root is bracketed using the rectangular stress block bounds
+        :param epsc_prime: float                    Concrete strain at peak compressive strength
+        :param xtol: float                          Absolute tolerance on reinforcement area in m2
+        :return: float, dict                        Total reinforcement area and convergence diagnostics
+        """
+        epsc = 2 * epsc_prime
+
+        def capacity(rebar):
+            moment = self.get_capacity(rebar, epsc, epsc_prime)
+            return np.nan if moment is None else moment / self.k_hard - self.m_target
+
+        as_low, as_high = self.get_reinforcement_bounds()
+        diagnostics = {"method": "brentq", "converged": False, "iterations": 0, "function_calls": 0,
+                       "bracket": None}
+
+        # Extend the bracket downwards, down to no reinforcement
+        f_low = capacity(as_low)
+        diagnostics["function_calls"] += 1
+        while f_low > 0 and as_low > 0.:
+            as_high, as_low = as_low, as_low / 2 if as_low > 1e-6 else 0.
+            f_low = capacity(as_low)
+            diagnostics["function_calls"] += 1
+
+        # Axial compression alone provides the target capacity
+        if f_low > 0:
+            diagnostics.update({"converged": True, "bracket": (0., 0.)})
+            return 0., diagnostics
+
+        f_high = capacity(as_high)
+        diagnostics["function_calls"] += 1
+        while f_high < 0 and as_high < self.b * self.h:
+            as_low, as_high = as_high, as_high * 2
+            f_high = capacity(as_high)
+            diagnostics["function_calls"] += 1
+
+        if not (f_low < 0 < f_high):
+            # Section could not be bracketed, revert to the nested solver
+            asinit = np.array([self.AsTotal]) if self.AsTotal is not None else np.array([0.002])
+            rebar, info, ier, _ = fsolve(self.max_moment, asinit, epsc_prime, factor=0.1,
+                                         full_output=True)
+            diagnostics.update({"method": "fsolve", "converged": ier == 1, "function_calls": info["nfev"]})
+            return abs(rebar.item()), diagnostics
+
+        rebar, results = optimize.brentq(capacity, as_low, as_high, xtol=xtol, full_output=True)
+        diagnostics.update({"converged": results.converged, "iterations": results.iterations,
+                            "function_calls": diagnostics["function_calls"] + results.function_calls,
+                            "bracket": (as_low, as_high)})
+        return rebar, diagnostics
+
     def get_softening_slope(self, **kwargs):
         """
         defines the softening slope of the moment-curvature relationship
@@ -288,6 +390,8 @@ class MomentCurvatureRC:
         #  look into it
         """
         Gives the Moment-curvature relationship
+        If a response surface was supplied, the outputs are interpolated from it, unless the section falls outside
+        of it. If a cache was supplied, the outputs are looked up there first and the analysis is run only on a miss
         :param check_reinforcement: bool            Gets moment for reinforcement provided (True) or applied
                                                     optimization for Mtarget (False)
         :param reinf_test: int                      Reinforcement for test
@@ -297,6 +401,7 @@ class MomentCurvatureRC:
         :param cover: float                         Reinforcement cover, generally input when warnMin was triggered
         :return: dict                               M-phi response data, reinforcement and concrete data for detailing
         """
+        count("mphi_evaluations")
         if reinforcements is not None:
             reinforcements = np.array(reinforcements)
             self.AsTotal = sum(reinforcements)
@@ -306,13 +411,41 @@ class MomentCurvatureRC:
         if cover is not None:
             self.d = cover
 
+        if self.surface is not None:
+            outputs = self.surface.query(self, check_reinforcement, reinf_test)
+            if outputs is not None:
+                return outputs
+
+        if self.cache is None:
+            return self._run_mphi(check_reinforcement, reinf_test)
+
+        key = self.cache.make_key(b=self.b, h=self.h, m_target=self.m_target, length=self.length,
+                                  nlayers=self.nlayers, p=self.p, d=self.d, fc_prime=self.fc_prime, fy=self.fy,
+                                  young_mod_s=self.young_mod_s, soft_method=self.soft_method, k_hard=self.k_hard,
+                                  fstiff=self.fstiff, AsTotal=self.AsTotal, distAs=self.distAs,
+                                  check_reinforcement=check_reinforcement,
+                                  reinf_test=reinf_test if check_reinforcement else None)
+        outputs = self.cache.get(key)
+        if outputs is None:
+            outputs = self._run_mphi(check_reinforcement, reinf_test)
+            self.cache.put(key, outputs)
+        return outputs
+
+    def _run_mphi(self, check_reinforcement, reinf_test):
+        """
+        Runs the moment-curvature analysis for the current state of the section
+        :param check_reinforcement: bool            Gets moment for reinforcement provided (True) or applied
+                                                    optimization for Mtarget (False)
+        :param reinf_test: int                      Reinforcement for test
+        :return: dict                               M-phi response data, reinforcement and concrete data for detailing
+        """
+        count("mphi_solves")
         # Concrete properties
         # Assumption - parabolic stress-strain relationship for the concrete
         # concrete elasticity modulus MPa
         young_modulus_rc = (3320 * np.sqrt(self.fc_prime) + 6900)
         # young_modulus_rc = 22*((fc_prime+8)/10)**.3*1000
         n = .8 + self.fc_prime / 17
-        k_parameter = 0.67 + self.fc_prime / 62
         epsc_prime = self.fc_prime / young_modulus_rc * n / (n - 1)
         # Reinforcement properties (500C grade)
         ey = self.fy / self.young_mod_s
@@ -329,98 +462,95 @@ class MomentCurvatureRC:
 
         ''' The "Process" '''
         epsc = np.linspace(epsc_prime * 2 / 500, 10 * epsc_prime, 400)
-        sigma_c = self.fc_prime * n * epsc / epsc_prime / (n - 1 + np.power(epsc / epsc_prime, n * k_parameter))
+        sigma_c, _ = concrete_stress(epsc, self.fc_prime)
         m = np.array([0])
         phi = np.array([0])
         sigmat = np.array([0])
         eps_tensile = np.array([0])
 
-        # Optimize for longitudinal reinforcement at peak capacity
-        if self.AsTotal is not None:
-            asinit = np.array([self.AsTotal])
-        else:
-            asinit = np.array([0.002])
-
-        asinit = abs(float(optimize.fsolve(self.max_moment, asinit, epsc_prime, factor=0.1)))
-
         # Are we doing a reinforcement check? If, yes...
         if check_reinforcement:
+            moment = self.get_capacity(reinf_test, 2 * epsc_prime, epsc_prime)
+            if moment is not None:
+                return moment
+
             c = np.array([0.05])
             self.mi = None
             init_factor = 2.
-            while self.mi is None or np.isnan(self.mi[0]):
-                c = abs(float(optimize.fsolve(self.objective, c, [init_factor * epsc_prime, epsc_prime, reinf_test],
-                                              factor=0.1)))
+            while self.mi is None or np.isnan(self.mi):
+                c = abs(fsolve(self.objective, c, [init_factor * epsc_prime, epsc_prime, reinf_test],
+                               factor=0.1).item())
                 init_factor -= 0.1
             return self.mi
 
-        # If not, get the full M-Phi curve
-        else:
-            for i in range(len(epsc)):
-                # compressed section height optimization - make a good guess, otherwise convergence won't be achieved
-                c = 0.05
-                c = abs(float(optimize.fsolve(self.objective, c, [epsc[i], epsc_prime, asinit], factor=100, xtol=1e-4)))
-                # Stop analysis if RunTimeWarning is caught (i.e. no convergence)
-                if math.isnan(self.mi):
-                    # Check if target moment was reached (it not then analysis stopped prematurely due to bad guess)
-                    if max(m) < self.m_target:
-                        # Rerun with different c
-                        c = 0.03
-                        c = abs(float(optimize.fsolve(self.objective, c, [epsc[i], epsc_prime, asinit], factor=100,
-                                                      xtol=1e-4)))
+        # Optimize for longitudinal reinforcement at peak capacity
+        asinit, self.rebar_diagnostics = self.design_reinforcement(epsc_prime)
+
+        # Get the full M-Phi curve
+        for i in range(len(epsc)):
+            # compressed section height optimization - make a good guess, otherwise convergence won't be achieved
+            c = 0.05
+            c = abs(fsolve(self.objective, c, [epsc[i], epsc_prime, asinit], factor=100, xtol=1e-4).item())
+            # Stop analysis if RunTimeWarning is caught (i.e. no convergence)
+            if math.isnan(self.mi):
+                # Check if target moment was reached (it not then analysis stopped prematurely due to bad guess)
+                if max(m) < self.m_target:
+                    # Rerun with different c
+                    c = 0.03
+                    c = abs(fsolve(self.objective, c, [epsc[i], epsc_prime, asinit], factor=100,
+                                   xtol=1e-4).item())
+                else:
+                    # Check if c initial should be modified, as the analysis stopped prematurely
+                    if m[-2] / m[-1] < 0.9:
+                        c = 0.02
+                        c = abs(fsolve(self.objective, c, [epsc[i], epsc_prime, asinit], factor=100,
+                                       xtol=1e-4).item())
                     else:
-                        # Check if c initial should be modified, as the analysis stopped prematurely
                         if m[-2] / m[-1] < 0.9:
-                            c = 0.02
-                            c = abs(float(optimize.fsolve(self.objective, c, [epsc[i], epsc_prime, asinit], factor=100,
-                                                          xtol=1e-4)))
+                            c = 0.1
+                            c = abs(fsolve(self.objective, c, [epsc[i], epsc_prime, asinit], factor=100,
+                                           xtol=1e-4).item())
                         else:
-                            if m[-2] / m[-1] < 0.9:
-                                c = 0.1
-                                c = abs(
-                                    float(optimize.fsolve(self.objective, c, [epsc[i], epsc_prime, asinit], factor=100,
-                                                          xtol=1e-4)))
-                            else:
-                                break
-
-                # Sometimes even though the M-Phi is obtained, the solution is still converging, so we need to stop it
-                # to avoid inverse slopes of Curvature
-                if phi.size <= 1:
-                    if phi[-1] > self.phii:
-                        break
-
-                # tensile reinforcement strains
-                eps_tensile = np.append(eps_tensile, self.epss)
-                # tensile reinforcement stresses
-                sigmat = np.append(sigmat, self.fst)
-                # bending moment capacity
-                m = np.append(m, self.mi)
-                # curvature
-                phi = np.append(phi, self.phii)
-
-                # Stop analysis if bottom reinforcement has ruptured
-                # TODO, don't know why RESPONSE stops at half of strain,uk
-                if self.epss >= self.EPSUK / 2:
-                    break
+                            break
 
-            yield_index = getIndex(self.fy, sigmat)
+            # Sometimes even though the M-Phi is obtained, the solution is still converging, so we need to stop it
+            # to avoid inverse slopes of Curvature
+            if phi.size <= 1:
+                if phi[-1] > self.phii:
+                    break
 
-            # Removing None arguments
-            if self.k_hard == 1.:
-                m = m[~np.isnan(m)]
-                phi = phi[~np.isnan(phi)]
-            else:
-                idx = min(np.argwhere(np.isnan(m))[0][0], np.argwhere(np.isnan(phi))[0][0])
-                m = m[:idx]
-                phi = phi[:idx]
-            idx_max = -1
-            m_max = m[idx_max]
-            my_first = m[yield_index]
-            phiy_first = phi[yield_index]
-            m = np.array(m)
-            rpeak = m_max / my_first
-            ei_cracked = my_first / phiy_first
-            ei_cracked = ei_cracked / (young_modulus_rc * self.b * self.h ** 3 / 12 * 1000)
+            # tensile reinforcement strains
+            eps_tensile = np.append(eps_tensile, self.epss)
+            # tensile reinforcement stresses
+            sigmat = np.append(sigmat, self.fst)
+            # bending moment capacity
+            m = np.append(m, self.mi)
+            # curvature
+            phi = np.append(phi, self.phii)
+
+            # Stop analysis if bottom reinforcement has ruptured
+            # TODO, don't know why RESPONSE stops at half of strain,uk
+            if self.epss >= self.EPSUK / 2:
+                break
+
+        yield_index = getIndex(self.fy, sigmat)
+
+        # Removing None arguments
+        if self.k_hard == 1.:
+            m = m[~np.isnan(m)]
+            phi = phi[~np.isnan(phi)]
+        else:
+            idx = min(np.argwhere(np.isnan(m))[0][0], np.argwhere(np.isnan(phi))[0][0])
+            m = m[:idx]
+            phi = phi[:idx]
+        idx_max = -1
+        m_max = m[idx_max]
+        my_first = m[yield_index]
+        phiy_first = phi[yield_index]
+        m = np.array(m)
+        rpeak = m_max / my_first
+        ei_cracked = my_first / phiy_first
+        ei_cracked = ei_cracked / (young_modulus_rc * self.b * self.h ** 3 / 12 * 1000)
 
         # Nominal yield curvature
         phi_yield_nom = self.m_target * phiy_first / my_first
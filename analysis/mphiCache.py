@@ -0,0 +1,144 @@
+"""
+Memoisation cache for moment-curvature relationships
+Results of MomentCurvatureRC are keyed on quantised section, material and demand parameters. They are kept in an
+in-process LRU store and, optionally, in an on-disk store that is shared across runs and worker processes
+"""
+import copy
+import hashlib
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+
+
+class MPhiCache:
+    def __init__(self, directory=None, maxsize=4096, digits=6):
+        """
+        Initializes the M-phi cache
+        :param directory: str                   Directory of the on-disk store (None keeps the cache in memory only)
+        :param maxsize: int                     Maximum number of entries of the in-process LRU store
+        :param digits: int                      Significant digits kept when quantising the keys. Lower values make
+                                                nearly identical sections and demands share a single entry
+        """
+        self.directory = directory
+        self.maxsize = maxsize
+        self.digits = digits
+
+        self._store = OrderedDict()
+
+        # Statistics
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def __getstate__(self):
+        # Copies sent to worker processes start with an empty in-process store and share the on-disk store only
+        state = self.__dict__.copy()
+        state["_store"] = OrderedDict()
+        state["hits"] = state["disk_hits"] = state["misses"] = 0
+        return state
+
+    def quantise(self, value):
+        """
+        Quantises a value to the significant digits of the cache
+        :param value: float, list, ndarray      Value to quantise
+        :return: float, tuple                   Quantised value
+        """
+        if value is None or isinstance(value, (str, bool)):
+            return value
+        if isinstance(value, (list, tuple, np.ndarray)):
+            return tuple(self.quantise(v) for v in np.ravel(value))
+        value = float(value)
+        if value == 0. or not np.isfinite(value):
+            return value
+        return float(f"{value:.{self.digits}g}")
+
+    def make_key(self, **kwargs):
+        """
+        Creates a cache key from the M-phi input parameters
+        :param kwargs:                          Parameters defining the M-phi relationship
+        :return: str                            Hash of the quantised parameters
+        """
+        items = tuple((name, self.quantise(kwargs[name])) for name in sorted(kwargs))
+        return hashlib.sha1(repr(items).encode()).hexdigest()
+
+    def get(self, key):
+        """
+        Retrieves an entry, looking at the in-process store first and then the on-disk store
+        :param key: str                         Cache key
+        :return: object                         Copy of the cached M-phi outputs or None if missing
+        """
+        if key in self._store:
+            self._store.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(self._store[key])
+
+        if self.directory is not None:
+            filename = os.path.join(self.directory, f"{key}.pickle")
+            try:
+                with open(filename, "rb") as f:
+                    value = pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                value = None
+            if value is not None:
+                self._add(key, value)
+                self.disk_hits += 1
+                return copy.deepcopy(value)
+
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        """
+        Stores an entry in the in-process store and, if available, in the on-disk store
+        :param key: str                         Cache key
+        :param value: object                    M-phi outputs
+        :return: None
+        """
+        value = copy.deepcopy(value)
+        self._add(key, value)
+
+        if self.directory is not None:
+            # Write to a temporary file first, so that concurrent readers never see a partial entry
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    pickle.dump(value, f)
+                os.replace(tmp, os.path.join(self.directory, f"{key}.pickle"))
+            except OSError:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+
+    def _add(self, key, value):
+        self._store[key] = value
+        self._store.move_to_end(key)
+        while len(self._store) > self.maxsize:
+            self._store.popitem(last=False)
+
+    def clear(self, disk=False):
+        """
+        Clears the in-process store and the statistics
+        :param disk: bool                       Whether to remove the on-disk entries as well
+        :return: None
+        """
+        self._store.clear()
+        self.hits = self.disk_hits = self.misses = 0
+        if disk and self.directory is not None:
+            for file in os.listdir(self.directory):
+                if file.endswith(".pickle"):
+                    os.remove(os.path.join(self.directory, file))
+
+    def get_stats(self):
+        """
+        Gets hit/miss statistics
+        :return: dict                           Number of hits (in-process and on-disk), misses and the hit ratio
+        """
+        total = self.hits + self.disk_hits + self.misses
+        ratio = (self.hits + self.disk_hits) / total if total > 0 else 0.
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses, "size": len(self._store),
+                "hit_ratio": ratio}
@@ -0,0 +1,243 @@
+"""
+Precomputed moment-curvature response surfaces for standard section catalogues
+Dimensionless M-phi idealisations are tabulated over a grid of section width, height, reinforcement ratio and axial
+load ratio for a fixed material set. Queries equivalent to MomentCurvatureRC.get_mphi are answered by multilinear
+interpolation, without any root solving. Queries outside the grid, or for sections with different materials or
+reinforcement layouts, are left to the exact solver
+Moments are normalised by fc*b*h^2 and curvatures by 1/h
+"""
+import json
+
+import numpy as np
+from scipy.interpolate import RegularGridInterpolator
+
+from analysis.constitutive import concrete_stress
+from analysis.momentcurvaturerc import MomentCurvatureRC
+from analysis.plasticity import Plasticity
+
+# Tabulated quantities of a single grid point
+FIELDS = ("m_target", "first_yield_moment", "first_yield_curvature", "peak_moment", "ultimate_moment",
+          "ultimate_curvature", "critical_moment", "critical_curvature")
+
+# Section parameters that must match the surface for it to be used
+PROPERTIES = ("nlayers", "d", "fc_prime", "fy", "young_mod_s", "soft_method", "k_hard", "fstiff", "distAs")
+
+
+class MPhiSurface:
+    def __init__(self, filename, exact=False):
+        """
+        Loads a precomputed response surface
+        :param filename: str                    Path of the surface without extension (.npy holds the memory-mapped
+                                                table, .json the grid and the material set)
+        :param exact: bool                      Accuracy flag, if True all queries are run through the exact solver
+        """
+        self.filename = filename
+        self.exact = exact
+
+        with open(f"{filename}.json") as f:
+            meta = json.load(f)
+        self.properties = meta["properties"]
+        self.axes = tuple(np.array(meta[axis]) for axis in ("b", "h", "rho", "nu"))
+
+        self.table = np.load(f"{filename}.npy", mmap_mode="r")
+        self.interpolator = RegularGridInterpolator(self.axes, self.table, bounds_error=False, fill_value=np.nan)
+
+        # Statistics
+        self.hits = 0
+        self.fallbacks = 0
+
+    def __getstate__(self):
+        # The memory-mapped table is reopened, rather than copied, in worker processes
+        state = self.__dict__.copy()
+        del state["table"], state["interpolator"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.table = np.load(f"{self.filename}.npy", mmap_mode="r")
+        self.interpolator = RegularGridInterpolator(self.axes, self.table, bounds_error=False, fill_value=np.nan)
+
+    @staticmethod
+    def build(filename, b, h, rho, nu, **properties):
+        """
+        Precomputes the response surface with the exact solver and stores it as a memory-mapped array
+        :param filename: str                    Path of the surface without extension
+        :param b: array                         Section widths in m (e.g. 0.25 to 1.0 in steps of 0.05)
+        :param h: array                         Section heights in m
+        :param rho: array                       Total reinforcement ratios, As/(b*h)
+        :param nu: array                        Axial load ratios, P/(b*h*fc), compression positive
+        :param properties: dict                 Material and reinforcement layout properties of MomentCurvatureRC
+        :return: MPhiSurface                    Loaded response surface
+        """
+        axes = [np.sort(np.asarray(axis, dtype=float)) for axis in (b, h, rho, nu)]
+        section = MomentCurvatureRC(1., 1., 1.)
+        meta = {"properties": {prop: np.asarray(properties.get(prop, getattr(section, prop))).tolist()
+                               for prop in PROPERTIES}}
+        meta.update({name: axis.tolist() for name, axis in zip(("b", "h", "rho", "nu"), axes)})
+        props = {k: v for k, v in meta["properties"].items() if v is not None}
+
+        table = np.lib.format.open_memmap(f"{filename}.npy", mode="w+", dtype=np.float64,
+                                          shape=tuple(len(axis) for axis in axes) + (len(FIELDS), ))
+        table[:] = np.nan
+
+        for idx in np.ndindex(*table.shape[:-1]):
+            bi, hi, rhoi, nui = (axis[i] for axis, i in zip(axes, idx))
+            fc = props["fc_prime"] * 1000
+            p = -nui * bi * hi * fc
+            rebar = rhoi * bi * hi
+
+            try:
+                # Moment capacity of the reinforcement, which is then used as the target of the exact solver
+                section = MomentCurvatureRC(bi, hi, 1., p=p, **props)
+                m_target = float(section.get_mphi(check_reinforcement=True, reinf_test=rebar)) / section.k_hard
+                data, _, _, _, idealization = MomentCurvatureRC(bi, hi, m_target, p=p, **props).get_mphi()
+            except (ValueError, IndexError, TypeError, ZeroDivisionError):
+                continue
+
+            m_norm = fc * bi * hi ** 2
+            table[idx] = [m_target / m_norm, data["first_yield_moment"] / m_norm,
+                          data["first_yield_curvature"] * hi, max(data["moment"][:-1]) / m_norm,
+                          data["moment"][-2] / m_norm, data["curvature"][-2] * hi,
+                          data["moment"][-1] / m_norm, data["phi_critical"] * hi]
+
+        table.flush()
+        with open(f"{filename}.json", "w") as f:
+            json.dump(meta, f, indent=2)
+
+        return MPhiSurface(filename)
+
+    def matches(self, section):
+        """
+        Checks whether a section shares the material set and reinforcement layout of the surface
+        :param section: MomentCurvatureRC       Section to check
+        :return: bool                           True if the surface is applicable
+        """
+        for prop in PROPERTIES:
+            value = np.asarray(getattr(section, prop)).tolist()
+            if value != self.properties[prop]:
+                return False
+        return True
+
+    def get_rebar_ratio(self, b, h, m_target, nu):
+        """
+        Gets the reinforcement ratio of a target moment by inverse interpolation of the tabulated capacities
+        :param b: float                         Section width
+        :param h: float                         Section height
+        :param m_target: float                  Normalised target moment
+        :param nu: float                        Axial load ratio
+        :return: float                          Reinforcement ratio (None, if outside the grid)
+        """
+        rho = self.axes[2]
+        points = np.column_stack((np.full(len(rho), b), np.full(len(rho), h), rho, np.full(len(rho), nu)))
+        capacity = self.interpolator(points)[:, 0]
+        if np.isnan(capacity).any() or np.any(np.diff(capacity) <= 0):
+            return None
+        if not capacity[0] <= m_target <= capacity[-1]:
+            return None
+        return np.interp(m_target, capacity, rho)
+
+    def query(self, section, check_reinforcement=False, reinf_test=0.):
+        """
+        Answers a MomentCurvatureRC.get_mphi query by interpolation
+        :param section: MomentCurvatureRC       Section with all attributes of the query set
+        :param check_reinforcement: bool        Gets moment for reinforcement provided (True) or applied
+                                                optimization for Mtarget (False)
+        :param reinf_test: float                Reinforcement for test
+        :return: tuple                          Outputs matching those of MomentCurvatureRC.get_mphi (None, if the
+                                                exact solver needs to be used)
+        """
+        if self.exact or not self.matches(section):
+            self.fallbacks += 1
+            return None
+
+        b, h = section.b, section.h
+        fc = section.fc_prime * 1000
+        nu = -section.p / (b * h * fc)
+        m_norm = fc * b * h ** 2
+
+        if check_reinforcement:
+            rho = reinf_test / (b * h)
+        else:
+            rho = self.get_rebar_ratio(b, h, section.m_target / m_norm, nu)
+            if rho is None:
+                self.fallbacks += 1
+                return None
+
+        values = self.interpolator([b, h, rho, nu])[0]
+        if np.isnan(values).any():
+            self.fallbacks += 1
+            return None
+        self.hits += 1
+
+        if check_reinforcement:
+            return values[0] * m_norm * section.k_hard
+
+        return self.get_outputs(section, rho, values * np.array([m_norm, m_norm, 1 / h, m_norm, m_norm, 1 / h,
+                                                                 m_norm, 1 / h]))
+
+    def get_outputs(self, section, rho, values):
+        """
+        Assembles the interpolated idealisation in the format of MomentCurvatureRC.get_mphi
+        :param section: MomentCurvatureRC       Queried section
+        :param rho: float                       Reinforcement ratio
+        :param values: ndarray                  Interpolated quantities in physical units, ordered as FIELDS
+        :return: tuple                          Response data, reinforcement, concrete, model and idealisation
+        """
+        _, my_first, phiy_first, m_peak, m_max, phi_max, m_critical, phi_critical = values
+        b, h, m_target = section.b, section.h, section.m_target
+
+        # Concrete properties
+        young_modulus_rc = (3320 * np.sqrt(section.fc_prime) + 6900)
+        _, epsc_prime = concrete_stress(0., section.fc_prime)
+        epsc = np.linspace(epsc_prime * 2 / 500, 10 * epsc_prime, 400)
+        sigma_c, _ = concrete_stress(epsc, section.fc_prime)
+
+        inertia = b * h ** 3 / 12
+        ei_cracked = my_first / phiy_first / (young_modulus_rc * inertia * 1000)
+        phi_yield_nom = m_target * phiy_first / my_first
+        mu_phi = phi_max / phi_yield_nom
+
+        # Plastic hinge length depends on the shear span, hence it is not tabulated
+        lp = Plasticity(lp_name="Priestley", db=20, fy=section.fy, fu=section.fy * section.k_hard,
+                        lc=section.length).get_lp()
+        A_sh = section.TRANSVERSE_LEGS * np.pi * section.TRANSVERSE_DIAMETER ** 2 / 4
+
+        if section.soft_method == "Haselton":
+            # Softening depends on the plastic hinge length, but is closed-form, so it is evaluated directly
+            nu = abs(section.p) / (b * h) / section.fc_prime / 1000
+            ro_sh = A_sh / section.TRANSVERSE_SPACING / b
+            phi_critical, m_critical, _ = section.get_softening_slope(curvature_yield=phiy_first,
+                                                                      curvature_ductility=mu_phi, axial_load_ratio=nu,
+                                                                      transverse_steel_ratio=ro_sh)
+            phi_critical = max(phi_max, phi_critical)
+            if phi_critical == phi_max:
+                phi_critical = phi_max * 1.01
+
+        m_critical = 1e-9 if m_critical <= 0 else m_critical
+        m_model = np.array([1e-9, m_target, m_peak, m_critical])
+        phi_model = np.array([1e-9, phi_yield_nom, phi_max, phi_critical])
+
+        As_factor = 1. if section.AsTotal is None else section.distAs[0]
+        data = {'curvature': np.array([0., phiy_first, phi_max, phi_critical]),
+                'moment': np.array([0., my_first, m_max, m_critical]), 'curvature_ductility': mu_phi,
+                'peak/yield ratio': m_max / my_first, 'reinforcement': rho * b * h * As_factor,
+                'cracked EI': ei_cracked, 'first_yield_moment': my_first, 'first_yield_curvature': phiy_first,
+                'phi_critical': phi_critical, 'fracturing_ductility': phi_critical / phi_yield_nom, "lp": lp,
+                "cover": section.d, "A_sh": A_sh, "spacing": section.TRANSVERSE_SPACING, "b": b, "h": h}
+        reinforcement = {"Strain": np.array([]), "Stress": np.array([])}
+        concrete = {"Strain": epsc, "Stress": sigma_c}
+        MPhi_idealization = {"phi": phi_model, "m": m_model}
+
+        curv_yield = m_target / young_modulus_rc / 1000 / inertia / section.fstiff
+        model = {"yield": {"curvature": curv_yield, "moment": m_target},
+                 "ultimate": {"curvature": mu_phi * phiy_first, "moment": m_max},
+                 "fracturing": {"curvature": phi_critical, "moment": 0}}
+
+        return data, reinforcement, concrete, model, MPhi_idealization
+
+    def get_stats(self):
+        """
+        Gets interpolation statistics
+        :return: dict                           Number of interpolated queries and of fallbacks to the exact solver
+        """
+        return {"hits": self.hits, "fallbacks": self.fallbacks}
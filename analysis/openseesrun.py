@@ -7,6 +7,8 @@ This is  linear elastic analysis in order to obtain demands on structural compon
 import openseespy.opensees as op
 import numpy as np
 
+from utils.profiler import count
+
 
 class OpenSeesRun:
     def __init__(self, data, cross_sections, fstiff=0.5, hinge=None, pflag=False, direction=0, system="perimeter",
@@ -687,6 +689,7 @@ class OpenSeesRun:
         # Number of bays in x and y directions, spans
         nbays_x, spans_x, nbays_y, spans_y = self.get_quantities()
 
+        count("opensees_models")
         self.wipe()
         if self.flag3d:
             op.model('Basic', '-ndm', 3, '-ndf', 6)
@@ -1041,6 +1044,7 @@ class OpenSeesRun:
                 total_mass[i] += op.nodeMass(node, i + 1)
 
         # Compute the eigenvectors (solver)
+        count("eigen_solves")
         lam = None
         try:
             lam = op.eigen(num_modes)
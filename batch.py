@@ -0,0 +1,205 @@
+"""
+Runs IPBSD over a portfolio of building cases concurrently
+The cases are listed in a JSON manifest, e.g.
+{
+    "defaults": {"limit_eal": 1.0, "analysis_type": 3, "flag3d": true, "hold_flag": true},
+    "cases": [
+        {"name": "Case1", "input_filename": "Case1/ipbsd_input.csv", "hazard_filename": "hazard.pkl",
+         "spo_filename": "Case1/spo.csv", "slf_directory": "Case1/slfoutput", "target_mafc": 2e-4},
+        ...
+    ]
+}
+where the arguments of each case are those of Main (case arguments override the defaults) and relative paths are
+taken from the directory of the manifest. Each case is run in its own output directory, with its own log. Read-only
+assets are prepared once and shared by all workers: the hazard stores (memory mapped), the SLF bundles and the
+memoised stages of the framework
+"""
+import contextlib
+import inspect
+import json
+import os
+import sys
+import timeit
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from main import Main
+from src.hazard import Hazard
+from tools.slf import SLF, get_bundle_filename
+from utils.ipbsd_utils import create_folder, export_results, initiate_msg, success_msg, error_msg
+
+# Arguments of Main given as paths
+PATHS = ("input_filename", "hazard_filename", "spo_filename", "slf_directory", "output_path", "gravity_cs",
+         "solution_filex", "solution_filey", "solution_file", "mphi_cache_dir", "mphi_surface", "spo2ida_table",
+         "pipeline_cache_dir", "hazard_store_dir", "slf_store_dir")
+
+
+def get_summary(master):
+    """
+    Gets the summary of a case
+    :param master: Master                   Master object of the case, after running
+    :return: dict                           EAL, MAFC, period ranges, periods and weight of the design solution
+    """
+    summary = {"EAL": master.eal, "MAFC": master.ipbsd.target_mafc}
+    for direction, limits in master.period_limits.items():
+        tag = {"1": "x", "2": "y"}.get(direction, direction)
+        summary[f"T lower {tag}"], summary[f"T upper {tag}"] = limits
+
+    # Design solution, after the iterations if run, otherwise the optimal section combination
+    opt_sol = master.opt_sol
+    if opt_sol is None and master.combinations is not None:
+        if isinstance(master.combinations, tuple):
+            opt_sol = {"x_seismic": master.combinations[0]["opt_sol"], "y_seismic": master.combinations[1]["opt_sol"]}
+        else:
+            opt_sol = master.combinations["opt_sol"]
+
+    if isinstance(opt_sol, dict) and "x_seismic" in opt_sol:
+        summary["T x"] = opt_sol["x_seismic"].get("T")
+        summary["T y"] = opt_sol["y_seismic"].get("T")
+        summary["Weight"] = opt_sol["x_seismic"].get("Weight")
+    elif opt_sol is not None:
+        summary["T x"] = opt_sol.get("T")
+        summary["Weight"] = opt_sol.get("Weight")
+    return summary
+
+
+def run_case(name, arguments, log_filename):
+    """
+    Runs a case, in a worker process
+    :param name: str                        Case name
+    :param arguments: dict                  Arguments of Main
+    :param log_filename: Path               Log of the case
+    :return: dict                           Summary of the case
+    """
+    start_time = timeit.default_timer()
+    summary = {"Case": name}
+    with open(log_filename, "w") as log, contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            master = Main(**arguments).run_master()
+            summary.update(get_summary(master))
+            summary["Status"] = "completed"
+        except Exception:
+            traceback.print_exc()
+            summary["Status"] = "failed"
+    summary["Running time"] = timeit.default_timer() - start_time
+    return summary
+
+
+def prepare_assets(cases):
+    """
+    Prepares the read-only assets shared by the cases, once, before the workers start: fits the hazards into the
+    shared hazard stores and packs the SLFs into bundles of the shared SLF stores
+    :param cases: dict                      Arguments of Main of each case
+    :return: None
+    """
+    for directory in {arguments["hazard_store_dir"] for arguments in cases.values()}:
+        create_folder(directory)
+    for filename, directory in {(arguments["hazard_filename"], arguments["hazard_store_dir"])
+                                for arguments in cases.values()}:
+        Hazard(filename, directory)
+
+    # The bundles are packed into the shared SLF stores, the SLF directories are left unchanged
+    for directory, store_dir in {(Path(arguments["slf_directory"]), arguments.get("slf_store_dir"))
+                                 for arguments in cases.values()}:
+        if store_dir is None:
+            continue
+        create_folder(store_dir)
+        slf = SLF(directory, None, None, geometry=True, bundle=get_bundle_filename(directory, store_dir))
+        if slf.get_files() and not slf.check_bundle():
+            SLF.pack_bundle(directory, slf.bundle)
+
+
+class Batch:
+    def __init__(self, manifest, output_path=None, workers=None):
+        """
+        Initializes the batch of cases
+        :param manifest: str                    Path of the JSON manifest of the cases
+        :param output_path: str                 Outputs path of the batch, with an output directory for each case
+                                                (unless given in the manifest) and the summary. If None, the directory
+                                                of the manifest is used
+        :param workers: int                     Number of cases run concurrently. If None, the number of CPUs is used
+        """
+        self.manifest = Path(manifest)
+        self.output_path = Path(output_path) if output_path is not None else self.manifest.parent
+        self.workers = workers or os.cpu_count()
+        # Read-only assets shared by all cases
+        self.shared = self.output_path / "Shared"
+
+        self.cases = self.read_manifest()
+
+    def read_manifest(self):
+        """
+        Reads the cases of the manifest
+        :return: dict                           Arguments of Main of each case
+        """
+        with open(self.manifest) as f:
+            manifest = json.load(f)
+
+        parameters = inspect.signature(Main).parameters
+        defaults = manifest.get("defaults", {})
+        cases = {}
+        for i, case in enumerate(manifest["cases"]):
+            arguments = {**defaults, **case}
+            name = str(arguments.pop("name", f"Case{i + 1}"))
+            if name in cases:
+                raise ValueError(f"[EXCEPTION] Duplicate case name in the manifest: {name}!")
+
+            unknown = [argument for argument in arguments if argument not in parameters]
+            if unknown:
+                raise ValueError(f"[EXCEPTION] Unknown arguments of case {name}: {', '.join(unknown)}!")
+
+            for argument in PATHS:
+                if isinstance(arguments.get(argument), str):
+                    arguments[argument] = self.manifest.parent / arguments[argument]
+            arguments.setdefault("output_path", self.output_path / name)
+            arguments.setdefault("hazard_store_dir", self.shared / "hazard")
+            arguments.setdefault("slf_store_dir", self.shared / "slf")
+            arguments.setdefault("pipeline_cache_dir", self.shared / "pipeline")
+
+            missing = [argument for argument, parameter in parameters.items()
+                       if parameter.default is inspect.Parameter.empty and argument not in arguments]
+            if missing:
+                raise ValueError(f"[EXCEPTION] Missing arguments of case {name}: {', '.join(missing)}!")
+            cases[name] = arguments
+        return cases
+
+    def run(self):
+        """
+        Runs all cases concurrently and writes the summary table
+        :return: DataFrame                      Summary of the cases
+        """
+        initiate_msg(f"Running {len(self.cases)} cases on {self.workers} workers...")
+        create_folder(self.output_path)
+        prepare_assets(self.cases)
+
+        futures = {}
+        with ProcessPoolExecutor(self.workers) as executor:
+            for name, arguments in self.cases.items():
+                create_folder(arguments["output_path"])
+                log_filename = Path(arguments["output_path"]) / "ipbsd.log"
+                futures[name] = executor.submit(run_case, name, arguments, log_filename)
+
+            summaries = []
+            for name, future in futures.items():
+                summary = future.result()
+                if summary["Status"] == "completed":
+                    success_msg(f"{name} completed in {summary['Running time']:.1f} s")
+                else:
+                    error_msg(f"{name} failed, see {Path(self.cases[name]['output_path']) / 'ipbsd.log'}")
+                summaries.append(summary)
+
+        summary = pd.DataFrame(summaries)
+        export_results(self.output_path / "summary", summary, "csv")
+        success_msg(f"Summary of the cases written to {self.output_path / 'summary.csv'}")
+        return summary
+
+
+if __name__ == "__main__":
+    """
+    python batch.py manifest.json [workers]
+    """
+    batch = Batch(sys.argv[1], workers=int(sys.argv[2]) if len(sys.argv) > 2 else None)
+    batch.run()
@@ -0,0 +1,232 @@
+"""
+Benchmarks of the IPBSD kernels (modal analysis, cross-section enumeration, M-phi, SPO2IDA, MAFC targeting, SLF
+loading and OpenSees analyses), see benchmarks/kernels.py
+Each run is appended to a history file, and the median times are compared with those of a stored baseline: kernels
+slower than the baseline by more than the tolerance are flagged as regressions. Timings depend on the machine, the
+baseline is to be updated (--update-baseline) on the machine the benchmarks are run on
+python benchmark.py [names] [--slow] [--tolerance 0.2] [--update-baseline]
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import warnings
+from datetime import datetime
+from pathlib import Path
+
+from utils.ipbsd_utils import initiate_msg, success_msg, error_msg
+
+BENCHMARK_DIR = Path(__file__).parent / "benchmarks"
+
+
+def time_function(function, repeat, warmup=1):
+    """
+    Times a function
+    :param function: callable               Function, called without arguments
+    :param repeat: int                      Number of timed calls
+    :param warmup: int                      Number of calls before timing, e.g. to fill caches of imports
+    :return: dict                           Number of calls, minimum, median and mean wall times and mean CPU time, [s]
+    """
+    for _ in range(warmup):
+        function()
+    wall = []
+    cpu = []
+    for _ in range(repeat):
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        function()
+        wall.append(time.perf_counter() - start_wall)
+        cpu.append(time.process_time() - start_cpu)
+    return {"repeat": repeat, "min": min(wall), "median": statistics.median(wall), "mean": statistics.mean(wall),
+            "cpu": statistics.mean(cpu)}
+
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    Compares median times with those of a baseline
+    :param results: dict                    Timings of each benchmark
+    :param baseline: dict                   Timings of each benchmark of the baseline
+    :param tolerance: float                 Relative slow down (speed up) beyond which a benchmark is flagged as a
+                                            regression (improvement)
+    :return: dict                           Ratio to the baseline and status of each benchmark: "regression",
+                                            "improvement", "unchanged" or "new" (not in the baseline)
+    """
+    comparison = {}
+    for name, timing in results.items():
+        if name not in baseline:
+            comparison[name] = {"ratio": None, "status": "new"}
+            continue
+        ratio = timing["median"] / baseline[name]["median"]
+        if ratio > 1 + tolerance:
+            status = "regression"
+        elif ratio < 1 - tolerance:
+            status = "improvement"
+        else:
+            status = "unchanged"
+        comparison[name] = {"ratio": ratio, "status": status}
+    return comparison
+
+
+def get_commit():
+    """
+    Gets the current git commit
+    :return: str                            Commit hash, None if not in a git repository
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class BenchmarkSuite:
+    def __init__(self, benchmarks, history_filename=None, baseline_filename=None, tolerance=0.2):
+        """
+        Initializes the benchmark suite
+        :param benchmarks: dict                 Benchmarks: setup function returning the timed function, number of
+                                                timed calls and whether the benchmark is slow
+        :param history_filename: str            History of the runs, as JSON lines
+        :param baseline_filename: str           Baseline timings, as JSON
+        :param tolerance: float                 Relative slow down beyond which a benchmark is flagged as a regression
+        """
+        self.benchmarks = benchmarks
+        self.history_filename = Path(history_filename or BENCHMARK_DIR / "history.jsonl")
+        self.baseline_filename = Path(baseline_filename or BENCHMARK_DIR / "baseline.json")
+        self.tolerance = tolerance
+
+    def select(self, names=None, slow=False):
+        """
+        Selects benchmarks
+        :param names: list                      Names of the benchmarks, or prefixes (e.g. "mphi"). If None, all
+        :param slow: bool                       Whether to include the slow benchmarks when no names are given
+        :return: list                           Names of the selected benchmarks
+        """
+        if not names:
+            return [name for name, benchmark in self.benchmarks.items() if slow or not benchmark["slow"]]
+
+        selected = []
+        for prefix in names:
+            matches = [name for name in self.benchmarks if name == prefix or name.startswith(prefix)]
+            if not matches:
+                raise ValueError(f"[EXCEPTION] Unknown benchmark: {prefix}!")
+            selected.extend(name for name in matches if name not in selected)
+        return selected
+
+    def run(self, names=None, slow=False):
+        """
+        Runs benchmarks, outputs and warnings of the kernels are discarded
+        :param names: list                      Names of the benchmarks, or prefixes. If None, all
+        :param slow: bool                       Whether to include the slow benchmarks when no names are given
+        :return: dict                           Timings of each benchmark
+        """
+        results = {}
+        for name in self.select(names, slow):
+            benchmark = self.benchmarks[name]
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                function = benchmark["setup"]()
+                results[name] = time_function(function, benchmark["repeat"])
+        return results
+
+    def get_record(self, results):
+        """
+        Gets a record of a run
+        :param results: dict                    Timings of each benchmark
+        :return: dict                           Date, commit, machine, versions and timings
+        """
+        return {"date": datetime.now().isoformat(timespec="seconds"), "commit": get_commit(),
+                "machine": platform.node(), "python": platform.python_version(), "results": results}
+
+    def append_history(self, results):
+        """
+        Appends a run to the history
+        :param results: dict                    Timings of each benchmark
+        :return: None
+        """
+        self.history_filename.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.history_filename, "a") as f:
+            f.write(json.dumps(self.get_record(results)) + "\n")
+
+    def read_history(self):
+        """
+        Reads the history
+        :return: list                           Records of the runs, oldest first
+        """
+        if not self.history_filename.exists():
+            return []
+        with open(self.history_filename) as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def read_baseline(self):
+        """
+        Reads the baseline
+        :return: dict                           Timings of each benchmark of the baseline, empty if there is none
+        """
+        if not self.baseline_filename.exists():
+            return {}
+        with open(self.baseline_filename) as f:
+            return json.load(f)["results"]
+
+    def update_baseline(self, results):
+        """
+        Updates the baseline with the timings of the benchmarks run, the others are kept
+        :param results: dict                    Timings of each benchmark
+        :return: None
+        """
+        record = self.get_record({**self.read_baseline(), **results})
+        tmp = self.baseline_filename.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(record, f, indent=2)
+        os.replace(tmp, self.baseline_filename)
+
+    def compare(self, results):
+        """
+        Compares timings with those of the baseline
+        :param results: dict                    Timings of each benchmark
+        :return: dict                           Ratio to the baseline and status of each benchmark
+        """
+        return compare(results, self.read_baseline(), self.tolerance)
+
+
+if __name__ == "__main__":
+    from benchmarks.kernels import BENCHMARKS
+
+    parser = argparse.ArgumentParser(description="Benchmarks of the IPBSD kernels")
+    parser.add_argument("names", nargs="*", help="Benchmarks to run, or prefixes of their names (all if none)")
+    parser.add_argument("--slow", action="store_true", help="Include the slow benchmarks (OpenSees SPO)")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Relative slow down flagged as a regression")
+    parser.add_argument("--update-baseline", action="store_true", help="Store the timings as the baseline")
+    parser.add_argument("--list", action="store_true", help="List the benchmarks")
+    args = parser.parse_args()
+
+    suite = BenchmarkSuite(BENCHMARKS, tolerance=args.tolerance)
+    if args.list:
+        for name, benchmark in BENCHMARKS.items():
+            print(f"{name}{' (slow)' if benchmark['slow'] else ''}")
+        sys.exit(0)
+
+    initiate_msg(f"Running benchmarks: {', '.join(suite.select(args.names, args.slow))}")
+    results = suite.run(args.names, args.slow)
+    suite.append_history(results)
+    comparison = suite.compare(results)
+
+    print(f"{'Benchmark':<20}{'Median [ms]':>14}{'Min [ms]':>12}{'Baseline':>12}  Status")
+    for name, timing in results.items():
+        ratio = comparison[name]["ratio"]
+        print(f"{name:<20}{timing['median'] * 1e3:>14.3f}{timing['min'] * 1e3:>12.3f}"
+              f"{'' if ratio is None else f'{ratio:.2f}x':>12}  {comparison[name]['status']}")
+
+    if args.update_baseline:
+        suite.update_baseline(results)
+        success_msg(f"Baseline updated: {suite.baseline_filename}")
+
+    regressions = [name for name, item in comparison.items() if item["status"] == "regression"]
+    if regressions and not args.update_baseline:
+        error_msg(f"Regressions beyond {args.tolerance:.0%} of the baseline: {', '.join(regressions)}")
+        sys.exit(1)
+    success_msg(f"Timings appended to {suite.history_filename}")
@@ -0,0 +1,163 @@
+"""
+Benchmarked kernels of IPBSD, with fixtures built from the sample/sample1 data
+Each benchmark is a setup function, called once and not timed, returning the function that is timed. Slow benchmarks
+(OpenSees pushover) are only run when asked for
+"""
+import functools
+import pickle
+from pathlib import Path
+
+import numpy as np
+
+from analysis.analysisMethods import run_opensees_analysis
+from analysis.modalAnalysis import ModalAnalysis
+from analysis.momentcurvaturerc import MomentCurvatureRC
+from src.crossSection import CrossSection
+from src.hazardIndex import HazardIndex
+from src.input import Input
+from src.MAFC import solve_cy
+from tools.slf import SLF
+from tools.spo2ida import SPO2IDA
+from utils import cache_store
+
+SAMPLE = Path(__file__).parents[1] / "sample/sample1"
+FSTIFF = 0.5
+
+
+@functools.lru_cache(maxsize=None)
+def get_data():
+    """
+    Reads the inputs of the sample building (2 storeys, space frame)
+    :return: Input                          IPBSD input object
+    """
+    data = Input(flag3d=True)
+    data.read_inputs(SAMPLE / "ipbsd_input.csv")
+    data.run_all()
+    data.get_input_arguments()
+    return data
+
+
+@functools.lru_cache(maxsize=None)
+def read_cache(name):
+    """
+    Reads a cached output of the sample building
+    :param name: str                        File name in the Cache directory, without extension
+    :return: object                         Cached output
+    """
+    return cache_store.read_cache(SAMPLE / f"Cache/{name}", lazy=False)
+
+
+def get_frame(nst):
+    """
+    Gets a frame of the sample building with nst storeys: the sections, storey heights and masses of the first storey
+    are repeated along the height, and the roof is that of the sample building
+    :param nst: int                         Number of storeys
+    :return: dict                           Frame properties
+    """
+    data = get_data()
+    solution = read_cache("optimal_solution")["x_seismic"]
+    idx = [0] * (nst - 1) + [data.nst - 1]
+    hce = np.array([solution[f"he{i + 1}"] for i in idx])
+    hci = np.array([solution[f"hi{i + 1}"] for i in idx])
+    b = np.array([solution[f"b{i + 1}"] for i in idx])
+    h = np.array([solution[f"h{i + 1}"] for i in idx])
+    nbays = len(data.spans_x)
+    return {"nst": nst, "spans": data.spans_x, "heights": np.array(data.heights)[idx],
+            "masses": np.array(data.masses)[idx] / 2, "fc": data.fc,
+            "props": (hce ** 2, hci ** 2, hce ** 4 / 12, hci ** 4 / 12, np.tile(b * h, (nbays, 1)),
+                      np.tile(b * h ** 3 / 12, (nbays, 1)))}
+
+
+def setup_modal_analysis(nst):
+    frame = get_frame(nst)
+
+    def run():
+        ma = ModalAnalysis(*frame["props"], frame["nst"], frame["spans"], frame["heights"], frame["masses"], 1,
+                           frame["fc"], FSTIFF, just_period=True, single_mode=True)
+        return ma.run_ma()
+    return run
+
+
+def setup_cross_section():
+    data = get_data()
+
+    def run():
+        cs = CrossSection(data.nst, len(data.spans_x), data.fy, data.fc, data.spans_x, data.heights, 1,
+                          np.array(data.masses) / 2, FSTIFF, 0.3, 0.7)
+        cs.elements = cs.define_constraint_function()
+        return cs.get_all_solutions()
+    return run
+
+
+def setup_mphi_beam():
+    def run():
+        return MomentCurvatureRC(0.4, 0.7, 136.78, d=0.03, k_hard=1.0).get_mphi()
+    return run
+
+
+def setup_mphi_column():
+    def run():
+        return MomentCurvatureRC(0.45, 0.45, 180., length=1.75, p=-600., nlayers=1, d=0.03, k_hard=1.0).get_mphi()
+    return run
+
+
+def setup_spo2ida():
+    def run():
+        return SPO2IDA(2.5, 0.1, 0.4, 0.3, 5., 0.33, 1.).run_spo2ida_allT()
+    return run
+
+
+def setup_mafc():
+    with open(SAMPLE / "hazard/hazard.pkl", "rb") as f:
+        hazard = HazardIndex(pickle.load(f))
+    solution = read_cache("optimal_solution")
+    period = [solution["x_seismic"]["T"], solution["y_seismic"]["T"]]
+    gamma = [solution["x_seismic"]["Part Factor"], solution["y_seismic"]["Part Factor"]]
+
+    def run():
+        return solve_cy([0.8, 1.2, 1.6], 2e-4, gamma, 1.0, period, hazard)
+    return run
+
+
+def setup_slf():
+    data = get_data()
+
+    def run():
+        return SLF(SAMPLE / "slfoutput", data.y[1], data.nst, True, 1.0, True).select_file_type()
+    return run
+
+
+def setup_opensees_modal():
+    data = get_data()
+    solution = read_cache("optimal_solution")
+
+    def run():
+        return run_opensees_analysis(1, solution, None, data, None, FSTIFF, True)
+    return run
+
+
+def setup_opensees_spo():
+    data = get_data()
+    solution = read_cache("optimal_solution")
+    hinge = read_cache("hinge_models")
+    pattern = np.round(read_cache("modes"), 2)[:, 0]
+
+    def run():
+        return run_opensees_analysis(0, solution, hinge, data, None, FSTIFF, True, pattern)
+    return run
+
+
+# Benchmarks: setup function, number of timed runs and whether the benchmark is slow
+BENCHMARKS = {
+    "modal_analysis_2": {"setup": functools.partial(setup_modal_analysis, 2), "repeat": 100, "slow": False},
+    "modal_analysis_5": {"setup": functools.partial(setup_modal_analysis, 5), "repeat": 100, "slow": False},
+    "modal_analysis_10": {"setup": functools.partial(setup_modal_analysis, 10), "repeat": 20, "slow": False},
+    "cross_section": {"setup": setup_cross_section, "repeat": 3, "slow": False},
+    "mphi_beam": {"setup": setup_mphi_beam, "repeat": 10, "slow": False},
+    "mphi_column": {"setup": setup_mphi_column, "repeat": 10, "slow": False},
+    "spo2ida": {"setup": setup_spo2ida, "repeat": 50, "slow": False},
+    "mafc": {"setup": setup_mafc, "repeat": 50, "slow": False},
+    "slf": {"setup": setup_slf, "repeat": 10, "slow": False},
+    "opensees_modal": {"setup": setup_opensees_modal, "repeat": 5, "slow": False},
+    "opensees_spo": {"setup": setup_opensees_spo, "repeat": 1, "slow": True},
+}
@@ -4,6 +4,8 @@ Runs the integrated seismic risk and economic loss driven framework
 from pathlib import Path
 
 from src.master import Master
+from utils import profiler
+from utils.ipbsd_utils import success_msg
 
 
 class Main:
@@ -11,7 +13,10 @@ class Main:
                  output_path, analysis_type=1, damping=.05, num_modes=3, iterate=False, maxiter=20, fstiff=0.5,
                  rebar_cover=0.03, export=False, hold_flag=False, overstrength=None, repl_cost=None,
                  gravity_cs=None, eal_correction=True, perform_scaling=True, solution_filex=None, solution_filey=None,
-                 solution_file=None, edp_profiles=None, flag3d=False):
+                 solution_file=None, edp_profiles=None, flag3d=False, mphi_cache_dir=None,
+                 mphi_surface=None, mphi_exact=False, workers=None, redesign_tol=None, spo2ida_table=None,
+                 spo2ida_exact=False, pipeline_cache_dir=None, hazard_store_dir=None, slf_store_dir=None,
+                 profile_filename=None, profile_filetype="json"):
         """
         Initializes IPBSD
         Files:
@@ -58,7 +63,40 @@ class Main:
         :param solution_filex: str          Path to solution file to be used for design in X direction
         :param solution_filey: str          Path to solution file to be used for design in Y direction (for 3D)
         :param edp_profiles: list           EDP profile shape to use as a guess
-        :param solution_file: str           Solution file containing a dictionary for the Space System, 3D (*.pickle)
+        :param solution_file: str           Solution file containing a dictionary for the Space System, 3D (*.npz cache
+                                            file, e.g. Cache/optimal_solution.npz, or *.pickle)
+        Caching:
+        :param mphi_cache_dir: str          Directory of the on-disk M-phi cache shared across runs and processes.
+                                            If None, M-phi results are cached in memory for the current run only
+        :param mphi_surface: str            Path of a precomputed M-phi response surface (see MPhiSurface.build),
+                                            without extension. Sections within its grid are interpolated
+        :param mphi_exact: bool             Accuracy flag, runs the exact M-phi solver even if a surface is provided
+        :param spo2ida_table: str           Path of a precomputed SPO2IDA collapse capacity table (see
+                                            SPO2IDATable.build), without extension. IDA curves are then not exported
+        :param spo2ida_exact: bool          Accuracy flag, runs the exact SPO2IDA tool even if a table is provided
+        :param pipeline_cache_dir: str      Directory of the results of the framework stages (inputs, hazard, design
+                                            limits, transformations, section combinations), stored by the content of
+                                            their inputs. Re-runs skip every stage whose inputs are unchanged. If None,
+                                            all stages are run
+        :param hazard_store_dir: str        Directory of the hazard store (fitted and preprocessed hazard, keyed by the
+                                            content of the hazard file), e.g. shared by several cases. If None, the
+                                            outputs path is used
+        :param slf_store_dir: str           Directory of the SLF bundles (see SLF.pack_bundle, keyed by the SLF
+                                            directory), e.g. shared by several cases. If None, or if the SLFs were not
+                                            packed into it, the bundle within the SLF directory is used, if any
+        Profiling:
+        :param profile_filename: str        File to export the wall and CPU times of the stages and iteration phases,
+                                            and the counts of fsolve calls, OpenSees model builds, eigen-solves and
+                                            M-phi evaluations, to. If None, the framework is not profiled
+        :param profile_filetype: str        "json" (summary and spans) or "chrome" (Chrome trace)
+        Parallelism:
+        :param workers: int                 Number of worker processes designing the elements concurrently. If None,
+                                            the elements are designed serially
+        Iterations:
+        :param redesign_tol: dict           Incremental design, elements whose demands (relative tolerance, "demands")
+                                            and section dimensions (absolute tolerance in m, "sections") changed
+                                            within the tolerances keep the design of the previous iteration, e.g.
+                                            {"demands": 0.01, "sections": 0.}. If None, all elements are redesigned
         """
         self.input_filename = input_filename
         self.hazard_filename = hazard_filename
@@ -86,22 +124,48 @@ class Main:
         self.solution_file = solution_file
         self.edp_profiles = edp_profiles
         self.flag3d = flag3d
+        self.mphi_cache_dir = mphi_cache_dir
+        self.mphi_surface = mphi_surface
+        self.mphi_exact = mphi_exact
+        self.spo2ida_table = spo2ida_table
+        self.spo2ida_exact = spo2ida_exact
+        self.workers = workers
+        self.redesign_tol = redesign_tol
+        self.pipeline_cache_dir = pipeline_cache_dir
+        self.hazard_store_dir = hazard_store_dir
+        self.slf_store_dir = slf_store_dir
+        self.profile_filename = profile_filename
+        self.profile_filetype = profile_filetype
 
     def run_master(self):
-        master = Master(self)
+        """
+        Runs the framework
+        :return: Master                     Master object, holding the outputs of the framework
+        """
+        if self.profile_filename is not None:
+            profiler.enable()
+
+        try:
+            master = Master(self)
+
+            # read inputs
+            master.read_input()
 
-        # read inputs
-        master.read_input()
+            # perform IPBSD calculations
+            master.perform_calculations()
 
-        # perform IPBSD calculations
-        master.perform_calculations()
+            # get all section combinations
+            master.get_all_section_combinations()
 
-        # get all section combinations
-        master.get_all_section_combinations()
+            # Iterative phase
+            if not self.hold_flag:
+                master.perform_iterations()
+        finally:
+            if self.profile_filename is not None:
+                profiler.disable().export(self.profile_filename, self.profile_filetype)
+                success_msg(f"Profile exported to {self.profile_filename}")
 
-        # Iterative phase
-        if not self.hold_flag:
-            master.perform_iterations()
+        return master
 
 
 if __name__ == "__main__":
@@ -8,6 +8,8 @@ from scipy.interpolate import interp1d
 from scipy.stats import gmean
 from scipy.stats import lognorm
 
+from utils.cache_store import open_cache
+
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -137,8 +139,8 @@ gm_path = directory.parents[0] / '.applications/case1/GroundMotions'
 rs_path = directory.parents[0] / '.applications/case1/Output1/RS.pickle'
 outputDir = directory.parents[0] / ".applications/case1/Output1"
 
-with open(outputDir/"Cache/modelOutputs.pickle", 'rb') as file:
-    spo = pickle.load(file)
+with open_cache(outputDir/"Cache/modelOutputs") as model_outputs:
+    dr_model = model_outputs["SPO_idealized"][0][-1]
 
 with open(outputDir/"RCMRF/ida_cache.pickle", 'rb') as file:
     ida = pickle.load(file)
@@ -146,7 +148,6 @@ with open(outputDir/"RCMRF/ida_cache.pickle", 'rb') as file:
 dt_file = np.array(pd.read_csv(gm_path/'GMR_dts.txt',header=None)[0])
 gm_file = list(pd.read_csv(gm_path/'GMR_names1.txt',header=None)[0])
 
-dr_model = spo["SPO_idealized"][0][-1]
 mtdisp = ida["mtdisp"]
 im_spl = ida["im_spl"]
 
@@ -3,8 +3,13 @@ verifies mean annual frequency of collapse (MAFC) condition
 optimization function to automatically select a Say satisfying the MAFC condition
 """
 import numpy as np
+from scipy.special import ndtr
 from scipy.stats import lognorm
 from scipy.interpolate import interp1d
+from scipy.optimize import brentq
+
+# Standard normal quantile at which the fragility is taken as certain (non-)exceedance when bracketing the median
+BRACKET_Z = 8.
 
 
 class MAFC:
@@ -27,16 +32,45 @@ class MAFC:
         self.sa_haz = sa_haz
         self.omega = omega
         self.hazard = hazard
+        # Treated hazard curve, reused for every evaluation of the MAFC
+        self.s = None
+        self.H = None
+        if self.hazard:
+            self.prepare_hazard()
+
+    def prepare_hazard(self):
+        """
+        Treats the hazard input to avoid errors and precomputes the terms of the integration that depend on the hazard
+        curve only, so that they are reused for every fragility function
+        We strip out:
+         1. the negative H values (usually at the beginning)
+         2. the points with constant s (usually at the end)
+        :return: None
+        """
+        sa_haz = np.asarray(self.sa_haz, dtype=float)
+        Hs = np.asarray(self.Hs, dtype=float)
+
+        # Do first strip
+        s_f = sa_haz[Hs > 0]
+        H_f = Hs[Hs > 0]
+
+        # Do second strip
+        keep = np.append(H_f[:-1] - Hs[1:len(H_f)] > 0, True)
+        self.s = s_f[keep]
+        self.H = H_f[keep]
+
+        # Hazard curve is assumed linear in logspace between discrete points
+        self.ds = np.diff(self.s)
+        self.dHds = np.log(self.H[1:] / self.H[:-1]) / self.ds
+        self.exp_dH = np.exp(self.dHds * self.ds)
 
     def calc_mafe_direct_im_based(self, eta, beta):
         """
         Details:
         Compute the MAFE of a limit state defined via a fitted lognormal
         distribution by integrating directly with the  hazard curve
-        Treat the hazard input to avoid errors.
-        We strip out:
-         1. the negative H values (usually at the beginning)
-         2. the points with constant s (usually at the end)
+        The hazard curve is treated once, see prepare_hazard
+        Fragility functions may be given as arrays of (eta, beta) pairs, which are integrated at once
         Information:
         Author: Gerard J. O'Reilly
         First Version: April 2020
@@ -46,60 +80,90 @@ class MAFC:
         Seismic Risk for Buildings. Earthquake Spectra 2004; 20(4):
         1239–1263. DOI: 10.1193/1.1809129.
         Inputs:
-        :param eta: float                           Fragility function median (intensity)
-        :param beta: float                          Fragility function dispersion (total)
-        :return: float                              Mean annual frequency of exceedance
+        :param eta: float or array                  Fragility function median (intensity)
+        :param beta: float or array                 Fragility function dispersion (total)
+        :return: float or array                     Mean annual frequency of exceedance
         """
+        if self.s is None:
+            self.prepare_hazard()
+        eta, beta = np.broadcast_arrays(np.asarray(eta, dtype=float), np.asarray(beta, dtype=float))
 
-        # Do first strip
-        s_f = []
-        H_f = []
-        for aa, bb in zip(self.sa_haz, self.Hs):
-            if bb > 0:
-                s_f.append(aa)
-                H_f.append(bb)
-
-        # Do second strip
-        s_ff = []
-        H_ff = []
-        for i in range(len(s_f) - 1):
-            if H_f[i] - self.Hs[i + 1] > 0:
-                s_ff.append(s_f[i])
-                H_ff.append(H_f[i])
-        s_ff.append(s_f[-1])
-        H_ff.append(H_f[-1])
-
-        # Overwrite the initial variable for convenience
-        s = s_ff
-        H = H_ff
-
-        # First we compute the PDF value of the fragility at each of the discrete
+        # First we compute the CDF value of the fragility at each of the discrete
         # hazard curve points
-        p = lognorm.cdf(s, beta, scale=eta)
+        with np.errstate(divide="ignore"):
+            p = ndtr((np.log(self.s) - np.log(eta)[..., None]) / beta[..., None])
 
         # This function computes the MAF using Method 1 outlined in
         # Porter et al. [2004]
         # This assumes that the hazard curve is linear in logspace between
         # discrete points among others
-
-        # Initialise some arrays
-        ds = []
-        ms = []
-        dHds = []
-        dp = []
-        dl = []
-
-        for i in np.arange(len(s) - 1):
-            ds.append(s[i + 1] - s[i])
-            ms.append(s[i] + ds[i] * 0.5)
-            dHds.append(np.log(H[i + 1] / H[i]) / ds[i])
-            dp.append(p[i + 1] - p[i])
-            dl.append(p[i] * H[i] * (1 - np.exp(dHds[i] * ds[i])) - dp[i] / ds[i] * H[i] * (
-                        np.exp(dHds[i] * ds[i]) * (ds[i] - 1 / dHds[i]) + 1 / dHds[i]))
+        H = self.H[:-1]
+        dp = np.diff(p, axis=-1)
+        dl = p[..., :-1] * H * (1 - self.exp_dH) - dp / self.ds * H * (
+                self.exp_dH * (self.ds - 1 / self.dHds) + 1 / self.dHds)
 
         # Compute the MAFE
-        l = sum(dl)
-        return l
+        l = dl.sum(axis=-1)
+        return l if l.ndim else float(l)
+
+    def get_dispersion(self):
+        """
+        Gets the dispersion of the collapse fragility, independent of the spectral acceleration at yield
+        :return: float                              Fragility function dispersion (total)
+        """
+        return np.log(self.r[1]) - np.log(min(self.r[0], self.r[2]))
+
+    def bracket_median(self, beta):
+        """
+        Brackets the median collapse intensity meeting the target MAFC from the range of the hazard curve
+        The MAFC decreases monotonically with the median, from the full range of the hazard curve, with all of its
+        points beyond the median, to zero, with all of its points below the median
+        :param beta: float                          Fragility function dispersion (total)
+        :return: float, float                       Lower and upper bounds of the median, [g]
+        """
+        if self.s is None:
+            self.prepare_hazard()
+        low = self.s[0] * np.exp(-BRACKET_Z * beta)
+        high = self.s[-1] * np.exp(BRACKET_Z * beta)
+
+        if not self.calc_mafe_direct_im_based(high, beta) < self.lam_target < \
+                self.calc_mafe_direct_im_based(low, beta):
+            raise ValueError(f"[EXCEPTION] Target MAFC of {self.lam_target} outside the range of the hazard curve")
+        return low, high
+
+    def solve_cy(self, period, gamma=None, omega=None, xtol=1e-12, rtol=1e-10, maxiter=100):
+        """
+        Solves for the spectral acceleration at yield meeting the target MAFC with Brent's method
+        The median collapse intensity is solved for once and scaled to the participation factors and overstrength
+        factors, which may be given as arrays along with the periods. The object is not modified
+        :param period: float or array               Fundamental period(s), [s]
+        :param gamma: float or array                First-mode participation factor(s), defaults to the object's
+        :param omega: float or array                Overstrength factor(s), defaults to the object's
+        :param xtol: float                          Absolute tolerance on the median, [g]
+        :param rtol: float                          Relative tolerance on the median
+        :param maxiter: int                         Maximum number of iterations
+        :return: float or array, float or array, float, int
+                                                    Spectral acceleration [g] and displacement [m] at yield, achieved
+                                                    MAFC and number of iterations
+        """
+        gamma = self.gamma if gamma is None else gamma
+        omega = self.omega if omega is None else omega
+        beta = self.get_dispersion()
+
+        low, high = self.bracket_median(beta)
+        eta, result = brentq(lambda x: self.calc_mafe_direct_im_based(x, beta) / self.lam_target - 1, low, high,
+                             xtol=xtol, rtol=rtol, maxiter=maxiter, full_output=True)
+        if not result.converged:
+            raise ValueError(f"[EXCEPTION] MAFC solution did not converge: {result.flag}")
+
+        cy = eta / (self.r[1] * np.asarray(gamma, dtype=float) * np.asarray(omega, dtype=float))
+        dy = cy * 9.81 * (np.asarray(period, dtype=float) / 2 / np.pi) ** 2
+        if np.ndim(dy) == 0:
+            cy, dy = float(cy), float(dy)
+        else:
+            cy = np.broadcast_to(cy, np.shape(dy))
+
+        return cy, dy, self.calc_mafe_direct_im_based(eta, beta), result.iterations
 
     def objective(self, say):
         """
@@ -142,3 +206,33 @@ class MAFC:
             # use the True hazard
             lam = self.calc_mafe_direct_im_based(mu_lnr, std_lnr)
             return self.lam_target - lam
+
+
+def solve_cy(r, lam_target, gamma, omega, period, hazard, **kwargs):
+    """
+    Solves for the spectral accelerations at yield meeting the target MAFC at several periods at once, e.g. both
+    directions of a building or candidate periods of a design
+    Each period is verified against its own hazard curve, interpolated between the curves of the closest periods
+    :param r: array                                 R values of collapse capacity (84th, 50th, 16th percentiles), of
+                                                    shape (3, ) or (n, 3)
+    :param lam_target: float                        Target MAFC
+    :param gamma: float or array                    First-mode participation factors
+    :param omega: float or array                    Overstrength factors
+    :param period: float or array                   Fundamental periods, [s]
+    :param hazard: HazardIndex                      True hazard
+    :param kwargs: dict                             Tolerances of MAFC.solve_cy
+    :return: array, array, array, array             Spectral accelerations [g] and displacements [m] at yield, achieved
+                                                    MAFCs and numbers of iterations
+    """
+    r = np.asarray(r, dtype=float)
+    period, gamma, omega = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (period, gamma, omega)))
+    r = np.broadcast_to(r, period.shape + (3, ))
+
+    cy, dy, mafc = (np.zeros(period.shape) for _ in range(3))
+    iterations = np.zeros(period.shape, dtype=int)
+    for idx in np.ndindex(period.shape):
+        Hs, sa_hazard = hazard.get_curve(period[idx])
+        m = MAFC(r[idx], lam_target, gamma[idx], Hs, sa_hazard, omega[idx], True)
+        cy[idx], dy[idx], mafc[idx], iterations[idx] = m.solve_cy(period[idx], **kwargs)
+
+    return cy, dy, mafc, iterations
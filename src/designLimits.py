@@ -8,7 +8,7 @@ from tools.slf import SLF
 
 class DesignLimits:
     def __init__(self, slf_directory, y, nst, flag3d=False, replacement_cost=None, eal_corrections=True,
-                 perform_scaling=True, edp_profiles=None):
+                 perform_scaling=True, edp_profiles=None, slf_bundle=None):
         """
         Initialize SLF reading
         :param slf_directory: str           Directory of SLFs derived via SLF Generator
@@ -19,6 +19,8 @@ class DesignLimits:
         :param eal_corrections: bool        Perform EAL corrections
         :param perform_scaling: bool        Perform scaling of SLFs to replCost
         :param edp_profiles: list           EDP profile shape to use as a guess
+        :param slf_bundle: str              Binary bundle of the SLFs. If None, the bundle within the SLF directory is
+                                            used, if any
         """
         self.slf_directory = slf_directory
         self.y = y
@@ -28,12 +30,26 @@ class DesignLimits:
         self.eal_corrections = eal_corrections
         self.perform_scaling = perform_scaling
         self.edp_profiles = edp_profiles
+        self.slf_bundle = slf_bundle
 
         self.theta_max = None               # Peak storey drift
         self.a_max = None                   # Peak floor acceleration in g
         self.SLFsCache = None
         self.contributions = None
-        
+        self.slfs = None                    # SLF table, read once
+
+
+    def get_slfs(self):
+        """
+        Reads the SLFs, once
+        :return: SLFTable                   SLFs
+        """
+        if self.slfs is None:
+            slf = SLF(self.slf_directory, self.y, self.nst, self.flag3d, self.replacement_cost, self.perform_scaling,
+                      self.slf_bundle)
+            self.slfs, self.SLFsCache = slf.select_file_type()
+        return self.slfs
+
     def get_design_edps(self):
         """
         Calculates the design EDPs (i.e. PSD as theta and PFA as a)
@@ -41,49 +57,60 @@ class DesignLimits:
         Non-directional SLFs and directional (corresponding to dir1 or dir2) will be summed
         :return: None
         """
-        slf = SLF(self.slf_directory, self.y, self.nst, self.flag3d, self.replacement_cost, self.perform_scaling)
-        slfs, self.SLFsCache = slf.select_file_type()
+        slfs = self.get_slfs()
 
         # Calculate the design limits of PSD and PFA beyond which EAL condition will not be met
-        edp_limits = {}
-
-        # Initialize contributions
-        self.contributions = {"y_PSD_S": [], "y_PSD_NS": [], "y_PFA_NS": [], "PSD_S": [], "PSD_NS": [], "PFA_NS": []}
+        y, edp_limits, theta_max, a_max = self.get_edp_limits(slfs, [self.y])
+        self.theta_max, self.a_max = theta_max[0], a_max[0]
 
         # Performance group contributions
-        for i in slfs["y"]:
-            if i == "PFA_NS" or i == "PFA":
-                group = "PFA"
-            else:
-                group = i
-
-            edp_limits[group] = {}
-
-            # Direction
-            for k in slfs["y"][i]:
-                edp_limits[group][k] = np.array([])
-
-                # Storey
-                for st in slfs["y"][i][k]:
-                    # ELRs
-                    y = slfs["y"][i][k][st]
-                    # SLF interpolation functions
-                    s = slfs["interpolation"][i][k][st]
-                    edp_limits[group][k] = np.append(edp_limits[group][k], float(s(y)))
-                    if group == "PFA" and k == "dir2":
-                        pass
-                    else:
-                        self.contributions[i].append(float(s(y)))
-                        self.contributions["y_" + i].append(y)
-
-        # Get the minimum EDP value from structural and non-structural components (critical value)
-        edp_limits["PSD"] = {}
-        for k in edp_limits["PSD_S"]:
-            edp_limits["PSD"][k] = np.array([])
-            for st in slfs["y"]["PSD_S"][k]:
-                edp_limits["PSD"][k] = np.append(edp_limits["PSD"][k],
-                                                 min(edp_limits["PSD_S"][k][int(st)-1],
-                                                     edp_limits["PSD_NS"][k][int(st)-1]))
+        self.contributions = self.get_contributions(slfs, edp_limits[0], y[0])
+
+        # If EAL corrections need to be performed, the ELRs and EAL need to be recalculated (optional step)
+        if self.eal_corrections:
+            edp_profiles = None if self.edp_profiles is None else [self.edp_profiles]
+            edp, y, y_sls = self.get_corrected_elr(slfs, [self.y], theta_max, a_max, edp_profiles)
+
+            # Re-Initialize contributions
+            self.contributions = self.get_contributions(slfs, edp[0], y[0])
+            # Recalculate ELR at SLS
+            self.y = y_sls[0]
+
+    def get_design_edps_batch(self, y, edp_profiles=None):
+        """
+        Calculates the design EDPs for candidate ELRs at SLS and EDP profile shapes at once, e.g. to sweep the design
+        space. The SLFs are read once
+        :param y: array                     Candidate ELRs associated with SLS
+        :param edp_profiles: list           Candidate EDP profile shapes, one for each ELR or a single one for all
+                                            (None for uniform profiles)
+        :return: ndarray, ndarray, ndarray  Peak storey drifts and peak floor accelerations in g, of shape
+                                            (candidates, directions), and ELRs at SLS after EAL corrections (if
+                                            requested) of each candidate
+        """
+        slfs = self.get_slfs()
+        y = np.atleast_1d(np.asarray(y, dtype=float))
+        if edp_profiles is not None and len(edp_profiles) == 1:
+            edp_profiles = list(edp_profiles) * len(y)
+
+        _, _, theta_max, a_max = self.get_edp_limits(slfs, y)
+        if self.eal_corrections:
+            y = self.get_corrected_elr(slfs, y, theta_max, a_max, edp_profiles)[2]
+
+        return theta_max, a_max, y
+
+    def get_edp_limits(self, slfs, y):
+        """
+        Calculates the design limits of PSD and PFA beyond which EAL condition will not be met, for all SLFs and
+        candidate ELRs at once
+        :param slfs: SLFTable               SLFs
+        :param y: array                     ELRs associated with SLS
+        :return: ndarray, ndarray, ndarray, ndarray
+                                            ELRs and EDP limits of each SLF, of shape (candidates, SLFs), and peak
+                                            storey drifts and peak floor accelerations, of shape (candidates,
+                                            directions)
+        """
+        y = slfs.get_elr(y)
+        edp_limits = slfs.get_edp(y)
 
         # Design limits as min of the found values along the height
         if self.flag3d:
@@ -93,73 +120,83 @@ class DesignLimits:
             # 2D frame
             n_dir = 1
         # Maximum peak storey drift
-        self.theta_max = np.zeros(n_dir)
+        theta_max = np.zeros((y.shape[0], n_dir))
         # Maximum peak floor acceleration
-        self.a_max = np.zeros(n_dir)
+        a_max = np.zeros((y.shape[0], n_dir))
 
-        for i in range(len(self.theta_max)):
-            self.theta_max[i] = round(min(edp_limits["PSD"][f"dir{i+1}"]), 5)
-            self.a_max[i] = round(min(edp_limits["PFA"][f"dir{i+1}"]), 3)
+        pfa = self.get_pfa_rows(slfs)
+        for i in range(n_dir):
+            direction = slfs.direction == f"dir{i+1}"
+            # Get the minimum EDP value from structural and non-structural components (critical value)
+            psd = np.minimum(edp_limits[:, direction & (slfs.group == "PSD_S")],
+                             edp_limits[:, direction & (slfs.group == "PSD_NS")])
+            theta_max[:, i] = np.round(psd.min(axis=1), 5)
+            a_max[:, i] = np.round(edp_limits[:, direction & pfa].min(axis=1), 3)
 
-        # If EAL corrections need to be performed, the ELRs and EAL need to be recalculated (optional step)
-        if self.eal_corrections:
-            self.recalculate_elr(slfs, n_dir)
+        return y, edp_limits, theta_max, a_max
 
-    def recalculate_elr(self, slfs, n_dir):
+    @staticmethod
+    def get_pfa_rows(slfs):
         """
-        Back-calculate Expected Loss Ratios
-        :param slfs: dict
-        :param n_dir: int
-        :return: None
+        Identifies the SLFs of PFA-sensitive components
+        :param slfs: SLFTable               SLFs
+        :return: ndarray                    Mask of the PFA-sensitive SLFs
+        """
+        return (slfs.group == "PFA_NS") | (slfs.group == "PFA")
+
+    def get_contributions(self, slfs, edps, y):
+        """
+        Gets the contributions of each performance group
+        PFA-sensitive components are counted in the first direction only
+        :param slfs: SLFTable               SLFs
+        :param edps: ndarray                EDPs of each SLF
+        :param y: ndarray                   ELRs of each SLF
+        :return: dict                       EDPs and ELRs of each performance group, along the height
+        """
+        contributions = {"y_PSD_S": [], "y_PSD_NS": [], "y_PFA_NS": [], "PSD_S": [], "PSD_NS": [], "PFA_NS": []}
+        counted = ~(self.get_pfa_rows(slfs) & (slfs.direction == "dir2"))
+        for group, edp, elr in zip(slfs.group[counted], edps[counted], y[counted]):
+            contributions[group].append(float(edp))
+            contributions["y_" + group].append(float(elr))
+        return contributions
+
+    def get_corrected_elr(self, slfs, y, theta_max, a_max, edp_profiles=None):
+        """
+        Back-calculate Expected Loss Ratios, for all SLFs and candidate ELRs at once
+        :param slfs: SLFTable               SLFs
+        :param y: array                     ELRs associated with SLS
+        :param theta_max: ndarray           Peak storey drifts, of shape (candidates, directions)
+        :param a_max: ndarray               Peak floor accelerations, of shape (candidates, directions)
+        :param edp_profiles: list           EDP profile shapes of each candidate (None for uniform profiles)
+        :return: ndarray, ndarray, ndarray  EDPs and ELRs of each SLF, of shape (candidates, SLFs), and recalculated
+                                            ELRs at SLS
         """
-        y_perf_group = {}
-        y_total_slf = np.zeros((2,))
-        y_total_sls = np.zeros((2,))
-
-        # Re-Initialize contributions
-        self.contributions = {"y_PSD_S": [], "y_PSD_NS": [], "y_PFA_NS": [], "PSD_S": [], "PSD_NS": [], "PFA_NS": []}
-
-        # Performance group
-        for i in slfs["y"]:
-            if i == "PFA_NS" or i == "PFA":
-                group = "PFA"
-            else:
-                group = i
-
-            y_perf_group[group] = {}
-
-            # For each direction
-            for k in slfs["y"][i]:
-                y_perf_group[group][k] = np.array([])
-                if group == "PFA":
-                    edp = self.a_max[int(k[-1]) - 1]
-                else:
-                    edp = self.theta_max[int(k[-1]) - 1]
-
-                # For each Storey level
-                for st in slfs["y"][i][k]:
-                    # Use specific profiles if provided
-                    if self.edp_profiles is not None:
-                        if group == "PFA":
-                            edp = self.a_max[int(k[-1]) - 1] * self.edp_profiles[0][int(st)]
-                        else:
-                            edp = self.theta_max[int(k[-1]) - 1] * self.edp_profiles[1][int(st) - 1]
-
-                    if group == "PFA" and k == "dir2":
-                        # PFA-sensitive component groups
-                        # To avoid double counting PFA sensitive components
-                        pass
-
-                    else:
-                        # PSD-sensitive component groups
-                        y_total_slf[int(k[-1]) - 1] += slfs["y"][i][k][st] / self.y
-
-                        # SLF interpolation functions
-                        s = slfs["edp_interpolation"][i][k][st]
-                        y_perf_group[group][k] = np.append(y_perf_group[group][k], float(s(edp)))
-                        y_total_sls[int(k[-1]) - 1] += float(s(edp))
-                        self.contributions[i].append(edp)
-                        self.contributions["y_" + i].append(float(s(edp)))
-
-        # Recalculate ELR at SLS
-        self.y = sum(y_total_sls[:n_dir]) / sum(y_total_slf[:n_dir])
+        y = np.asarray(y, dtype=float)
+        n_dir = theta_max.shape[1]
+        pfa = self.get_pfa_rows(slfs)
+        direction = np.char.replace(slfs.direction, "dir", "").astype(int) - 1
+
+        # Design EDPs of each SLF, use specific profiles if provided
+        edp = np.where(pfa, a_max[:, direction], theta_max[:, direction])
+        if edp_profiles is not None:
+            storey = slfs.storey.astype(int)
+            profiles = [np.ones(len(slfs.keys)) if profile is None else
+                        np.where(pfa, np.asarray(profile[0])[np.where(pfa, storey, 0)],
+                                 np.asarray(profile[1])[np.where(pfa, 0, storey - 1)]) for profile in edp_profiles]
+            edp = edp * np.array(profiles)
+
+        # PFA-sensitive component groups are counted in the first direction only to avoid double counting
+        rows = np.flatnonzero(~(pfa & (slfs.direction == "dir2")))
+        y_rows = np.zeros(edp.shape)
+        y_rows[:, rows] = slfs.get_loss(edp[:, rows], rows)
+
+        # Totals in each direction, summed along the height in order
+        y_total_slf = np.zeros((len(y), 2))
+        y_total_sls = np.zeros((len(y), 2))
+        for i in range(n_dir):
+            counted = rows[direction[rows] == i]
+            y_total_slf[:, i] = np.cumsum(slfs.get_elr(y)[:, counted] / y[:, None], axis=1)[:, -1] if counted.size \
+                else 0.
+            y_total_sls[:, i] = np.cumsum(y_rows[:, counted], axis=1)[:, -1] if counted.size else 0.
+
+        return edp, y_rows, y_total_sls[:, :n_dir].sum(axis=1) / y_total_slf[:, :n_dir].sum(axis=1)
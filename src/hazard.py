@@ -1,11 +1,15 @@
 """
 Defines hazard function
 """
-import pickle
+import hashlib
 import numpy as np
 import os
+import pandas as pd
+import tempfile
 
+from src.hazardIndex import HazardIndex
 from tools.hazardFit import HazardFit
+from utils.ipbsd_utils import load_npz
 
 
 class Hazard:
@@ -24,20 +28,50 @@ class Hazard:
         else:
             self.beta_al = [0.1, 0.2, 0.3]
 
+        # The hazard store is keyed by the content of the hazard file, so that a different hazard is always fit
+        self.key = self.get_key()
+        self.store = os.path.join(self.export_directory, f"hazard_{self.key}.npz")
+
         # if hazard fitting function does not exist, run fitting
         if not self.check_data():
-            # this will generate pickle files for reading
-            HazardFit(self.filename, self.export_directory, haz_fit=1, export=True)
+            self.record_store()
+
+    def get_key(self):
+        """
+        Gets the key of the hazard store
+        :return: str                                        Hash of the content of the hazard file
+        """
+        with open(self.filename, 'rb') as file:
+            return hashlib.sha1(file.read()).hexdigest()
 
     def check_data(self):
         """
         checks if hazard is already fit
         :return: bool                                       Hazard data exists or not
         """
-        for file in os.listdir(self.export_directory):
-            if file.startswith("coef"):
-                return True
-        return False
+        return os.path.isfile(self.store)
+
+    def record_store(self):
+        """
+        Fits the hazard and saves the fit and the preprocessed true hazard in a single uncompressed NumPy archive,
+        which is memory mapped when read
+        :return: None
+        """
+        fitting = HazardFit(self.filename, self.export_directory, haz_fit=1, export=False)
+        index = HazardIndex(list(fitting.read_hazard().values()))
+        hazard_fit = fitting.hazard_fit.to_numpy()
+
+        # Written under a unique temporary name first, so that an interrupted run leaves no partial store behind, and
+        # concurrent runs sharing the store do not write to the same file
+        fd, tmp = tempfile.mkstemp(dir=self.export_directory, prefix=f"hazard_{self.key}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, im=np.array(index.labels), T=index.periods, coefs=fitting.coefs, s_fit=fitting.s_fit,
+                         hazard_fit=hazard_fit, sa=index.sa, H=index.H, log_sa=index.log_sa, log_H=index.log_H)
+            os.replace(tmp, self.store)
+        except BaseException:
+            os.remove(tmp)
+            raise
 
     def get_mafe(self, coef, return_period, cflag):
         """
@@ -69,16 +103,24 @@ class Hazard:
     def read_hazard(self):
         """
         reads fitted hazard data
-        :return: Dataframe, dict                            Coefficients, intensity measures and probabilities of the
+        :return: Dataframe, dict, list                      Coefficients, intensity measures and probabilities of the
                                                             Fitted hazard
                                                             True hazard data
         """
-        filename = os.path.basename(self.filename)
-        with open(self.export_directory / f"coef_{filename}", 'rb') as file:
-            coefs = pickle.load(file)
-        with open(self.export_directory / f"fit_{filename}", 'rb') as file:
-            hazard_data = pickle.load(file)
-        with open(self.filename, 'rb') as file:
-            true_hazard = pickle.load(file)
+        data = load_npz(self.store)
+        im = [str(label) for label in data["im"]]
+
+        coefs = pd.DataFrame(np.asarray(data["coefs"]).T, index=['k0', 'k1', 'k2'], columns=im)
+        hazard_data = {'hazard_fit': pd.DataFrame(np.asarray(data["hazard_fit"]), columns=im), 's': data["s_fit"],
+                       'T': data["T"]}
+        true_hazard = [im, data["sa"].tolist(), data["H"].tolist()]
 
         return coefs, hazard_data, true_hazard
+
+    def get_index(self):
+        """
+        Gets the true hazard indexed for queries at any period, memory mapped from the hazard store
+        :return: HazardIndex                                True hazard
+        """
+        data = load_npz(self.store)
+        return HazardIndex.from_arrays(data["im"], data["T"], data["sa"], data["H"], data["log_sa"], data["log_H"])
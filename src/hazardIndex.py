@@ -0,0 +1,145 @@
+"""
+Indexes the true hazard for queries at any period
+The hazard curves are held as 2-D grids of log(Sa) and log(H), one row per period, and are interpolated linearly in
+log-log space along the curves (or in linear space, as in the original spectra) and linearly between periods
+"""
+import re
+
+import numpy as np
+
+
+def get_period(label):
+    """
+    Gets the period of a hazard curve from its label, e.g. PGA or SA(0.5)
+    :param label: str                               Intensity measure label
+    :return: float                                  Period, [s]
+    """
+    if label == "PGA":
+        return 0.
+    match = re.fullmatch(r"SA\((.+)\)", label)
+    if match is None:
+        raise ValueError(f"[EXCEPTION] Wrong intensity measure label of a hazard curve: {label}!")
+    return float(match.group(1))
+
+
+def interpolate_rows(x, xp, fp):
+    """
+    Piecewise linear interpolation along the last axis, with a different grid in each row
+    :param x: array                                 Query points, one for each row
+    :param xp: array                                Increasing grids, with a trailing axis along the points
+    :param fp: array                                Values at the grid points
+    :return: array                                  Interpolated values, NaN outside of the grids
+    """
+    i = np.minimum(np.maximum(np.sum(xp <= x[..., None], axis=-1) - 1, 0), xp.shape[-1] - 2)[..., None]
+    x0, x1 = np.take_along_axis(xp, i, -1)[..., 0], np.take_along_axis(xp, i + 1, -1)[..., 0]
+    f0, f1 = np.take_along_axis(fp, i, -1)[..., 0], np.take_along_axis(fp, i + 1, -1)[..., 0]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        w = np.where(x1 > x0, (x - x0) / (x1 - x0), 0.)
+        f = np.where(w == 0., f0, np.where(w == 1., f1, f0 + w * (f1 - f0)))
+    return np.where((x >= xp[..., 0]) & (x <= xp[..., -1]), f, np.nan)
+
+
+class HazardIndex:
+    def __init__(self, hazard):
+        """
+        Initializes the hazard index, built once and shared by all hazard consumers
+        :param hazard: list                         True hazard (intensity measure labels, intensities [g] and
+                                                    annual probabilities of exceedance of each curve)
+        """
+        self.labels = list(hazard[0])
+        self.periods = np.array([get_period(label) for label in self.labels])
+        self.sa = np.array(hazard[1], dtype=float)
+        self.H = np.array(hazard[2], dtype=float)
+
+        if np.any(np.diff(self.periods) <= 0):
+            raise ValueError("[EXCEPTION] Hazard curves must be sorted by increasing period!")
+
+        # Non-positive probabilities are kept as -inf, i.e. zero after interpolation
+        with np.errstate(divide="ignore"):
+            self.log_sa = np.log(self.sa)
+            self.log_H = np.log(np.maximum(self.H, 0.))
+
+    @classmethod
+    def from_arrays(cls, labels, periods, sa, H, log_sa, log_H):
+        """
+        Creates the hazard index from preprocessed grids, e.g. memory-mapped from a hazard store, without copies
+        :param labels: array                        Intensity measure labels
+        :param periods: array                       Periods of the curves, [s]
+        :param sa: array                            Intensities of each curve, [g]
+        :param H: array                             Annual probabilities of exceedance of each curve
+        :param log_sa: array                        log(Sa)
+        :param log_H: array                         log(H), -inf for non-positive probabilities
+        :return: HazardIndex                        Hazard index
+        """
+        index = cls.__new__(cls)
+        index.labels = [str(label) for label in labels]
+        index.periods, index.sa, index.H, index.log_sa, index.log_H = periods, sa, H, log_sa, log_H
+        return index
+
+    def get_curves(self, period):
+        """
+        Gets the hazard curves at any periods, interpolated between the curves of the closest periods
+        :param period: float or array               Periods, [s]
+        :return: array, array                       log(Sa) and log(H) of the curves, with a trailing axis along the
+                                                    points of the curves, NaN outside of the period range
+        """
+        period = np.asarray(period, dtype=float)
+        j = np.minimum(np.maximum(np.searchsorted(self.periods, period, side="right") - 1, 0), len(self.periods) - 2)
+        w = ((period - self.periods[j]) / (self.periods[j + 1] - self.periods[j]))[..., None]
+
+        curves = []
+        for grid in (self.log_sa, self.log_H):
+            with np.errstate(invalid="ignore"):
+                curve = np.where(w == 0., grid[j], np.where(w == 1., grid[j + 1], (1 - w) * grid[j] + w * grid[j + 1]))
+            curves.append(np.where((w >= 0.) & (w <= 1.), curve, np.nan))
+        return curves[0], curves[1]
+
+    def get_curve(self, period):
+        """
+        Gets the hazard curve at a single period, in the format of the true hazard
+        :param period: float                        Period, [s]
+        :return: array, array                       Annual probabilities of exceedance and intensities [g]
+        """
+        j = np.flatnonzero(self.periods == period)
+        if j.size:
+            # Curve of the hazard, as is
+            return self.H[j[0]].copy(), self.sa[j[0]].copy()
+        log_sa, log_H = self.get_curves(period)
+        return np.exp(log_H), np.exp(log_sa)
+
+    def get_mafe(self, period, sa, loglog=True):
+        """
+        Gets the mean annual frequencies of exceedance of intensities, parameters are broadcast against each other
+        :param period: float or array               Periods, [s]
+        :param sa: float or array                   Spectral accelerations, [g]
+        :param loglog: bool                         Interpolate the curves in log-log space, or in linear space
+        :return: float or array                     MAFE, NaN outside of the hazard curves
+        """
+        period, sa = np.broadcast_arrays(np.asarray(period, dtype=float), np.asarray(sa, dtype=float))
+        log_sa, log_H = self.get_curves(period)
+        with np.errstate(divide="ignore"):
+            if loglog:
+                mafe = np.exp(interpolate_rows(np.log(sa), log_sa, log_H))
+            else:
+                mafe = interpolate_rows(sa, np.exp(log_sa), np.exp(log_H))
+        return mafe if mafe.ndim else float(mafe)
+
+    def get_sa(self, period, mafe, loglog=True):
+        """
+        Gets the intensities at mean annual frequencies of exceedance, parameters are broadcast against each other,
+        e.g. get_sa(index.periods, lam) gives the uniform hazard spectrum at lam
+        :param period: float or array               Periods, [s]
+        :param mafe: float or array                 MAFE
+        :param loglog: bool                         Interpolate the curves in log-log space, or in linear space
+        :return: float or array                     Spectral accelerations [g], NaN outside of the hazard curves
+        """
+        period, mafe = np.broadcast_arrays(np.asarray(period, dtype=float), np.asarray(mafe, dtype=float))
+        log_sa, log_H = self.get_curves(period)
+        # The hazard curves decrease with the intensity
+        with np.errstate(divide="ignore"):
+            if loglog:
+                sa = np.exp(interpolate_rows(-np.log(mafe), -log_H, log_sa))
+            else:
+                sa = interpolate_rows(-mafe, -np.exp(log_H), np.exp(log_sa))
+        return sa if sa.ndim else float(sa)
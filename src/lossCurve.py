@@ -1,11 +1,58 @@
 """
 defines loss curve
+Loss curves are fitted for any number of sets of expected loss ratios (ELRs) and mean annual frequencies of exceedance
+(MAFEs) at once, e.g. Monte Carlo samples of the hazard and SLF uncertainties, and integrated on a shared grid of ELRs
 """
 import numpy as np
 
 from utils.performance_obj_verifications import check_eal
 from utils.ipbsd_utils import success_msg, error_msg
 
+# Shared grid of ELRs of the fitted loss curves
+Y_FIT = np.linspace(0.01, 1., 100)
+
+
+def fit_loss_curves(y, lam):
+    """
+    Fits loss curves, lambda = k0 * exp(-k1 * ln(y) - k2 * ln(y)^2), passing through the performance limit states
+    :param y: array                 ELRs of the limit states, with a trailing axis of length 3
+    :param lam: array               MAFEs of the limit states, of the shape of y
+    :return: ndarray                Coefficients (k0, k1, k2) of each loss curve, with a trailing axis of length 3
+    """
+    y, lam = np.broadcast_arrays(np.asarray(y, dtype=float), np.asarray(lam, dtype=float))
+    if y.shape[-1] != 3:
+        raise ValueError("[EXCEPTION] Loss curves are fitted through 3 limit states!")
+
+    log_y = np.log(y)
+    a = np.stack((np.ones(log_y.shape), -log_y, -log_y ** 2), axis=-1)
+    coef = np.linalg.solve(a, np.log(lam)[..., None])[..., 0]
+    coef[..., 0] = np.exp(coef[..., 0])
+    return coef
+
+
+def get_loss_curves(y, lam, y_fit=Y_FIT):
+    """
+    Fits loss curves and calculates the expected annual losses (EAL) as the areas below them
+    :param y: array                 ELRs of the limit states, with a trailing axis of length 3
+    :param lam: array               MAFEs of the limit states, of the shape of y
+    :param y_fit: array             Grid of ELRs along which the loss curves are integrated
+    :return: ndarray, ndarray, ndarray
+                                    Grid of ELRs starting from zero, MAFEs of each loss curve along the grid (with a
+                                    trailing axis along the grid) and EALs in %
+    """
+    coef = fit_loss_curves(y, lam)[..., None]
+    log_y = np.log(y_fit)
+    lambda_fit = coef[..., 0, :] * np.exp(-coef[..., 1, :] * log_y - coef[..., 2, :] * log_y ** 2)
+
+    # The loss curves are extended to zero ELR at the MAFE of the first grid point
+    y_fit = np.insert(y_fit, 0, 0.0)
+    lambda_fit = np.concatenate((lambda_fit[..., :1], lambda_fit), axis=-1)
+
+    # Trapezoidal rule, EAL in terms of %
+    area = (lambda_fit[..., :-1] + lambda_fit[..., 1:]) / 2 * np.diff(y_fit)
+    eal = area.sum(axis=-1) * 100
+    return y_fit, lambda_fit, eal
+
 
 class LossCurve:
     def __init__(self, y, lam, eal_limit):
@@ -26,41 +73,8 @@ class LossCurve:
         annual loss (EAL) as the area below the refined loss curve
         :return: ndarrays               Fitted loss curve
         """
-        coef = np.zeros(len(self.y))
-
-        r1 = np.zeros(len(self.y))
-        r2 = np.zeros(len(self.y))
-        r3 = np.zeros(len(self.y))
-        r1[0] = 1
-        r2[0] = 1
-        r3[0] = 1
-        r1[1] = -np.log(self.y[0])
-        r2[1] = -np.log(self.y[1])
-        r3[1] = -np.log(self.y[2])
-        r1[2] = -np.log(self.y[0]) ** 2
-        r2[2] = -np.log(self.y[1]) ** 2
-        r3[2] = -np.log(self.y[2]) ** 2
-
-        temp1 = np.log(self.lam)
-        temp2 = np.array([r1, r2, r3])
-        temp3 = np.linalg.inv(temp2).dot(temp1)
-        temp3 = temp3.tolist()
-
-        coef[0] = np.exp(temp3[0])
-        coef[1] = temp3[1]
-        coef[2] = temp3[2]
-
-        y_fit = np.linspace(0.01, 1., 100)
-        area = []
-        lambda_fit = coef[0] * np.exp(-coef[1] * np.log(y_fit) - coef[2] * np.log(y_fit) ** 2)
-
-        y_fit = np.insert(y_fit, 0, 0.0)
-        lambda_fit = np.insert(lambda_fit, 0, lambda_fit[0])
-
-        for i in range(len(lambda_fit) - 1):
-            area.append((lambda_fit[i] + lambda_fit[i + 1]) / 2 * (y_fit[i + 1] - y_fit[i]))
-        # Get EAL in terms of %
-        self.EAL = sum(area) * 100
+        y_fit, lambda_fit, eal = get_loss_curves(self.y, self.lam)
+        self.EAL = float(eal)
         return y_fit, lambda_fit
 
     def verify_eal(self):
@@ -72,3 +86,28 @@ class LossCurve:
             success_msg(f"EAL condition is met! Diff.: {(self.eal_limit - self.EAL)/self.eal_limit*100:.1f}%")
         else:
             error_msg(f"EAL condition is not met! Diff.: {(self.eal_limit - self.EAL)/self.eal_limit*100:.1f}%")
+
+    @staticmethod
+    def get_eal_distribution(y, lam, eal_limit=None, percentiles=(5, 16, 50, 84, 95), chunk=100000):
+        """
+        Calculates the distribution of EAL over samples of ELRs and MAFEs, e.g. from Monte Carlo sampling of the hazard
+        and SLF uncertainties. Samples are processed in chunks to bound the memory used by the loss curves
+        :param y: array                 ELRs of the limit states, of shape (samples, 3) or (3, ) if shared by all
+        :param lam: array               MAFEs of the limit states, of shape (samples, 3) or (3, ) if shared by all
+        :param eal_limit: float         Limit EAL value (optional)
+        :param percentiles: tuple       Percentiles of EAL to report
+        :param chunk: int               Number of samples processed at once
+        :return: dict                   EAL samples in %, their mean, standard deviation and percentiles, and the
+                                        probability of exceeding the limit EAL (if provided)
+        """
+        y, lam = np.broadcast_arrays(np.atleast_2d(np.asarray(y, dtype=float)),
+                                     np.atleast_2d(np.asarray(lam, dtype=float)))
+        eal = np.empty(y.shape[0])
+        for start in range(0, y.shape[0], chunk):
+            eal[start:start + chunk] = get_loss_curves(y[start:start + chunk], lam[start:start + chunk])[2]
+
+        distribution = {"EAL": eal, "mean": float(np.mean(eal)), "std": float(np.std(eal)),
+                        "percentiles": dict(zip(percentiles, np.percentile(eal, percentiles).tolist()))}
+        if eal_limit is not None:
+            distribution["P(EAL > limit)"] = float(np.mean(eal > eal_limit))
+        return distribution
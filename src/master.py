@@ -2,9 +2,11 @@
 Runs the IPBSD framework
 """
 from colorama import Fore
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
-import pickle
+from pathlib import Path
+import tempfile
 
 from src.crossSection import CrossSection
 from src.crossSectionSpace import CrossSectionSpace
@@ -13,13 +15,81 @@ from src.input import Input
 from src.hazard import Hazard
 from src.lossCurve import LossCurve
 from src.periodRange import PeriodRange
+from src.pipeline import Pipeline
 from src.seekdesign import SeekDesign
 from src.spectra import Spectra
 from src.transformations import Transformations
+from analysis.mphiCache import MPhiCache
+from analysis.mphiSurface import MPhiSurface
+from tools.slf import get_bundle_filename, get_source_files
+from tools.spo2idaTable import SPO2IDATable
 from analysis.analysisMethods import run_opensees_analysis
 from utils.ipbsd_utils import create_folder, export_results, initiate_msg, success_msg, error_msg, \
     create_and_export_cache, check_for_file
 from utils.performance_obj_verifications import verify_period_range
+from utils.cache_store import read_cache
+from utils.profiler import profile, profiled
+
+# Stages of the framework: arguments of Main read by each stage, upstream stages and whether the stage is memoised.
+# A change of an argument invalidates the stages reading it and all stages downstream of them. The keys of the memoised
+# stages are derived from their upstream stages, see get_memoised_depends
+STAGES = {
+    "input": {"arguments": ("input_filename", "flag3d"), "depends": (), "memoised": True},
+    "hazard": {"arguments": ("hazard_filename", "hazard_store_dir"), "depends": ("input", ), "memoised": True},
+    "design_limits": {"arguments": ("slf_directory", "flag3d", "repl_cost", "eal_correction", "perform_scaling",
+                                    "edp_profiles"), "depends": ("input", ), "memoised": True},
+    "loss_curve": {"arguments": ("limit_eal", "target_mafc"), "depends": ("hazard", "design_limits"),
+                   "memoised": False},
+    "transformations": {"arguments": (), "depends": ("input", "design_limits"), "memoised": True},
+    "spectra": {"arguments": ("target_mafc", ), "depends": ("hazard", ), "memoised": False},
+    "period_range": {"arguments": (), "depends": ("spectra", "transformations"), "memoised": False},
+    "sections": {"arguments": ("solution_filex", "solution_filey", "solution_file", "fstiff", "flag3d"),
+                 "depends": ("input", "period_range"), "memoised": True},
+    "iterations": {"arguments": ("spo_filename", "target_mafc", "analysis_type", "damping", "num_modes", "maxiter",
+                                 "fstiff", "rebar_cover", "overstrength", "gravity_cs", "flag3d", "mphi_cache_dir",
+                                 "mphi_surface", "mphi_exact", "spo2ida_table", "spo2ida_exact", "workers",
+                                 "redesign_tol", "hold_flag"), "depends": ("sections", "hazard", "transformations"),
+                   "memoised": False},
+}
+
+
+def get_invalidated_stages(arguments):
+    """
+    Gets the stages invalidated by a change of arguments of Main
+    :param arguments: list                  Names of the arguments
+    :return: list                           Names of the stages, in the order of the framework
+    """
+    invalidated = set()
+    for name, stage in STAGES.items():
+        if set(stage["arguments"]) & set(arguments):
+            invalidated.add(name)
+    # Propagate downstream, until no further stage is invalidated
+    changed = True
+    while changed:
+        changed = False
+        for name, stage in STAGES.items():
+            if name not in invalidated and invalidated & set(stage["depends"]):
+                invalidated.add(name)
+                changed = True
+    return [name for name in STAGES if name in invalidated]
+
+
+def get_memoised_depends(name):
+    """
+    Gets the memoised stages a stage depends on, through the stages that are not memoised: the results of the latter
+    are parameters of the stages downstream of them
+    :param name: str                        Stage name
+    :return: tuple                          Names of the memoised upstream stages, in the order of the framework
+    """
+    depends = set()
+    upstream = list(STAGES[name]["depends"])
+    while upstream:
+        stage = upstream.pop()
+        if STAGES[stage]["memoised"]:
+            depends.add(stage)
+        else:
+            upstream.extend(STAGES[stage]["depends"])
+    return tuple(stage for stage in STAGES if stage in depends)
 
 
 class Master:
@@ -30,15 +100,31 @@ class Master:
         # Output path
         create_folder(self.ipbsd.output_path)
 
+        # Stages are memoised by the content of their inputs, if a directory was provided
+        self.pipeline = Pipeline(self.ipbsd.pipeline_cache_dir)
+
         # Outputs
         self.data = None            # IPBSD input object information
         self.mafe = None            # MAFE at each limit state (mean annual frequency of exceedance)
         self.true_hazard = None     # True hazard data
+        self.hazard_index = None    # True hazard indexed for queries at any period, shared by all hazard consumers
         self.period_limits = {}     # Period limits
         self.tables = None          # SLS table (DBD)
         self.combinations = None    # All section combinations
         self.opt_sol = None         # Optimal solutions
+        self.eal = None             # Expected annual loss (EAL) in %
+
+    def run_stage(self, name, function, params):
+        """
+        Runs a memoised stage of the pipeline, depending on the upstream stages declared in STAGES
+        :param name: str                        Stage name
+        :param function: callable               Stage, called without arguments, returns its results
+        :param params: dict                     Parameters of the stage
+        :return: object                         Results of the stage
+        """
+        return self.pipeline.run_stage(name, function, params, depends=get_memoised_depends(name))
 
+    @profiled()
     def read_input(self):
         """
         Read input data
@@ -52,18 +138,31 @@ class Master:
         initiate_msg("Reading input arguments...")
 
         # Read the inputs to IPBSD
-        data = Input(self.ipbsd.flag3d)
-        data.read_inputs(self.ipbsd.input_filename)
-        data.run_all()
-        data.get_input_arguments()
+        def read_inputs():
+            data = Input(self.ipbsd.flag3d)
+            data.read_inputs(self.ipbsd.input_filename)
+            data.run_all()
+            data.get_input_arguments()
+            return data
+
+        data = self.run_stage("input", read_inputs, {"input_filename": Path(self.ipbsd.input_filename),
+                                                     "flag3d": self.ipbsd.flag3d})
 
-        # Read hazard information
-        hazard = Hazard(self.ipbsd.hazard_filename, self.ipbsd.output_path)
-        coefs, hazard_data, self.true_hazard = hazard.read_hazard()
+        # Read hazard information, the hazard is fit only if not found in the hazard store
+        hazard = Hazard(self.ipbsd.hazard_filename, self.ipbsd.hazard_store_dir or self.ipbsd.output_path)
+        self.hazard_index = hazard.get_index()
+
+        def read_hazard():
+            coefs, hazard_data, true_hazard = hazard.read_hazard()
+            # Get MAFE at each limit state
+            mafe = hazard.get_mafe(coefs["PGA"], data.TR, "PGA")
+            return coefs, hazard_data, true_hazard, mafe
+
+        coefs, hazard_data, self.true_hazard, mafe = self.run_stage(
+            "hazard", read_hazard, {"hazard_filename": Path(self.ipbsd.hazard_filename), "TR": data.TR})
 
-        # Get MAFE at each limit state
-        mafe = hazard.get_mafe(coefs["PGA"], data.TR, "PGA")
         # Set MAFE of CLS to target MAFC
+        mafe = np.array(mafe, dtype=float)
         mafe[-1] = self.ipbsd.target_mafc
 
         results = {
@@ -78,12 +177,13 @@ class Master:
 
         if self.ipbsd.export:
             create_folder(self.ipbsd.output_path / "Cache")
-            export_results(self.ipbsd.output_path / "Cache/input_cache", results, "pickle")
+            export_results(self.ipbsd.output_path / "Cache/input_cache", results, "npz")
 
         success_msg("Input arguments have been successfully read!")
 
         print("...")
 
+    @profiled("loss_curve")
     def _get_loss_curve(self):
         lc = LossCurve(self.data.y, self.mafe, self.ipbsd.limit_eal)
         y_fit, mafe_fit = lc.get_loss_curve()
@@ -105,6 +205,7 @@ class Master:
         return tables, delta, alpha
 
     @staticmethod
+    @profiled("period_range")
     def _get_period_range(delta, alpha, sd, sa):
         pr = PeriodRange(delta, alpha, sd, sa)
         mew_sa, new_sd = pr.get_new_spectra()
@@ -113,6 +214,7 @@ class Master:
         verify_period_range(t_lower, t_upper)
         return t_lower, t_upper
 
+    @profiled()
     def perform_calculations(self):
         """
         Runs IPBSD calculations
@@ -127,14 +229,29 @@ class Master:
 
         # Stage 2
         initiate_msg("Computing engineering demand parameters as design limits...")
-        dl = DesignLimits(self.ipbsd.slf_directory, self.data.y[1], self.data.nst, self.ipbsd.flag3d,
-                          self.ipbsd.repl_cost, self.ipbsd.eal_correction, self.ipbsd.perform_scaling,
-                          self.ipbsd.edp_profiles)
-        dl.get_design_edps()
+        # SLF bundle of the store if the SLFs were packed into it, otherwise that of the SLF directory, if any
+        slf_bundle = get_bundle_filename(self.ipbsd.slf_directory, self.ipbsd.slf_store_dir)
+        slf_bundle = slf_bundle if slf_bundle.is_file() else None
+
+        def get_design_limits():
+            dl = DesignLimits(self.ipbsd.slf_directory, self.data.y[1], self.data.nst, self.ipbsd.flag3d,
+                              self.ipbsd.repl_cost, self.ipbsd.eal_correction, self.ipbsd.perform_scaling,
+                              self.ipbsd.edp_profiles, slf_bundle)
+            dl.get_design_edps()
+            # The SLF table is rebuilt when read again
+            dl.slfs = None
+            return dl
+
+        # The SLFs are keyed by their source files, packing them into bundles does not invalidate the stage
+        dl = self.run_stage("design_limits", get_design_limits, {
+            "slf_directory": get_source_files(self.ipbsd.slf_directory), "y": self.data.y[1], "nst": self.data.nst,
+            "flag3d": self.ipbsd.flag3d, "repl_cost": self.ipbsd.repl_cost,
+            "eal_correction": self.ipbsd.eal_correction, "perform_scaling": self.ipbsd.perform_scaling,
+            "edp_profiles": self.ipbsd.edp_profiles})
 
         if self.ipbsd.export:
-            export_results(self.ipbsd.output_path / "Cache/SLFs", dl.SLFsCache, "pickle")
-            export_results(self.ipbsd.output_path / "Cache/design_loss_contributions", dl.contributions, "pickle")
+            export_results(self.ipbsd.output_path / "Cache/SLFs", dl.SLFsCache, "npz")
+            export_results(self.ipbsd.output_path / "Cache/design_loss_contributions", dl.contributions, "npz")
 
         success_msg("Design limits computed!\n...")
 
@@ -144,16 +261,19 @@ class Master:
             eal, y, y_fit, mafe_fit = self._get_loss_curve()
 
             success_msg(f"EAL corrections have been made, where the new EAL limit estimated to {eal:.2f}%\n...")
+        self.eal = eal
 
-        create_and_export_cache(self.ipbsd.output_path / "Cache/lossCurve", "pickle",  y=self.data.y, mafe=self.mafe,
+        create_and_export_cache(self.ipbsd.output_path / "Cache/lossCurve", "npz",  y=self.data.y, mafe=self.mafe,
                                 y_fit=y_fit, mafe_fit=mafe_fit, eal=eal, PLS=self.data.PLS)
 
         # Stage 3
         initiate_msg("Start transformation of design values into spectral coordinates...")
-        self.tables, delta, alpha = self._perform_transformations(dl.theta_max, dl.a_max)
+        self.tables, delta, alpha = self.run_stage(
+            "transformations", lambda: self._perform_transformations(dl.theta_max, dl.a_max),
+            {"theta_max": dl.theta_max, "a_max": dl.a_max})
 
         if self.ipbsd.export:
-            export_results(self.ipbsd.output_path / "Cache/table_sls", self.tables, "pickle")
+            export_results(self.ipbsd.output_path / "Cache/table_sls", self.tables, "npz")
 
         success_msg("Spectral values of design limits obtained!\n...")
 
@@ -161,19 +281,16 @@ class Master:
         initiate_msg("Computing design spectrum at SLS...")
         spectra = Spectra()
 
-        # spectral acceleration in g, and spectral displacement in %
-        sa, sd = spectra.get_spectra(self.mafe[1], use_coefs=False, hazard=self.true_hazard)
+        # spectral acceleration in g, and spectral displacement in %, at all limit states
+        with profile("spectra"):
+            periods, sa_ls, sd_ls = spectra.get_uhs(self.mafe, use_coefs=False, hazard=self.hazard_index)
+        sa, sd = sa_ls[:, 1], sd_ls[:, 1]
         if self.ipbsd.export:
-            try:
-                shape = sa.shape[0]
-                sls_spectrum = np.concatenate((spectra.T_RANGE.reshape(shape, 1),
-                                               sd.reshape(shape, 1),
-                                               sa.reshape(shape, 1)), axis=1)
-                sls_spectrum = pd.DataFrame(data=sls_spectrum, columns=["Period", "Sd", "Sa"])
-                export_results(self.ipbsd.output_path / "Cache/sls_spectrum", sls_spectrum, "csv")
-            except:
-                sls_spectrum = {"sa": sa, "sd": sd, "periods": spectra.T_RANGE}
-                export_results(self.ipbsd.output_path / "Cache/sls_spectrum", sls_spectrum, "pickle")
+            sls_spectrum = pd.DataFrame(data=spectra.get_table(periods, sa, sd), columns=["Period", "Sd", "Sa"])
+            export_results(self.ipbsd.output_path / "Cache/sls_spectrum", sls_spectrum, "csv")
+            columns = ["Period"] + [f"{x}{i + 1}" for i in range(len(self.mafe)) for x in ("Sd", "Sa")]
+            spectra_ls = pd.DataFrame(data=spectra.get_table(periods, sa_ls, sd_ls), columns=columns)
+            export_results(self.ipbsd.output_path / "Cache/spectra", spectra_ls, "csv")
         success_msg("Response spectrum at SLS generated!\n...")
 
         # Stage 5
@@ -184,6 +301,7 @@ class Master:
             success_msg(f"Feasible period range identified: {self.period_limits[f'{i+1}']}")
         success_msg("...")
 
+    @profiled()
     def get_all_section_combinations(self):
         """
         Get all section combinations satisfying period bounds range
@@ -204,22 +322,82 @@ class Master:
             solution_y = check_for_file(self.ipbsd.solution_filey)
 
             # Generates all possible section combinations assuming a stiffness reduction factor
-            self.combinations = self._get_preliminary_structural_solutions(solution_x, solution_y)
+            self.combinations = self.run_stage(
+                "sections", self._get_memoised_structural_solutions(solution_x, solution_y),
+                {"solution_x": solution_x, "solution_y": solution_y, "period_limits": self.period_limits,
+                 "fstiff": self.ipbsd.fstiff, "flag3d": self.ipbsd.flag3d})
+            if self.pipeline.directory is not None:
+                self._export_structural_solutions(self.combinations)
 
         else:
             initiate_msg("Reading files containing initial section combinations satisfying period bounds...")
             # Solution file provided
-            if isinstance(self.ipbsd.solution_file, str):
-                # as a string
-                with open(self.ipbsd.solution_file, "rb") as f:
-                    self.opt_sol = pickle.load(f)
+            if isinstance(self.ipbsd.solution_file, (str, Path)):
+                # as a path, to a cache file (.npz) or a pickle
+                self.opt_sol = read_cache(self.ipbsd.solution_file, lazy=False)
             else:
                 # as a dict
                 self.opt_sol = self.ipbsd.solution_file
 
         success_msg("Initial section combinations satisfying period bounds are obtained!\n...")
 
-    def _get_preliminary_structural_solutions(self, solution_x, solution_y, iteration=False):
+    def _get_memoised_structural_solutions(self, solution_x, solution_y):
+        """
+        Gets the stage of the section combinations. If memoised, the stage must not depend on the caches of solutions
+        found in the outputs path: the solutions are derived within a temporary directory instead, and the caches are
+        exported from the results of the stage (see _export_structural_solutions)
+        :param solution_x: DataFrame                Solution in x direction, if provided
+        :param solution_y: DataFrame                Solution in y direction, if provided
+        :return: callable                           Stage
+        """
+        if self.pipeline.directory is None:
+            return lambda: self._get_preliminary_structural_solutions(solution_x, solution_y)
+
+        def run():
+            with tempfile.TemporaryDirectory() as directory:
+                create_folder(Path(directory) / "Cache")
+                return self._get_preliminary_structural_solutions(solution_x, solution_y, directory=Path(directory))
+        return run
+
+    def _export_structural_solutions(self, combinations):
+        """
+        Exports the caches of solutions of the section combinations to the outputs path, as written when the solutions
+        are derived
+        :param combinations: dict or tuple          Section combinations
+        :return: None
+        """
+        create_folder(self.ipbsd.output_path / "Cache")
+        if isinstance(combinations, tuple):
+            results_x, results_y = combinations
+        else:
+            results_x, results_y = combinations, {}
+
+        if "opt_sol_raw" in results_x:
+            # Space systems
+            files = {"Cache/solution_space.csv": "sols", "Cache/solution_cache_space_x.csv": "sols_x",
+                     "Cache/solution_cache_space_y.csv": "sols_y", "Cache/solution_cache_space_gr.csv": "sols_gr",
+                     "Cache/elements_space.csv": "elements"}
+            for filename, key in files.items():
+                if results_x.get(key) is not None:
+                    results_x[key].to_csv(self.ipbsd.output_path / filename)
+        else:
+            if results_x.get("sols") is not None:
+                results_x["sols"].to_csv(self.ipbsd.output_path / "Cache/solution_cache_x.csv")
+            if results_y.get("sols") is not None:
+                results_y["sols"].to_csv(self.ipbsd.output_path / "solution_cache_y.csv")
+
+    def _get_preliminary_structural_solutions(self, solution_x, solution_y, iteration=False, directory=None):
+        """
+        Gets the section combinations satisfying the period limits
+        :param solution_x: DataFrame                Solution in x direction, if provided
+        :param solution_y: DataFrame                Solution in y direction, if provided
+        :param iteration: bool                      Whether iterations are being carried out
+        :param directory: Path                      Directory of the caches of solutions, read if found. If None, the
+                                                    outputs path
+        :return: dict or tuple                      Section combinations and optimal solutions
+        """
+        directory = directory or self.ipbsd.output_path
+
         def run_cross_section(period_limits, bays, path=None, iterate=False, perp=None):
             return CrossSection(self.data.nst, len(bays), self.data.fy, self.data.fc, bays,
                                 self.data.heights, n_seismic, masses, self.ipbsd.fstiff, period_limits[0],
@@ -233,13 +411,13 @@ class Master:
             n_seismic, masses = self._get_system("x")
             if solution_x is None:
                 cs = run_cross_section(self.period_limits["1"], self.data.spans_x,
-                                       self.ipbsd.output_path / "Cache/solution_cache_x.csv")
+                                       directory / "Cache/solution_cache_x.csv")
                 opt_sol, opt_modes = cs.find_optimal_solution()
                 results_x = {"sols": cs.solutions, "opt_sol": opt_sol, "opt_modes": opt_modes}
 
             elif solution_x is not None and not iteration:
                 cs = run_cross_section(self.period_limits["1"], self.data.spans_x,
-                                       self.ipbsd.output_path / "Cache/solution_cache_x.csv")
+                                       directory / "Cache/solution_cache_x.csv")
                 opt_sol, opt_modes = cs.find_optimal_solution(solution_x)
                 results_x = {"sols": cs.solutions, "opt_sol": opt_sol, "opt_modes": opt_modes}
 
@@ -256,13 +434,13 @@ class Master:
 
                 if solution_y is None:
                     cs = run_cross_section(self.period_limits["2"], self.data.spans_y,
-                                           self.ipbsd.output_path / "solution_cache_y.csv", perp=opt_sol_x)
+                                           directory / "solution_cache_y.csv", perp=opt_sol_x)
                     opt_sol, opt_modes = cs.find_optimal_solution()
                     results_y = {"sols": cs.solutions, "opt_sol": opt_sol, "opt_modes": opt_modes}
 
                 elif solution_y is not None and not iteration:
                     cs = run_cross_section(self.period_limits["2"], self.data.spans_y,
-                                           self.ipbsd.output_path / "solution_cache_y.csv", perp=opt_sol_x)
+                                           directory / "solution_cache_y.csv", perp=opt_sol_x)
                     opt_sol, opt_modes = cs.find_optimal_solution(solution_y)
                     results_y = {"sols": cs.solutions, "opt_sol": opt_sol, "opt_modes": opt_modes}
 
@@ -280,19 +458,23 @@ class Master:
             # Space systems (3D only)
             if solution_x is None and self.data is not None:
                 cs = run_cross_section_space(self.period_limits)
-                cs.read_solutions(export_directory=self.ipbsd.output_path / "Cache/solution_space.csv")
+                cs.read_solutions(export_directory=directory / "Cache/solution_space.csv")
                 opt_sol_raw, opt_modes = cs.find_optimal_solution()
                 # Convert optimal solution for usability. Gravity refers to central structural elements.
                 # (e.g. transform it into a dictionary with keys: x_seismic, y_seismic, gravity)
                 opt_sol = cs.get_section(opt_sol_raw)
-                results = {"opt_sol_raw": opt_sol_raw, "opt_modes": opt_modes, "opt_sol": opt_sol, "sols": cs.solutions}
+                results = {"opt_sol_raw": opt_sol_raw, "opt_modes": opt_modes, "opt_sol": opt_sol, "sols": cs.solutions,
+                           "sols_x": cs.solutions_x, "sols_y": cs.solutions_y, "sols_gr": cs.solutions_gr,
+                           "elements": cs.elements}
 
             elif solution_x is not None:
                 cs = run_cross_section_space(self.period_limits)
-                cs.read_solutions(export_directory=self.ipbsd.output_path / "Cache/solution_space.csv")
+                cs.read_solutions(export_directory=directory / "Cache/solution_space.csv")
                 opt_sol_raw, opt_modes = cs.find_optimal_solution(solution_x)
                 opt_sol = cs.get_section(opt_sol_raw)
-                results = {"opt_sol_raw": opt_sol_raw, "opt_modes": opt_modes, "opt_sol": opt_sol, "sols": cs.solutions}
+                results = {"opt_sol_raw": opt_sol_raw, "opt_modes": opt_modes, "opt_sol": opt_sol, "sols": cs.solutions,
+                           "sols_x": cs.solutions_x, "sols_y": cs.solutions_y, "sols_gr": cs.solutions_gr,
+                           "elements": cs.elements}
 
             else:
                 cs = run_cross_section_space(self.period_limits, iterate=True)
@@ -334,6 +516,7 @@ class Master:
 
         return n_seismic, masses
 
+    @profiled()
     def perform_iterations(self):
 
         initiate_msg("Starting iterations for confined design!")
@@ -407,22 +590,60 @@ class Master:
         might act as a more realistic value. Notably Haselton, 2016 limits the secant yield stiffness between
         0.2EIg and 0.6EIg.
         """
+        # In-process cache of M-phi relationships, backed by an on-disk store if a directory was provided
+        mphi_cache = MPhiCache(self.ipbsd.mphi_cache_dir)
+        # Precomputed M-phi response surface, used in place of the exact solver within its grid
+        mphi_surface = None
+        if self.ipbsd.mphi_surface is not None:
+            mphi_surface = MPhiSurface(self.ipbsd.mphi_surface, exact=self.ipbsd.mphi_exact)
+
+        # Precomputed SPO2IDA collapse capacities, used in place of the exact tool within its grid
+        spo2ida_table = None
+        if self.ipbsd.spo2ida_table is not None:
+            spo2ida_table = SPO2IDATable(self.ipbsd.spo2ida_table, exact=self.ipbsd.spo2ida_exact)
+
+        # Process pool for concurrent design of elements
+        executor = None
+        if self.ipbsd.workers is not None and self.ipbsd.workers > 1:
+            executor = ProcessPoolExecutor(self.ipbsd.workers)
+
         seek = SeekDesign(self.ipbsd.spo_filename, self.ipbsd.target_mafc, self.ipbsd.analysis_type, self.ipbsd.damping,
                           self.ipbsd.num_modes, self.ipbsd.fstiff, self.ipbsd.rebar_cover, gravity_loads,
-                          self.data.configuration, self.data, self.true_hazard, self.ipbsd.output_path)
-
-        seek.generate_initial_solutions(self.opt_sol, modes, self.ipbsd.overstrength, table)
-        outputs = seek.run_iterations(self.opt_sol, modes, self.period_limits, table, self.ipbsd.maxiter,
-                                      self.ipbsd.overstrength)
+                          self.data.configuration, self.data, self.hazard_index, self.ipbsd.output_path,
+                          mphi_cache=mphi_cache, mphi_surface=mphi_surface, executor=executor,
+                          redesign_tol=self.ipbsd.redesign_tol, spo2ida_table=spo2ida_table)
+
+        try:
+            seek.generate_initial_solutions(self.opt_sol, modes, self.ipbsd.overstrength, table)
+            outputs = seek.run_iterations(self.opt_sol, modes, self.period_limits, table, self.ipbsd.maxiter,
+                                          self.ipbsd.overstrength)
+        finally:
+            if executor is not None:
+                executor.shutdown()
 
         ipbsd_outputs, spo_results, opt_sol, modes, details, hinges, model_outputs = outputs
+        self.opt_sol = opt_sol
+
+        stats = mphi_cache.get_stats()
+        success_msg(f"M-phi cache: {stats['hits'] + stats['disk_hits']} hits, {stats['misses']} misses "
+                    f"(hit ratio {stats['hit_ratio'] * 100:.1f}%)")
+        stats = seek.design_stats
+        success_msg(f"Element designs: {stats['designed']} run, {stats['skipped']} reused for identical inputs, "
+                    f"{stats['reused']} kept from previous iterations")
+        if mphi_surface is not None:
+            stats = mphi_surface.get_stats()
+            success_msg(f"M-phi surface: {stats['hits']} interpolated, {stats['fallbacks']} exact")
+        if spo2ida_table is not None:
+            stats = spo2ida_table.get_stats()
+            success_msg(f"SPO2IDA table: {stats['hits']} interpolated, {stats['fallbacks']} exact")
 
         # Export cache
         if self.ipbsd.export:
-            export_results(self.ipbsd.output_path / "Cache/spoAnalysisCurveShape", spo_results, "pickle")
-            export_results(self.ipbsd.output_path / "Cache/optimal_solution", opt_sol, "pickle")
-            export_results(self.ipbsd.output_path / "Cache/modes", modes, "pickle")
-            export_results(self.ipbsd.output_path / "Cache/ipbsd", ipbsd_outputs, "pickle")
-            export_results(self.ipbsd.output_path / "Cache/details", details, "pickle")
-            export_results(self.ipbsd.output_path / "Cache/hinge_models", hinges, "pickle")
-            export_results(self.ipbsd.output_path / "Cache/modelOutputs", model_outputs, "pickle")
+            export_results(self.ipbsd.output_path / "Cache/spoAnalysisCurveShape", spo_results, "npz")
+            export_results(self.ipbsd.output_path / "Cache/optimal_solution", opt_sol, "npz")
+            export_results(self.ipbsd.output_path / "Cache/modes", modes, "npz")
+            export_results(self.ipbsd.output_path / "Cache/ipbsd", ipbsd_outputs, "npz")
+            export_results(self.ipbsd.output_path / "Cache/details", details, "npz")
+            export_results(self.ipbsd.output_path / "Cache/hinge_models", hinges, "npz")
+            export_results(self.ipbsd.output_path / "Cache/modelOutputs", model_outputs, "npz")
+            export_results(self.ipbsd.output_path / "Cache/recompute_log", seek.recompute_log, "npz")
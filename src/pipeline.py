@@ -0,0 +1,161 @@
+"""
+Memoised stages of the IPBSD framework
+Each stage declares its parameters and the upstream stages it depends on. Its results are stored under a hash of the
+parameters (files and directories by their content) and of the keys of the upstream stages, along with a record of the
+inputs that produced them, so that re-runs skip every stage whose inputs are unchanged
+"""
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.ipbsd_utils import create_folder, success_msg
+from utils.profiler import profile
+
+
+def update_hash(h, value):
+    """
+    Feeds a value into a hash, by content
+    :param h: hashlib object                Hash
+    :param value: object                    Value (files and directories are given as Path)
+    :return: None
+    """
+    if isinstance(value, Path):
+        if value.is_dir():
+            h.update(b"dir")
+            for root, dirs, files in sorted(os.walk(value)):
+                dirs.sort()
+                for file in sorted(files):
+                    path = Path(root) / file
+                    h.update(str(path.relative_to(value)).encode())
+                    update_hash(h, path)
+        elif value.is_file():
+            h.update(b"file")
+            with open(value, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    h.update(block)
+        else:
+            raise ValueError(f"[EXCEPTION] Input of a pipeline stage not found: {value}!")
+    elif value is None or isinstance(value, (bool, int, float, str, np.generic)):
+        h.update(f"{type(value).__name__}:{value!r}".encode())
+    elif isinstance(value, np.ndarray):
+        h.update(f"array:{value.dtype.str}:{value.shape}".encode())
+        h.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (pd.DataFrame, pd.Series)):
+        h.update(f"{type(value).__name__}:{list(value.index)!r}".encode())
+        if isinstance(value, pd.DataFrame):
+            h.update(repr(list(value.columns)).encode())
+        h.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, dict):
+        h.update(f"dict:{len(value)}".encode())
+        for k in sorted(value, key=repr):
+            update_hash(h, k)
+            update_hash(h, value[k])
+    elif isinstance(value, (list, tuple)):
+        h.update(f"{type(value).__name__}:{len(value)}".encode())
+        for item in value:
+            update_hash(h, item)
+    else:
+        h.update(pickle.dumps(value))
+
+
+def get_hash(value):
+    """
+    Hashes a value by content
+    :param value: object                    Value
+    :return: str                            Hash
+    """
+    h = hashlib.sha1()
+    update_hash(h, value)
+    return h.hexdigest()
+
+
+class Pipeline:
+    def __init__(self, directory=None):
+        """
+        Initializes the pipeline
+        :param directory: str                   Directory of the stored results of the stages. If None, all stages are
+                                                run and nothing is stored
+        """
+        self.directory = directory
+        if self.directory is not None:
+            self.directory = Path(self.directory)
+            create_folder(self.directory)
+
+        # Keys of the stages run (or reused) so far
+        self.keys = {}
+        # Statistics
+        self.run = []
+        self.reused = []
+
+    def get_key(self, name, params, depends):
+        """
+        Gets the key of a stage
+        :param name: str                        Stage name
+        :param params: dict                     Parameters of the stage
+        :param depends: tuple                   Names of the upstream stages
+        :return: str, dict                      Key and the record of the inputs of the stage
+        """
+        for stage in depends:
+            if stage not in self.keys:
+                raise ValueError(f"[EXCEPTION] Stage {name} depends on stage {stage}, which has not been run!")
+
+        record = {"stage": name, "params": {param: get_hash(value) for param, value in params.items()},
+                  "depends": {stage: self.keys[stage] for stage in depends}}
+        return get_hash(json.dumps(record, sort_keys=True)), record
+
+    def run_stage(self, name, function, params=None, depends=()):
+        """
+        Runs a stage, or reuses its stored results if its inputs are unchanged
+        The function must only use the declared parameters and the results of the declared upstream stages
+        :param name: str                        Stage name
+        :param function: callable               Stage, called without arguments, returns its results
+        :param params: dict                     Parameters of the stage
+        :param depends: tuple                   Names of the upstream stages
+        :return: object                         Results of the stage
+        """
+        with profile(name, "pipeline"):
+            return self._run_stage(name, function, params or {}, depends)
+
+    def _run_stage(self, name, function, params, depends):
+        if self.directory is None:
+            self.keys[name] = None
+            self.run.append(name)
+            return function()
+
+        key, record = self.get_key(name, params, depends)
+        self.keys[name] = key
+        filename = self.directory / f"{name}_{key}"
+
+        if os.path.isfile(f"{filename}.pickle"):
+            with open(f"{filename}.pickle", "rb") as f:
+                results = pickle.load(f)
+            self.reused.append(name)
+            success_msg(f"Stage {name}: inputs unchanged, stored results reused")
+            return results
+
+        results = function()
+
+        # Written under a temporary name first, so that an interrupted run leaves no partial results behind, and
+        # concurrent runs sharing the directory do not write to the same file
+        tmp = f"{filename}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(record, f, indent=2)
+        os.replace(tmp, f"{filename}.json")
+        with open(tmp, "wb") as f:
+            pickle.dump(results, f)
+        os.replace(tmp, f"{filename}.pickle")
+
+        self.run.append(name)
+        return results
+
+    def get_stats(self):
+        """
+        Gets the stages run and reused
+        :return: dict                           Names of the stages run and reused
+        """
+        return {"run": list(self.run), "reused": list(self.reused)}
@@ -1,14 +1,14 @@
-from scipy.optimize import fsolve
 import pandas as pd
 
 from analysis.detailing import Detailing
-from src.MAFC import MAFC
+from src.MAFC import solve_cy
 from src.crossSectionSpace import CrossSectionSpace
-from tools.spo2ida import SPO2IDA
+from tools.spo2ida import SPO2IDABatch
 from analysis.action import Action
 from analysis.openseesrun import OpenSeesRun
 from analysis.analysisMethods import run_opensees_analysis
 from utils.ipbsd_utils import compare_areas
+from utils.profiler import profiled
 from utils.seek_design_utils import *
 from utils.spo2ida_utils import read_spo_data
 
@@ -17,7 +17,8 @@ class SeekDesign:
     """For 3D modelling only"""
 
     def __init__(self, spo_filename, target_mafc, analysis_type, damping, num_modes, fstiff, rebar_cover,
-                 gravity_loads, system, data, hazard, export_directory):
+                 gravity_loads, system, data, hazard, export_directory, mphi_cache=None,
+                 mphi_surface=None, executor=None, redesign_tol=None, spo2ida_table=None):
         """
         Initialize iterations
         :param spo_filename: str                        Path to .csv containing SPO shape assumptions
@@ -30,8 +31,17 @@ class SeekDesign:
         :param gravity_loads: dict                      Gravity loads to be applied
         :param system: str                              Perimeter or Space
         :param data: dict                               Input arguments of IPBSD
-        :param hazard: dict                             Hazard curves
+        :param hazard: HazardIndex                      Hazard curves
         :param export_directory: str                    Path to export outputs
+        :param mphi_cache: MPhiCache                    Memoisation cache of M-phi relationships shared across
+                                                        iterations (optional)
+        :param mphi_surface: MPhiSurface                Precomputed M-phi response surface (optional)
+        :param executor: Executor                       Executor designing the elements concurrently (optional)
+        :param redesign_tol: dict                       Tolerances on demands (relative) and sections (absolute, in m)
+                                                        within which elements keep the designs of the previous
+                                                        iteration. If None, all elements are redesigned every iteration
+        :param spo2ida_table: SPO2IDATable              Precomputed collapse capacities of SPO2IDA (optional). If
+                                                        provided, IDA curves are not computed
         """
         self.spo_filename = spo_filename
         self.target_mafc = target_mafc
@@ -45,6 +55,16 @@ class SeekDesign:
         self.data = data
         self.hazard = hazard
         self.export_directory = export_directory
+        self.mphi_cache = mphi_cache
+        self.mphi_surface = mphi_surface
+        self.executor = executor
+        self.spo2ida_table = spo2ida_table
+        # Number of distinct element designs run and of designs reused across elements with identical inputs
+        self.design_stats = {"designed": 0, "skipped": 0, "reused": 0}
+        # Incremental design: element designs of the latest iteration for each frame and log of redesigned elements
+        self.redesign_tol = redesign_tol
+        self.previous_designs = {"x": {}, "y": {}, "gravity": {}}
+        self.recompute_log = []
 
         # SPO shape
         self.spo_shape = {}
@@ -93,6 +113,7 @@ class SeekDesign:
 
         return demands
 
+    @profiled("MA", "iteration")
     def run_ma(self, solution, hinge, period_limits, direction, tol=1.05, spo_period=None, do_corrections=True):
         """
         Creates a nonlinear model and runs Modal Analysis with the aim of correcting solution and fundamental period
@@ -171,6 +192,7 @@ class SeekDesign:
 
         return model_periods, modalShape, part_factor, mstar, solution
 
+    @profiled("SPO", "iteration")
     def run_spo(self, solution, hinge, vy, pattern, omega, direction="x"):
         """
         Create a nonlinear model in OpenSees and runs SPO
@@ -243,36 +265,50 @@ class SeekDesign:
 
         return spo_results, [d, v], omega_new
 
-    @staticmethod
-    def run_spo2ida(data):
-        mc, a, ac, r, mf, period, pw = map(data.get, ('mc', 'a', 'ac', 'r', 'mf', 'T', 'pw'))
-
-        model = SPO2IDA(mc, a, ac, r, mf, period, pw)
-        R16, R50, R84, idacm, idacr, spom, spor = model.run_spo2ida_allT()
-        output = {'R16': R16, 'R50': R50, 'R84': R84, 'idacm': idacm, 'idacr': idacr, 'spom': spom, 'spor': spor}
-        return output
+    def run_spo2ida(self, shapes):
+        """
+        Runs SPO2IDA for the SPO shapes of all directions at once
+        :param shapes: dict                         SPO2IDA parameters of each direction
+        :return: dict                               SPO2IDA results of each direction
+        """
+        params = [[shape[p] for shape in shapes.values()] for p in ('mc', 'a', 'ac', 'r', 'mf', 'T', 'pw')]
+        spo2ida = SPO2IDABatch(*params)
+        if self.spo2ida_table is not None:
+            # Collapse capacities from the precomputed table, only the SPO curves are evaluated
+            R16, R50, R84 = self.spo2ida_table.evaluate(*params)
+            idacm = idacr = None
+            spom, spor = spo2ida.run_spo2ida_spo(np.minimum(spo2ida.mc, spo2ida.mf))
+        else:
+            R16, R50, R84, idacm, idacr, spom, spor = spo2ida.run_spo2ida_allT(curves=True)
+        if np.isnan(R50).any():
+            raise ValueError("[EXCEPTION] SPO shape outside the ranges of applicability of SPO2IDA")
+
+        outputs = {}
+        for i, key in enumerate(shapes):
+            outputs[key] = {'R16': R16[i], 'R50': R50[i], 'R84': R84[i], 'idacm': None, 'idacr': None,
+                            'spom': spom[i], 'spor': spor[i]}
+            if idacm is not None:
+                active = ~np.isnan(idacm[i])
+                outputs[key]['idacm'] = [idacm[i][j][active[j]].tolist() for j in range(3)]
+                outputs[key]['idacr'] = [idacr[i][j][active[j]].tolist() for j in range(3)]
+        return outputs
 
     def verify_mafc(self, period, spo2ida, part_factor, omega):
         """
-        optimizes for a target mafc
-        :param period: float                        Fundamental period of the structure
-        :param spo2ida: dict                        Dictionary containing SPO2IDA results
-        :param part_factor: float                   First mode participation factor
-        :param omega: float                         Overstrength factor
-        :return: float, float                       Spectral acceleration [g] and displacement [m] at yield
+        optimizes for a target mafc, in all directions at once
+        :param period: list                         Fundamental periods of the structure
+        :param spo2ida: list                        Dictionaries containing SPO2IDA results
+        :param part_factor: list                    First mode participation factors
+        :param omega: list                          Overstrength factors
+        :return: list, list                         Spectral accelerations [g] and displacements [m] at yield
         """
-        r = [spo2ida['R16'], spo2ida['R50'], spo2ida['R84']]
-        Hs, sa_hazard = self.hazard[2][int(round(period * 10))], self.hazard[1][int(round(period * 10))]
-
-        m = MAFC(r, self.target_mafc, part_factor, Hs, sa_hazard, omega, True)
-        fsolve(m.objective, x0=np.array([0.02]), factor=0.1)
+        r = [[data['R16'], data['R50'], data['R84']] for data in spo2ida]
 
-        # Yield displacement for ESDOF
-        dy = float(m.cy) * 9.81 * (period / 2 / np.pi) ** 2
-        cy = float(m.cy)
+        cy, dy, _, _ = solve_cy(r, self.target_mafc, part_factor, omega, period, self.hazard)
 
-        return cy, dy
+        return cy.tolist(), dy.tolist()
 
+    @profiled("MAFC", "iteration")
     def target_for_mafc(self, solution, overstrength, read=True):
         """
         Look for a spectral acceleration at yield to target for MAFC
@@ -311,15 +347,8 @@ class SeekDesign:
         part_factor = [solution["x_seismic"]["Part Factor"], solution["y_seismic"]["Part Factor"]]
 
         # Run SPO2IDA
-        cy_xy = []
-        dy_xy = []
-        spo2ida_data = {}
-        for key in self.spo_shape.keys():
-            i = 0 if key == "x" else 1
-            spo2ida_data[key] = self.run_spo2ida(self.spo_shape[key])
-            cy, dy = self.verify_mafc(period[i], spo2ida_data[key], part_factor[i], overstrength[i])
-            cy_xy.append(cy)
-            dy_xy.append(dy)
+        spo2ida_data = self.run_spo2ida(self.spo_shape)
+        cy_xy, dy_xy = self.verify_mafc(period, [spo2ida_data["x"], spo2ida_data["y"]], part_factor, overstrength)
 
         # Get maximum Cy of both directions
         # Only cy is consistent when designing both directions, the rest of the parameters are unique to the direction
@@ -343,6 +372,7 @@ class SeekDesign:
         }
         return forces
 
+    @profiled("design", "iteration")
     def design_building(self, cy, dy, solution, modes, table_sls, gravity_demands, hinge=None):
         """
         Design the structural components of the building
@@ -427,23 +457,46 @@ class SeekDesign:
             spans = self.data.spans_y
             nbays = len(spans)
 
+        frame = "gravity" if gravity else "xy"[direction]
+
         d = Detailing(demands, self.data.nst, nbays, self.data.fy, self.data.fc, spans, self.data.heights,
                       self.data.n_seismic, self.data.masses, dy, sections, ductility_class=ductility_class,
-                      rebar_cover=cover, est_ductilities=est_ductilities, direction=direction)
+                      rebar_cover=cover, est_ductilities=est_ductilities, direction=direction,
+                      mphi_cache=self.mphi_cache, mphi_surface=self.mphi_surface, executor=self.executor,
+                      previous_designs=self.previous_designs[frame], redesign_tol=self.redesign_tol)
         if gravity:
             hinge_models, w = d.design_gravity()
             warnMax = d.WARNING_MAX
             warnMin = d.WARNING_MIN
             warnings = {"warnings": w, "warnMax": warnMax, "warnMin": warnMin}
+            self.update_design_stats(d, frame)
 
             return hinge_models, warnings
         else:
             data, hinge_models, mu_c, mu_f, warnings = d.design_elements(modes)
             warnMax = d.WARNING_MAX
             warnMin = d.WARNING_MIN
+            self.update_design_stats(d, frame)
 
         return data, hinge_models, mu_c, mu_f, warnMax, warnMin, warnings
 
+    def update_design_stats(self, detailing, frame):
+        """
+        Accumulates the number of distinct and reused element designs, keeps the element designs for the next
+        iteration and logs the elements that were redesigned
+        :param detailing: Detailing                 Detailing run
+        :param frame: str                           Frame designed (x, y or gravity)
+        :return: None
+        """
+        for key in self.design_stats:
+            self.design_stats[key] += detailing.design_stats[key]
+
+        self.previous_designs[frame] = detailing.element_designs
+        self.recompute_log.append({"frame": frame, "recomputed": detailing.recomputed, "reused": detailing.reused})
+        if self.redesign_tol is not None:
+            print(f"[DETAILING] Frame {frame}: {len(detailing.recomputed)} elements redesigned, "
+                  f"{len(detailing.reused)} kept from the previous iteration")
+
     def initialize_demands(self):
         bx_gravity = np.zeros((self.data.nst, self.data.n_bays, len(self.data.spans_y) - 1))
         by_gravity = np.zeros((self.data.nst, self.data.n_bays - 1, len(self.data.spans_y)))
@@ -4,6 +4,8 @@ defines spectra at desired performance limit states
 import numpy as np
 from scipy.interpolate import interp1d
 
+from src.hazardIndex import HazardIndex
+
 
 class Spectra:
     """
@@ -20,56 +22,63 @@ class Spectra:
         :param use_coefs: bool      True for Fitted hazard, False for True hazard
         :param df: DataFrame        2nd-order hazard fit coefficients
         :param periods: array       Periods used when fitting the hazard
-        :param hazard: dict         True hazard data
+        :param hazard: HazardIndex  True hazard data (or the raw hazard list)
         :return: lists              Spectral accelerations and spectral displacements associated with the limit state
                                     spectral acceleration and displacement, sa in [g], sd in [%]
         """
+        _, s, d = self.get_uhs(lam, use_coefs, df, periods, hazard)
+        return s[:, 0], d[:, 0]
+
+    def get_uhs(self, lam, use_coefs=False, df=None, periods=None, hazard=None):
+        """
+        Gets uniform hazard spectra at several MAFEs at once
+        :param lam: float or array  MAFs of exceeding the limit states
+        :param use_coefs: bool      True for Fitted hazard, False for True hazard
+        :param df: DataFrame        2nd-order hazard fit coefficients
+        :param periods: array       Periods used when fitting the hazard
+        :param hazard: HazardIndex  True hazard data (or the raw hazard list)
+        :return: arrays             Periods, spectral accelerations in [g] and spectral displacements in [cm], of shape
+                                    (number of periods, number of MAFs)
+        """
+        lam = np.atleast_1d(np.asarray(lam, dtype=float))
 
         if use_coefs:
 
             if df is None or periods is None:
                 raise ValueError("Fitting coefficients (df) and periods need to be provided!")
 
-            s = np.zeros(len(self.T_RANGE))
-            d = np.zeros(len(self.T_RANGE))
-
             # Unstable, avoid if actual hazard is available
-            # Interpolation functions based on provided hazard for Period vs coefficients
-            interpolator_k0 = interp1d(np.array(periods), np.array(df.loc['k0']))
-            interpolator_k1 = interp1d(np.array(periods), np.array(df.loc['k1']))
-            interpolator_k2 = interp1d(np.array(periods), np.array(df.loc['k2']))
-
-            for i in range(len(self.T_RANGE)):
-                # Period
-                T_val = self.T_RANGE[i]
-                # 2nd-order hazard fitting coefficients
-                k0 = interpolator_k0(T_val)
-                k1 = interpolator_k1(T_val)
-                k2 = interpolator_k2(T_val)
-                # Compute the acceleration, [g]
-                s[i] = float(np.exp((-k1 + np.sqrt(k1 ** 2 - 4 * k2 * np.log(lam / k0))) / 2 / k2))
-
-                if T_val > 0.0:
-                    # Assign the displacement in [cm]
-                    d[i] = 100 * s[i] * 9.81 * (float(T_val) / 2 / np.pi) ** 2
+            # 2nd-order hazard fitting coefficients, interpolated at all periods
+            k0, k1, k2 = (interp1d(np.array(periods), np.array(df.loc[k]))(self.T_RANGE)[:, None]
+                          for k in ("k0", "k1", "k2"))
+            # Compute the acceleration, [g]
+            s = np.exp((-k1 + np.sqrt(k1 ** 2 - 4 * k2 * np.log(lam / k0))) / 2 / k2)
 
         else:
             if hazard is None:
                 raise ValueError("True hazard must be provided!")
+            if not isinstance(hazard, HazardIndex):
+                hazard = HazardIndex(hazard)
 
             # recommended
-            self.T_RANGE = np.zeros(len(hazard[0]))
-            s = np.zeros(len(hazard[0]))
-            d = np.zeros(len(hazard[0]))
+            # Uniform hazard spectra, interpolated linearly along the hazard curves
+            self.T_RANGE = hazard.periods.copy()
+            s = hazard.get_sa(self.T_RANGE[:, None], lam, loglog=False)
 
-            for i in range(len(hazard[0])):
-                interpolator = interp1d(np.array(hazard[2][i]), np.array(hazard[1][i]))
+        # Displacement in [cm]
+        d = 100 * s * 9.81 * (self.T_RANGE[:, None] / 2 / np.pi) ** 2
 
-                sval = interpolator(lam)
-                dval = 100 * sval * 9.81 * (float(i/10) / 2 / np.pi) ** 2
+        return self.T_RANGE, s, d
 
-                self.T_RANGE[i] = float(i/10)
-                s[i] = sval
-                d[i] = dval
-
-        return s, d
+    @staticmethod
+    def get_table(periods, s, d):
+        """
+        Arranges spectra in a table, one row per period
+        :param periods: array       Periods
+        :param s: array             Spectral accelerations, of shape (number of periods, number of MAFs)
+        :param d: array             Spectral displacements, of shape (number of periods, number of MAFs)
+        :return: array              Periods followed by the displacement and acceleration of each MAF, i.e. Period, Sd
+                                    and Sa for a single MAF
+        """
+        s, d = s.reshape(len(periods), -1), d.reshape(len(periods), -1)
+        return np.column_stack([periods] + [x for pair in zip(d.T, s.T) for x in pair])
@@ -0,0 +1,186 @@
+"""
+Parametric sensitivity sweeps of IPBSD around a base case
+The swept arguments of Main (e.g. limit_eal, target_mafc, fstiff, overstrength, rebar_cover) are mapped to the stages
+of the framework they invalidate. The memoised upstream stages are computed once for each distinct value of the
+arguments they read, and all sweep points are then run concurrently, reusing the upstream stages and running the
+downstream ones only
+"""
+import contextlib
+import inspect
+import itertools
+import os
+import timeit
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from batch import PATHS, prepare_assets, run_case
+from main import Main
+from src.master import Master, STAGES, get_invalidated_stages
+from utils.ipbsd_utils import create_folder, export_results, initiate_msg, success_msg, error_msg
+
+
+def run_upstream(arguments, log_filename):
+    """
+    Runs the memoised upstream stages of a sweep point, in a worker process
+    :param arguments: dict                  Arguments of Main
+    :param log_filename: Path               Log of the run
+    :return: dict                           Status, and the stages run and reused
+    """
+    with open(log_filename, "w") as log, contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        master = None
+        try:
+            master = Master(Main(**arguments))
+            master.read_input()
+            master.perform_calculations()
+            master.get_all_section_combinations()
+            status = "completed"
+        except Exception:
+            traceback.print_exc()
+            status = "failed"
+    stats = master.pipeline.get_stats() if master is not None else {"run": [], "reused": []}
+    return {"Status": status, **stats}
+
+
+class Sweep:
+    def __init__(self, base, grids, output_path, mode="grid", workers=None):
+        """
+        Initializes the sweep
+        :param base: dict                       Arguments of Main of the base case
+        :param grids: dict                      Values of each swept argument, e.g. {"fstiff": [0.4, 0.5, 0.6]}
+        :param output_path: str                 Outputs path of the sweep, with an output directory for each point,
+                                                the shared assets and the results
+        :param mode: str                        "grid": all combinations of the values (full factorial)
+                                                "one_at_a_time": each argument varied alone, others kept at the base
+                                                case
+        :param workers: int                     Number of points run concurrently. If None, the number of CPUs is used
+        """
+        parameters = inspect.signature(Main).parameters
+        unknown = [argument for argument in grids if argument not in parameters]
+        if unknown:
+            raise ValueError(f"[EXCEPTION] Unknown swept arguments: {', '.join(unknown)}!")
+        if mode not in ("grid", "one_at_a_time"):
+            raise ValueError("[EXCEPTION] Wrong sweep mode! mode must be 'grid' or 'one_at_a_time'!")
+
+        self.base = dict(base)
+        self.grids = {argument: list(values) for argument, values in grids.items()}
+        # Files and directories given as str
+        for argument in PATHS:
+            if isinstance(self.base.get(argument), str):
+                self.base[argument] = Path(self.base[argument])
+            if argument in self.grids:
+                self.grids[argument] = [Path(value) if isinstance(value, str) else value
+                                        for value in self.grids[argument]]
+        self.output_path = Path(output_path)
+        self.mode = mode
+        self.workers = workers or os.cpu_count()
+        # Read-only assets and memoised stages shared by all points
+        self.shared = self.output_path / "Shared"
+        self.base.setdefault("hazard_store_dir", self.shared / "hazard")
+        self.base.setdefault("slf_store_dir", self.shared / "slf")
+        self.base.setdefault("pipeline_cache_dir", self.shared / "pipeline")
+
+        self.points = self.get_points()
+
+    def get_points(self):
+        """
+        Gets the sweep points
+        :return: list                           Values of the swept arguments of each point
+        """
+        if self.mode == "grid":
+            return [dict(zip(self.grids, values)) for values in itertools.product(*self.grids.values())]
+
+        points = []
+        for argument, values in self.grids.items():
+            for value in values:
+                point = {arg: self.base.get(arg) for arg in self.grids}
+                point[argument] = value
+                if point not in points:
+                    points.append(point)
+        return points
+
+    def get_invalidated_stages(self):
+        """
+        Gets the stages of the framework invalidated by the swept arguments
+        :return: list                           Names of the stages
+        """
+        return get_invalidated_stages(list(self.grids))
+
+    def get_upstream_groups(self):
+        """
+        Groups the points sharing the memoised upstream stages, i.e. the same values of the swept arguments read by
+        memoised stages
+        :return: dict                           Indices of the points of each group
+        """
+        upstream = [argument for argument in self.grids
+                    if any(stage["memoised"] and argument in stage["arguments"] for stage in STAGES.values())]
+        groups = {}
+        for i, point in enumerate(self.points):
+            groups.setdefault(tuple(repr(point[argument]) for argument in upstream), []).append(i)
+        return groups
+
+    def get_arguments(self, i):
+        """
+        Gets the arguments of Main of a point
+        :param i: int                           Index of the point
+        :return: dict                           Arguments of Main
+        """
+        return {**self.base, **self.points[i], "output_path": self.output_path / f"Point{i + 1}"}
+
+    def run(self):
+        """
+        Runs the sweep
+        :return: DataFrame                      Results, one row per sweep point
+        """
+        start_time = timeit.default_timer()
+        groups = self.get_upstream_groups()
+        initiate_msg(f"Sweeping {', '.join(self.grids)} over {len(self.points)} points on {self.workers} workers...")
+        initiate_msg(f"Stages invalidated by the swept arguments: {', '.join(self.get_invalidated_stages())}")
+        initiate_msg(f"Upstream stages computed once for each of {len(groups)} groups of points")
+
+        create_folder(self.output_path)
+        cases = [self.get_arguments(i) for i in range(len(self.points))]
+        prepare_assets(dict(enumerate(cases)))
+
+        with ProcessPoolExecutor(self.workers) as executor:
+            # Shared upstream results, once for each group
+            futures = []
+            for j, indices in enumerate(groups.values()):
+                arguments = {**self.get_arguments(indices[0]), "output_path": self.output_path / f"Upstream{j + 1}"}
+                create_folder(arguments["output_path"])
+                futures.append(executor.submit(run_upstream, arguments, arguments["output_path"] / "ipbsd.log"))
+
+            # Points of the groups whose upstream stages failed are not run
+            failed = set()
+            for j, (indices, future) in enumerate(zip(groups.values(), futures)):
+                if future.result()["Status"] != "completed":
+                    error_msg(f"Upstream stages of Upstream{j + 1} failed, see its log")
+                    failed.update(indices)
+            success_msg("Upstream stages computed!")
+
+            # Downstream stages of all points
+            futures = {}
+            for i, arguments in enumerate(cases):
+                if i in failed:
+                    continue
+                create_folder(arguments["output_path"])
+                futures[i] = executor.submit(run_case, f"Point{i + 1}", arguments,
+                                             arguments["output_path"] / "ipbsd.log")
+
+            results = []
+            for i, point in enumerate(self.points):
+                if i in failed:
+                    results.append({"Point": f"Point{i + 1}", **point, "Status": "failed upstream"})
+                    continue
+                summary = futures[i].result()
+                if summary["Status"] != "completed":
+                    error_msg(f"{summary['Case']} failed, see its log")
+                results.append({"Point": summary.pop("Case"), **point, **summary})
+
+        results = pd.DataFrame(results)
+        export_results(self.output_path / "sweep", results, "csv")
+        success_msg(f"Sweep completed in {timeit.default_timer() - start_time:.1f} s, results written to "
+                    f"{self.output_path / 'sweep.csv'}")
+        return results
@@ -0,0 +1,84 @@
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from batch import Batch
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        sample = Path(__file__).parents[1] / "sample/sample1"
+        shutil.copytree(sample / "hazard", self.directory / "hazard")
+        shutil.copytree(sample / "slfoutput", self.directory / "slfoutput")
+        self.defaults = {"input_filename": "ipbsd_input.csv", "hazard_filename": "hazard/hazard.pkl",
+                         "spo_filename": "spo.csv", "slf_directory": "slfoutput", "limit_eal": 1.0,
+                         "flag3d": True, "hold_flag": True}
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_manifest(self, cases):
+        with open(self.directory / "manifest.json", "w") as f:
+            json.dump({"defaults": self.defaults, "cases": cases}, f)
+        return self.directory / "manifest.json"
+
+    def test_manifest(self):
+        batch = Batch(self.write_manifest([{"name": "A", "target_mafc": 2e-4},
+                                           {"name": "B", "target_mafc": 1e-4, "limit_eal": 0.5}]))
+        self.assertEqual(list(batch.cases), ["A", "B"])
+        self.assertEqual(batch.cases["B"]["limit_eal"], 0.5)
+        self.assertEqual(batch.cases["A"]["slf_directory"], self.directory / "slfoutput")
+        self.assertEqual(batch.cases["A"]["output_path"], self.directory / "A")
+        self.assertEqual(batch.cases["A"]["hazard_store_dir"], batch.cases["B"]["hazard_store_dir"])
+
+        with self.assertRaises(ValueError):
+            Batch(self.write_manifest([{"name": "A", "target_mafc": 2e-4, "mafc": 2e-4}]))
+        with self.assertRaises(ValueError):
+            Batch(self.write_manifest([{"name": "A"}]))
+
+    def test_shared_assets_and_failures(self):
+        batch = Batch(self.write_manifest([{"name": "A", "target_mafc": 2e-4}]), workers=1)
+        summary = batch.run()
+
+        # Hazard fit once in the shared store, SLFs packed into a bundle of the shared store, the inputs are unchanged
+        self.assertEqual(len(list((batch.shared / "hazard").glob("hazard_*.npz"))), 1)
+        self.assertEqual(len(list((batch.shared / "slf").glob("slfs_*.npz"))), 1)
+        self.assertEqual(list((self.directory / "slfoutput").glob("*.npz")), [])
+
+        # The input file is missing, the failure is logged and reported in the summary
+        self.assertEqual(summary["Status"].tolist(), ["failed"])
+        self.assertIn("ipbsd_input.csv", (self.directory / "A/ipbsd.log").read_text())
+        self.assertTrue((self.directory / "summary.csv").is_file())
+
+    def test_summary(self):
+        sample = Path(__file__).parents[1] / "sample/sample1"
+        shutil.copy(sample / "ipbsd_input.csv", self.directory / "ipbsd_input.csv")
+        shutil.copy(sample / "spo.csv", self.directory / "spo.csv")
+        batch = Batch(self.write_manifest([{"name": "A", "target_mafc": 2e-4, "repl_cost": 349459.2, "export": True,
+                                            "hold_flag": True}]), workers=1)
+        # Stale cache of solutions in the outputs path, not read by the memoised stage of section combinations
+        (self.directory / "A/Cache").mkdir(parents=True)
+        (self.directory / "A/Cache/solution_space.csv").write_text("stale\n")
+        summary = batch.run().set_index("Case")
+
+        self.assertEqual(summary.loc["A", "Status"], "completed")
+        for column in ("EAL", "MAFC", "T lower x", "T upper x", "T lower y", "T upper y", "T x", "T y", "Weight"):
+            self.assertIn(column, summary.columns)
+        self.assertAlmostEqual(summary.loc["A", "MAFC"], 2e-4)
+        self.assertLess(summary.loc["A", "T lower x"], summary.loc["A", "T upper x"])
+        self.assertTrue(summary.loc["A", "T lower x"] <= summary.loc["A", "T x"] <= summary.loc["A", "T upper x"])
+        self.assertGreater(summary.loc["A", "EAL"], 0.)
+        self.assertGreater(summary.loc["A", "Weight"], 0.)
+        self.assertTrue((self.directory / "A/Cache/lossCurve.npz").is_file())
+        # Caches of solutions exported from the results of the stage
+        for filename in ("solution_space", "solution_cache_space_x", "solution_cache_space_y",
+                         "solution_cache_space_gr", "elements_space"):
+            self.assertTrue((self.directory / f"A/Cache/{filename}.csv").is_file(), filename)
+        self.assertNotEqual((self.directory / "A/Cache/solution_space.csv").read_text(), "stale\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from benchmark import BenchmarkSuite, compare, time_function
+
+
+def setup_noop():
+    return lambda: None
+
+
+class TestBenchmark(unittest.TestCase):
+    benchmarks = {
+        "mphi_beam": {"setup": setup_noop, "repeat": 3, "slow": False},
+        "mphi_column": {"setup": setup_noop, "repeat": 3, "slow": False},
+        "opensees_spo": {"setup": setup_noop, "repeat": 1, "slow": True},
+    }
+
+    def get_suite(self, directory):
+        return BenchmarkSuite(self.benchmarks, Path(directory) / "history.jsonl", Path(directory) / "baseline.json")
+
+    def test_time_function(self):
+        calls = []
+        timing = time_function(lambda: calls.append(1), repeat=5, warmup=2)
+        self.assertEqual(len(calls), 7)
+        self.assertEqual(timing["repeat"], 5)
+        self.assertLessEqual(timing["min"], timing["median"])
+
+    def test_select(self):
+        suite = BenchmarkSuite(self.benchmarks)
+        self.assertEqual(suite.select(), ["mphi_beam", "mphi_column"])
+        self.assertEqual(suite.select(slow=True), list(self.benchmarks))
+        self.assertEqual(suite.select(["mphi", "mphi_beam"]), ["mphi_beam", "mphi_column"])
+        self.assertEqual(suite.select(["opensees"]), ["opensees_spo"])
+        with self.assertRaises(ValueError):
+            suite.select(["spo2ida"])
+
+    def test_compare(self):
+        baseline = {"a": {"median": 1.0}, "b": {"median": 1.0}, "c": {"median": 1.0}}
+        results = {"a": {"median": 1.3}, "b": {"median": 0.7}, "c": {"median": 1.1}, "d": {"median": 1.0}}
+        comparison = compare(results, baseline, tolerance=0.2)
+        self.assertEqual(comparison["a"]["status"], "regression")
+        self.assertAlmostEqual(comparison["a"]["ratio"], 1.3)
+        self.assertEqual(comparison["b"]["status"], "improvement")
+        self.assertEqual(comparison["c"]["status"], "unchanged")
+        self.assertEqual(comparison["d"]["status"], "new")
+
+    def test_history_and_baseline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            suite = self.get_suite(directory)
+            self.assertEqual(suite.read_baseline(), {})
+
+            results = suite.run()
+            self.assertEqual(list(results), ["mphi_beam", "mphi_column"])
+            suite.append_history(results)
+            suite.append_history(suite.run(["mphi_beam"]))
+            history = suite.read_history()
+            self.assertEqual(len(history), 2)
+            self.assertEqual(history[0]["results"], results)
+
+            # Baseline entries of benchmarks not rerun are kept
+            suite.update_baseline(results)
+            suite.update_baseline({"mphi_beam": {**results["mphi_beam"], "median": 1.0}})
+            baseline = suite.read_baseline()
+            self.assertEqual(baseline["mphi_beam"]["median"], 1.0)
+            self.assertEqual(baseline["mphi_column"], results["mphi_column"])
+
+            comparison = suite.compare({"mphi_beam": {"median": 2.0}})
+            self.assertEqual(comparison["mphi_beam"]["status"], "regression")
+
+
+if __name__ == "__main__":
+    unittest.main()
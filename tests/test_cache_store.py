@@ -0,0 +1,108 @@
+import os
+import pickle
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.cache_store import CacheFile, LazyDict, LazyList, open_cache, read_cache, write_cache
+from utils.ipbsd_utils import export_results
+
+CACHE = Path(__file__).parents[1] / "sample/sample1/Cache"
+
+
+class TestCacheStore(unittest.TestCase):
+    def assert_equal(self, expected, actual, path=""):
+        self.assertIs(type(actual), type(expected), path)
+        if isinstance(expected, dict):
+            self.assertEqual(list(actual), list(expected), path)
+            for key in expected:
+                self.assert_equal(expected[key], actual[key], f"{path}/{key}")
+        elif isinstance(expected, (list, tuple)):
+            self.assertEqual(len(actual), len(expected), path)
+            for i, (x, y) in enumerate(zip(expected, actual)):
+                self.assert_equal(x, y, f"{path}/{i}")
+        elif isinstance(expected, np.ndarray):
+            self.assertEqual(actual.dtype, expected.dtype, path)
+            np.testing.assert_array_equal(actual, expected)
+        elif isinstance(expected, pd.DataFrame):
+            pd.testing.assert_frame_equal(actual, expected, check_exact=True)
+        elif isinstance(expected, pd.Series):
+            pd.testing.assert_series_equal(actual, expected, check_exact=True)
+        else:
+            self.assertEqual(actual, expected, path)
+
+    def test_sample_cache_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for filename in sorted(CACHE.glob("*.pickle")):
+                with open(filename, "rb") as f:
+                    expected = pickle.load(f)
+                write_cache(Path(directory) / f"{filename.stem}.npz", expected)
+
+                self.assert_equal(expected, read_cache(Path(directory) / f"{filename.stem}.npz", lazy=False))
+                with open_cache(Path(directory) / filename.stem) as lazy:
+                    if isinstance(lazy, (LazyDict, LazyList)):
+                        self.assert_equal(expected, lazy.load())
+
+    def test_lazy_members(self):
+        with open(CACHE / "modelOutputs.pickle", "rb") as f:
+            expected = pickle.load(f)
+
+        with tempfile.TemporaryDirectory() as directory:
+            write_cache(Path(directory) / "modelOutputs.npz", expected)
+            with CacheFile(Path(directory) / "modelOutputs.npz") as cache:
+                data = cache.get_root()
+                self.assertIsInstance(data, LazyDict)
+                self.assertIsInstance(data["SPO"]["x"], LazyList)
+                np.testing.assert_array_equal(data["SPO"]["x"][1], expected["SPO"]["x"][1])
+                # Only the accessed array is read
+                self.assertEqual(len(cache.members), 1)
+                self.assertGreater(len(cache.arrays), 1)
+
+    def test_close(self):
+        data = {"SPO": {"x": (np.linspace(0, 1, 20), np.linspace(0, 2, 20))}, "cy": 0.5}
+        with tempfile.TemporaryDirectory() as directory:
+            write_cache(Path(directory) / "modelOutputs.npz", data)
+            with open_cache(Path(directory) / "modelOutputs") as lazy:
+                np.testing.assert_array_equal(lazy["SPO"]["x"][1], data["SPO"]["x"][1])
+            self.assertTrue(lazy.cache.file.closed)
+
+            with read_cache(Path(directory) / "modelOutputs")["SPO"]["x"] as lazy:
+                self.assertIsInstance(lazy, LazyList)
+            self.assertTrue(lazy.cache.file.closed)
+            # The file can be replaced once closed
+            os.replace(Path(directory) / "modelOutputs.npz", Path(directory) / "renamed.npz")
+
+    def test_frame_columns(self):
+        frame = pd.DataFrame({"Element": ["Beam", "Column"], "Storey": [1, 2], "m1": [150.2, 210.5]},
+                             index=[3, 7])
+        with tempfile.TemporaryDirectory() as directory:
+            write_cache(Path(directory) / "hinges.npz", {"x_seismic": frame, "flag": True})
+            with open_cache(Path(directory) / "hinges.npz") as data:
+                pd.testing.assert_frame_equal(data["x_seismic"], frame)
+                pd.testing.assert_frame_equal(data.get_frame("x_seismic", ["m1", "Element"]),
+                                              frame[["m1", "Element"]])
+                self.assertIs(data["flag"], True)
+
+    def test_fallbacks(self):
+        data = {"object": np.array([1, "a"], dtype=object), 1: {2.5, 3.5}, None: (np.float32(2.5), [1] * 10),
+                "records": np.zeros(2, dtype=[("a", float)]), "scalar": np.array(4.)}
+        with tempfile.TemporaryDirectory() as directory:
+            write_cache(Path(directory) / "data.npz", data)
+            self.assert_equal(data, read_cache(Path(directory) / "data.npz", lazy=False))
+
+    def test_export_and_legacy_pickles(self):
+        data = {"y": [0.01, 0.08, 1.0], "y_fit": np.linspace(0, 1, 101), "PLS": ["OLS", "SLS", "CLS"]}
+        with tempfile.TemporaryDirectory() as directory:
+            export_results(Path(directory) / "lossCurve", data, "npz")
+            export_results(Path(directory) / "legacy", data, "pickle")
+            self.assert_equal(data, read_cache(Path(directory) / "lossCurve", lazy=False))
+            self.assert_equal(data, read_cache(Path(directory) / "legacy"))
+            with self.assertRaises(ValueError):
+                read_cache(Path(directory) / "missing")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from src.designLimits import DesignLimits
+
+
+class TestDesignLimits(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(__file__).parents[1] / "sample/sample1/slfoutput"
+        self.profiles = [[0.5, 0.8, 1.0], [1.0, 0.9]]
+
+    def test_batch_matches_single(self):
+        y = np.array([0.1, 0.2, 0.3, 0.4])
+        for geometry in (True, False):
+            for profiles in (None, self.profiles):
+                limits = DesignLimits(self.directory, 0.3, 2, geometry, 1.0e6, True, True, profiles)
+                theta_max, a_max, y_sls = limits.get_design_edps_batch(
+                    y, None if profiles is None else [profiles])
+                self.assertEqual(theta_max.shape, (len(y), 2 if geometry else 1))
+
+                for i in range(len(y)):
+                    single = DesignLimits(self.directory, y[i], 2, geometry, 1.0e6, True, True, profiles)
+                    single.get_design_edps()
+                    np.testing.assert_array_equal(theta_max[i], single.theta_max)
+                    np.testing.assert_array_equal(a_max[i], single.a_max)
+                    self.assertEqual(y_sls[i], single.y)
+
+    def test_batch_without_corrections(self):
+        limits = DesignLimits(self.directory, 0.3, 2, True, 1.0e6, False, True)
+        theta_max, a_max, y_sls = limits.get_design_edps_batch([0.2, 0.3])
+        np.testing.assert_array_equal(y_sls, [0.2, 0.3])
+        # Larger ELRs allow larger EDPs
+        self.assertTrue(np.all(theta_max[1] >= theta_max[0]))
+        self.assertTrue(np.all(a_max[1] >= a_max[0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import contextlib
+import io
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from analysis.detailing import Detailing
+
+
+def get_detailing(nst=3, nbays=3, regular=False, **kwargs):
+    rng = np.random.default_rng(1)
+    demands = {"Beams": {"M": {"Pos": rng.uniform(80, 160, (nst, nbays)), "Neg": rng.uniform(60, 120, (nst, nbays))}},
+               "Columns": {"M": rng.uniform(100, 200, (nst, nbays + 1)),
+                           "N": rng.uniform(300, 900, (nst, nbays + 1))}}
+    if regular:
+        # Identical demands in all storeys and bays
+        for forces in (demands["Beams"]["M"], demands["Columns"]):
+            for key in forces:
+                forces[key][:] = forces[key][0, 0]
+    sections = pd.Series({**{f"b{st + 1}": 0.3 for st in range(nst)}, **{f"h{st + 1}": 0.55 for st in range(nst)},
+                          **{f"he{st + 1}": 0.45 for st in range(nst)}, **{f"hi{st + 1}": 0.5 for st in range(nst)}})
+    return Detailing(demands, nst, nbays, 415., 25., [5.] * nbays, [3.] * nst, 2, [100.] * nst, 0.1, sections,
+                     est_ductilities=False, **kwargs)
+
+
+class TestDetailing(unittest.TestCase):
+    def test_executor(self):
+        data, hinge_models, _, _, warnings = get_detailing().design_elements()
+
+        with ProcessPoolExecutor(2) as executor:
+            detailing = get_detailing(executor=executor)
+            data_par, hinge_models_par, _, _, warnings_par = detailing.design_elements()
+
+        self.assertTrue(hinge_models.equals(hinge_models_par))
+        self.assertEqual(warnings, warnings_par)
+        self.assertEqual(list(data["Columns"].keys()), list(data_par["Columns"].keys()))
+        for ele in data["Columns"]:
+            self.assertEqual(data["Columns"][ele][0]["reinforcement"], data_par["Columns"][ele][0]["reinforcement"])
+
+    def test_identical_elements_designed_once(self):
+        detailing = get_detailing(regular=True)
+        data = detailing.design_elements()[0]
+
+        self.assertGreater(detailing.design_stats["skipped"], 0)
+        self.assertEqual(detailing.design_stats["designed"] + detailing.design_stats["skipped"], 12)
+        self.assertEqual(data["Beams"]["Pos"]["S1B1"][0]["reinforcement"],
+                         data["Beams"]["Pos"]["S3B2"][0]["reinforcement"])
+        # Members of a group do not share outputs
+        self.assertIsNot(data["Beams"]["Pos"]["S1B1"][4], data["Beams"]["Pos"]["S2B1"][4])
+
+    def test_warnings_of_identical_elements(self):
+        detailing = get_detailing(regular=True)
+        # Undersized columns
+        for key in detailing.sections.index:
+            if key.startswith(("he", "hi")):
+                detailing.sections[key] = 0.25
+        with contextlib.redirect_stdout(io.StringIO()) as stdout:
+            warnings = detailing.design_elements()[4]
+
+        # Each undersized column is reported, including those sharing the design of another column
+        undersized = [ele for ele, warn in warnings["MAX"]["Columns"].items() if warn]
+        self.assertGreater(detailing.design_stats["skipped"], 0)
+        self.assertGreater(len(undersized), 1)
+        for ele in undersized:
+            self.assertIn(f"Column element at storey {ele[1]} and bay {ele[3]} should be increased",
+                          stdout.getvalue())
+
+    def test_incremental_redesign(self):
+        tol = {"demands": 0.01, "sections": 0.}
+        previous = get_detailing(redesign_tol=tol)
+        data = previous.design_elements()[0]
+
+        # Demands within the tolerance on all elements but the first beam
+        detailing = get_detailing(previous_designs=previous.element_designs, redesign_tol=tol)
+        detailing.demands["Beams"]["M"]["Pos"] *= 1.005
+        detailing.demands["Beams"]["M"]["Pos"][0, 0] *= 1.2
+        detailing.demands["Beams"]["M"]["Neg"][0, 0] *= 1.2
+        data_new = detailing.design_elements()[0]
+
+        # Columns framing into the beam follow it through capacity design
+        self.assertEqual([ele for ele in detailing.recomputed if ele.startswith("Beams")], ["Beams S1B1"])
+        self.assertEqual(len(detailing.recomputed) + detailing.design_stats["reused"], 12)
+        self.assertEqual(data["Columns"]["S3B1"][0]["reinforcement"], data_new["Columns"]["S3B1"][0]["reinforcement"])
+        self.assertGreater(data_new["Beams"]["Pos"]["S1B1"][0]["reinforcement"],
+                           data["Beams"]["Pos"]["S1B1"][0]["reinforcement"])
+
+
+if __name__ == "__main__":
+    unittest.main()
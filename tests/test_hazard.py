@@ -0,0 +1,61 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from src.hazard import Hazard
+from src.hazardIndex import HazardIndex
+
+
+class TestHazardStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.filename = self.directory / "hazard.pkl"
+        shutil.copy(Path(__file__).parents[1] / "sample/sample1/hazard/hazard.pkl", self.filename)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_store_matches_hazard(self):
+        hazard = Hazard(self.filename, self.directory)
+        coefs, hazard_data, true_hazard = hazard.read_hazard()
+        with open(self.filename, "rb") as f:
+            expected = pickle.load(f)
+
+        self.assertEqual(true_hazard[0], list(expected[0]))
+        np.testing.assert_array_equal(true_hazard[2], expected[2])
+        self.assertEqual(list(coefs["PGA"].index), ["k0", "k1", "k2"])
+        self.assertEqual(hazard_data["hazard_fit"].shape, (1000, len(expected[0])))
+
+        # No temporary file is left behind
+        self.assertEqual(sorted(os.listdir(self.directory)), sorted(["hazard.pkl", os.path.basename(hazard.store)]))
+
+        index = hazard.get_index()
+        self.assertIsInstance(index.log_H, np.memmap)
+        np.testing.assert_array_equal(index.get_sa(index.periods, 1 / 475), HazardIndex(expected).get_sa(
+            index.periods, 1 / 475))
+
+    def test_store_keyed_by_content(self):
+        store = Hazard(self.filename, self.directory).store
+        mtime = os.path.getmtime(store)
+        self.assertEqual(Hazard(self.filename, self.directory).store, store)
+        self.assertEqual(os.path.getmtime(store), mtime)
+
+        # A different hazard under the same name is fit again
+        with open(self.filename, "rb") as f:
+            data = pickle.load(f)
+        data[2] = (np.array(data[2]) * 2).tolist()
+        with open(self.filename, "wb") as f:
+            pickle.dump(data, f)
+        hazard = Hazard(self.filename, self.directory)
+
+        self.assertNotEqual(hazard.store, store)
+        np.testing.assert_array_equal(hazard.read_hazard()[2][2], data[2])
+
+
+if __name__ == "__main__":
+    unittest.main()
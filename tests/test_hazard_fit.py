@@ -0,0 +1,32 @@
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from tools.hazardFit import HazardFit, fit_coefficients, get_hazard_fit
+
+
+class TestHazardFit(unittest.TestCase):
+    def setUp(self):
+        self.fit = HazardFit(Path(__file__).parents[1] / "sample/sample1/hazard/hazard.pkl", None, export=False)
+        self.data = self.fit.read_hazard()
+
+    def test_fits_through_points(self):
+        points = self.fit.ITERATOR
+        H = get_hazard_fit(self.fit.coefs, self.data["s"][:, points])
+        np.testing.assert_allclose(H, self.data["apoe"][:, points], rtol=1e-10)
+        np.testing.assert_allclose(self.fit.hazard_fit.values.T, get_hazard_fit(self.fit.coefs, self.fit.s_fit))
+
+    def test_stacked_sites(self):
+        # Sites with scaled hazard curves
+        scale = np.array([0.5, 1., 2.])[:, None, None]
+        s = np.broadcast_to(self.data["s"], scale.shape[:1] + self.data["s"].shape)
+        coefs = fit_coefficients(s, self.data["apoe"] * scale, self.fit.ITERATOR)
+
+        self.assertEqual(coefs.shape, (3, len(self.data["im"]), 3))
+        np.testing.assert_allclose(coefs[1], self.fit.coefs)
+        np.testing.assert_allclose(coefs[:, :, 0], self.fit.coefs[:, 0] * scale[:, :, 0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import pickle
+import unittest
+from pathlib import Path
+
+import numpy as np
+from scipy.interpolate import interp1d
+
+from src.hazardIndex import HazardIndex
+from src.spectra import Spectra
+
+
+class TestHazardIndex(unittest.TestCase):
+    def setUp(self):
+        with open(Path(__file__).parents[1] / "sample/sample1/hazard/hazard.pkl", "rb") as f:
+            self.hazard = pickle.load(f)
+        self.index = HazardIndex(self.hazard)
+
+    def test_curves_at_hazard_periods(self):
+        np.testing.assert_allclose(self.index.periods, np.arange(len(self.hazard[0])) / 10)
+        Hs, sa = self.index.get_curve(1.0)
+        np.testing.assert_allclose(Hs, self.hazard[2][10], rtol=1e-12)
+        np.testing.assert_allclose(sa, self.hazard[1][10], rtol=1e-12)
+
+        # Curves between periods lie between the curves of the closest periods
+        Hs = self.index.get_curve(1.05)[0]
+        self.assertTrue(np.all((Hs <= self.hazard[2][10]) & (Hs >= self.hazard[2][11])))
+
+    def test_inverse_queries(self):
+        periods = np.array([0.25, 1.0, 2.3])
+        sa = self.index.get_sa(periods, 1 / 475)
+        np.testing.assert_allclose(self.index.get_mafe(periods, sa), 1 / 475, rtol=1e-10)
+
+        # Uniform hazard spectra at several MAFEs
+        self.assertEqual(self.index.get_sa(self.index.periods[:, None], [1 / 475, 1 / 72]).shape, (41, 2))
+        self.assertTrue(np.isnan(self.index.get_sa(5.0, 1 / 475)))
+
+    def test_spectra_match_interpolators(self):
+        lam = 1 / 72
+        sa, sd = Spectra().get_spectra(lam, hazard=self.index)
+        expected = [interp1d(self.hazard[2][i], self.hazard[1][i])(lam) for i in range(len(self.hazard[0]))]
+        np.testing.assert_allclose(sa, expected, rtol=1e-12)
+
+    def test_uniform_hazard_spectra(self):
+        spectra = Spectra()
+        mafe = [1 / 72, 1 / 475, 2e-4]
+        periods, sa, sd = spectra.get_uhs(mafe, hazard=self.index)
+
+        self.assertEqual(sa.shape, (41, 3))
+        for i, lam in enumerate(mafe):
+            sa_ls, sd_ls = spectra.get_spectra(lam, hazard=self.index)
+            np.testing.assert_array_equal(sa[:, i], sa_ls)
+            np.testing.assert_array_equal(sd[:, i], sd_ls)
+        # Rarer events are more intense
+        self.assertTrue(np.all(np.diff(sa[1:], axis=1) > 0))
+
+        table = spectra.get_table(periods, sa[:, 1], sd[:, 1])
+        np.testing.assert_array_equal(table, np.column_stack((periods, sd[:, 1], sa[:, 1])))
+
+
+if __name__ == "__main__":
+    unittest.main()
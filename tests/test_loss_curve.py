@@ -0,0 +1,43 @@
+import unittest
+
+import numpy as np
+
+from src.lossCurve import LossCurve, fit_loss_curves, get_loss_curves
+
+
+class TestLossCurve(unittest.TestCase):
+    def setUp(self):
+        self.y = np.array([0.9, 0.2, 0.015])
+        self.lam = np.array([1e-4, 2e-3, 0.01])
+
+    def test_fit_passes_through_limit_states(self):
+        k0, k1, k2 = fit_loss_curves(self.y, self.lam)
+        lam = k0 * np.exp(-k1 * np.log(self.y) - k2 * np.log(self.y) ** 2)
+        np.testing.assert_allclose(lam, self.lam, rtol=1e-10)
+
+    def test_batch_matches_single(self):
+        rng = np.random.default_rng(0)
+        y = self.y * rng.lognormal(0., 0.2, (50, 3))
+        lam = self.lam * rng.lognormal(0., 0.3, (50, 3))
+
+        y_fit, lambda_fit, eal = get_loss_curves(y, lam)
+        self.assertEqual(lambda_fit.shape, (50, len(y_fit)))
+        for i in range(len(y)):
+            lc = LossCurve(y[i], lam[i], 1.0)
+            np.testing.assert_allclose(lc.get_loss_curve()[1], lambda_fit[i], rtol=1e-12)
+            self.assertAlmostEqual(lc.EAL, eal[i], delta=1e-12 * eal[i])
+            # Trapezoidal rule along the shared grid
+            self.assertAlmostEqual(lc.EAL, np.trapz(lambda_fit[i], y_fit) * 100, delta=1e-12 * eal[i])
+
+    def test_eal_distribution(self):
+        rng = np.random.default_rng(1)
+        lam = self.lam * rng.lognormal(0., 0.3, (1000, 3))
+        distribution = LossCurve.get_eal_distribution(self.y, lam, eal_limit=0.2, chunk=300)
+
+        np.testing.assert_allclose(distribution["EAL"], get_loss_curves(self.y, lam)[2], rtol=1e-14)
+        self.assertAlmostEqual(distribution["percentiles"][50], np.median(distribution["EAL"]))
+        self.assertEqual(distribution["P(EAL > limit)"], np.mean(distribution["EAL"] > 0.2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import pickle
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from scipy.optimize import fsolve
+
+from src.MAFC import MAFC, solve_cy
+from src.hazardIndex import HazardIndex
+
+
+def get_hazard():
+    with open(Path(__file__).parents[1] / "sample/sample1/hazard/hazard.pkl", "rb") as f:
+        return pickle.load(f)
+
+
+def get_mafc(period_idx=10):
+    hazard = get_hazard()
+    return MAFC([0.8, 1.2, 1.6], 2e-4, 1.3, hazard[2][period_idx], hazard[1][period_idx], 1.0, True)
+
+
+class TestMAFC(unittest.TestCase):
+    def test_array_fragilities(self):
+        m = get_mafc()
+        eta = np.linspace(0.2, 2.0, 7)
+        beta = np.linspace(0.3, 0.6, 7)
+
+        mafe = m.calc_mafe_direct_im_based(eta, beta)
+
+        self.assertEqual(mafe.shape, (7, ))
+        for i in range(len(eta)):
+            single = m.calc_mafe_direct_im_based(eta[i], beta[i])
+            self.assertIsInstance(single, float)
+            self.assertAlmostEqual(mafe[i], single, delta=1e-12 * single)
+        # Higher median capacities are exceeded less frequently
+        self.assertTrue(np.all(np.diff(mafe) < 0))
+
+    def test_solve_cy(self):
+        m = get_mafc()
+        fsolve(m.objective, x0=np.array([0.02]), factor=0.1)
+        expected = float(m.cy[0])
+
+        m = get_mafc()
+        cy, dy, mafc, iterations = m.solve_cy(1.0)
+
+        self.assertIsNone(m.cy)
+        self.assertAlmostEqual(cy, expected, delta=1e-8 * expected)
+        self.assertAlmostEqual(dy, cy * 9.81 * (1.0 / 2 / np.pi) ** 2)
+        self.assertAlmostEqual(mafc, 2e-4, delta=1e-10)
+        self.assertLess(iterations, 100)
+
+    def test_solve_cy_periods(self):
+        hazard = get_hazard()
+        cy, dy, mafc, _ = solve_cy([0.8, 1.2, 1.6], 2e-4, [1.3, 1.25], 1.0, [1.0, 0.5], HazardIndex(hazard))
+
+        self.assertEqual(cy[0], get_mafc(10).solve_cy(1.0)[0])
+        self.assertEqual(cy[1], get_mafc(5).solve_cy(0.5, gamma=1.25)[0])
+        np.testing.assert_allclose(mafc, 2e-4)
+
+    def test_target_outside_hazard(self):
+        m = get_mafc()
+        m.lam_target = 10.
+        with self.assertRaises(ValueError):
+            m.solve_cy(1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
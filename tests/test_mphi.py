@@ -0,0 +1,125 @@
+import unittest
+import tempfile
+
+import numpy as np
+
+from analysis.constitutive import steel_stress, stress_block
+from analysis.momentcurvaturerc import MomentCurvatureRC
+from analysis.mphiCache import MPhiCache
+from analysis.mphiSurface import MPhiSurface
+
+
+class TestMPhiCache(unittest.TestCase):
+    b = 0.4
+    h = 0.7
+    m_target = 136.78
+    cover = 0.03
+
+    def get_mphi(self, cache, m_target=None):
+        mphi = MomentCurvatureRC(self.b, self.h, m_target or self.m_target, d=self.cover, k_hard=1.0, cache=cache)
+        return mphi.get_mphi()
+
+    def test_cached_outputs_match_solver(self):
+        cache = MPhiCache()
+        data = self.get_mphi(None)
+        first = self.get_mphi(cache)
+        second = self.get_mphi(cache)
+
+        self.assertEqual(cache.get_stats()["misses"], 1)
+        self.assertEqual(cache.get_stats()["hits"], 1)
+        self.assertAlmostEqual(first[0]["reinforcement"], data[0]["reinforcement"])
+        np.testing.assert_allclose(second[4]["m"], data[4]["m"])
+        np.testing.assert_allclose(second[4]["phi"], data[4]["phi"])
+
+    def test_quantised_keys(self):
+        cache = MPhiCache(digits=3)
+        self.get_mphi(cache, m_target=136.78)
+        self.get_mphi(cache, m_target=136.81)
+        self.assertEqual(cache.get_stats()["hits"], 1, "Nearly identical demands must share a cache entry!")
+
+    def test_disk_store(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.get_mphi(MPhiCache(directory))
+            cache = MPhiCache(directory)
+            self.get_mphi(cache)
+            self.assertEqual(cache.get_stats()["disk_hits"], 1)
+            self.assertEqual(cache.get_stats()["misses"], 0)
+
+
+class TestReinforcementSizing(unittest.TestCase):
+    def test_bracketed_design(self):
+        mphi = MomentCurvatureRC(0.3, 0.6, 400., d=0.03, k_hard=1.0)
+        data = mphi.get_mphi()[0]
+
+        self.assertEqual(mphi.rebar_diagnostics["method"], "brentq")
+        self.assertTrue(mphi.rebar_diagnostics["converged"])
+        low, high = mphi.rebar_diagnostics["bracket"]
+        self.assertTrue(low <= data["reinforcement"] <= high)
+
+        # Concrete strain at peak compressive strength
+        n = .8 + mphi.fc_prime / 17
+        epsc_prime = mphi.fc_prime / (3320 * np.sqrt(mphi.fc_prime) + 6900) * n / (n - 1)
+        self.assertAlmostEqual(float(mphi.max_moment(np.array([data["reinforcement"]]), epsc_prime)), 0., places=4)
+
+    def test_reinforcement_check(self):
+        mphi = MomentCurvatureRC(0.4, 0.4, 120., p=-500., nlayers=1, d=0.03, AsTotal=0.002, distAs=[0.5, 0.5])
+        moment = mphi.get_mphi(check_reinforcement=True, reinf_test=0.003)
+        self.assertAlmostEqual(float(moment), 271.628, places=2)
+
+
+class TestConstitutive(unittest.TestCase):
+    def test_steel_stress(self):
+        eps = np.array([[0.001, -0.001, 0.004], [-0.03, 0.075, 0.2]])
+        stress = steel_stress(eps, 400., 200e3, k_hard=1.2)
+
+        self.assertEqual(stress.shape, eps.shape)
+        np.testing.assert_allclose(stress[0], [200., -200., 400.])
+        self.assertTrue(-480. < stress[1, 0] < -400.)
+        self.assertAlmostEqual(stress[1, 1], 480.)
+        # Undefined well past the ultimate strain
+        self.assertTrue(np.isnan(stress[1, 2]))
+        self.assertEqual(steel_stress(0.004, 400., 200e3), 400.)
+
+    def test_stress_block(self):
+        a1b1, b1 = stress_block(np.array([0.001, 0.002, 0.004, 0.006]), 0.002)
+        np.testing.assert_allclose(a1b1, [0.5 - 1 / 12, 2 / 3, 2 / 3, 2 / 3])
+        np.testing.assert_allclose(b1, [0.7, 0.75, 1., 1.])
+
+
+class TestMPhiSurface(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.surface = MPhiSurface.build(f"{cls.directory.name}/surface", b=[0.3, 0.35], h=[0.5, 0.55],
+                                        rho=np.linspace(0.004, 0.02, 5), nu=[0., 0.1], d=0.03)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def test_interpolation(self):
+        exact = MomentCurvatureRC(0.32, 0.52, 150., p=-100., d=0.03).get_mphi()
+        approx = MomentCurvatureRC(0.32, 0.52, 150., p=-100., d=0.03, surface=self.surface).get_mphi()
+
+        self.assertEqual(self.surface.get_stats()["hits"], 1)
+        self.assertAlmostEqual(approx[0]["reinforcement"] / exact[0]["reinforcement"], 1., places=1)
+        np.testing.assert_allclose(approx[4]["phi"], exact[4]["phi"], rtol=0.1)
+        np.testing.assert_allclose(approx[4]["m"], exact[4]["m"], rtol=0.05)
+
+    def test_exact_fallback(self):
+        # Outside of the grid
+        MomentCurvatureRC(0.5, 0.52, 150., d=0.03, surface=self.surface).get_mphi()
+        # Different material set
+        MomentCurvatureRC(0.32, 0.52, 150., d=0.03, fc_prime=30., surface=self.surface).get_mphi()
+        self.assertEqual(self.surface.get_stats()["hits"], 0)
+
+        surface = MPhiSurface(self.surface.filename, exact=True)
+        MomentCurvatureRC(0.32, 0.52, 150., d=0.03, surface=surface).get_mphi()
+        self.assertEqual(surface.get_stats()["fallbacks"], 1)
+
+    def setUp(self):
+        self.surface.hits = self.surface.fallbacks = 0
+
+
+if __name__ == "__main__":
+    unittest.main()
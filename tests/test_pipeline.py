@@ -0,0 +1,68 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from src.pipeline import Pipeline, get_hash
+
+
+class TestPipeline(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.input = self.directory / "input.csv"
+        self.input.write_text("a,b\n1,2\n")
+        self.calls = []
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def stage(self, name, value):
+        def function():
+            self.calls.append(name)
+            return value
+        return function
+
+    def run_pipeline(self, y=0.3, mafc=2e-4):
+        pipeline = Pipeline(self.directory / "pipeline")
+        data = pipeline.run_stage("input", self.stage("input", {"y": y}), {"input_filename": self.input})
+        limits = pipeline.run_stage("limits", self.stage("limits", np.array([y, 2 * y])), {"y": data["y"]},
+                                    depends=("input", ))
+        design = pipeline.run_stage("design", self.stage("design", limits * mafc), {"mafc": mafc},
+                                    depends=("limits", ))
+        return pipeline, design
+
+    def test_reuse(self):
+        pipeline, design = self.run_pipeline()
+        self.assertEqual(pipeline.get_stats()["run"], ["input", "limits", "design"])
+
+        pipeline, design_reused = self.run_pipeline()
+        self.assertEqual(pipeline.get_stats()["reused"], ["input", "limits", "design"])
+        np.testing.assert_array_equal(design, design_reused)
+        self.assertEqual(self.calls, ["input", "limits", "design"])
+
+        # Only the stages downstream of a changed parameter are run
+        pipeline, _ = self.run_pipeline(mafc=1e-4)
+        self.assertEqual(pipeline.get_stats(), {"run": ["design"], "reused": ["input", "limits"]})
+
+        # Files are tracked by their content
+        self.input.write_text("a,b\n1,3\n")
+        pipeline, _ = self.run_pipeline(mafc=1e-4)
+        self.assertEqual(pipeline.get_stats()["run"], ["input", "limits", "design"])
+
+    def test_disabled(self):
+        for _ in range(2):
+            pipeline = Pipeline()
+            pipeline.run_stage("input", self.stage("input", 1), {"input_filename": self.input})
+        self.assertEqual(self.calls, ["input", "input"])
+
+    def test_hash(self):
+        self.assertEqual(get_hash({"a": np.arange(3.), "b": [1, None]}), get_hash({"b": [1, None], "a": np.arange(3.)}))
+        self.assertNotEqual(get_hash(np.arange(3.)), get_hash(np.arange(3)))
+        self.assertNotEqual(get_hash(1), get_hash(1.))
+        self.assertNotEqual(get_hash(self.input), get_hash(str(self.input)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from utils import profiler
+
+
+@profiler.profiled("square", "iteration")
+def square(x):
+    return x * x
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        profiler.disable()
+        shutil.rmtree(self.directory)
+
+    def test_disabled(self):
+        self.assertIsNone(profiler.PROFILER)
+        self.assertIs(profiler.profile("stage"), profiler.NULL_SPAN)
+        profiler.count("fsolve")
+        self.assertEqual(square(3), 9)
+        self.assertIsNone(profiler.disable())
+
+    def test_spans_and_counters(self):
+        counted = profiler.counted(lambda x: x + 1, "calls")
+        prof = profiler.enable()
+        with profiler.profile("stage"):
+            for i in range(3):
+                square(counted(i))
+        profiler.count("eigen_solves", 2)
+        self.assertIs(profiler.disable(), prof)
+
+        summary = prof.get_summary()
+        self.assertEqual(summary["spans"]["square"]["calls"], 3)
+        self.assertEqual(summary["spans"]["square"]["category"], "iteration")
+        self.assertEqual(summary["spans"]["stage"]["calls"], 1)
+        self.assertGreaterEqual(summary["spans"]["stage"]["wall"], summary["spans"]["square"]["wall"])
+        self.assertEqual(summary["counters"], {"calls": 3, "eigen_solves": 2})
+
+        prof.export(self.directory / "profile.json")
+        with open(self.directory / "profile.json") as f:
+            self.assertEqual(len(json.load(f)["events"]), 4)
+
+        prof.export(self.directory / "trace.json", "chrome")
+        with open(self.directory / "trace.json") as f:
+            events = json.load(f)["traceEvents"]
+        self.assertEqual([event["ph"] for event in events], ["X"] * 4 + ["C"])
+        self.assertEqual(events[-1]["args"]["calls"], 3)
+
+        with self.assertRaises(ValueError):
+            prof.export(self.directory / "profile.txt", "txt")
+
+
+if __name__ == "__main__":
+    unittest.main()
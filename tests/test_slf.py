@@ -0,0 +1,111 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+from scipy.interpolate import interp1d
+
+from src.pipeline import get_hash
+from tools.slf import SLF, BUNDLE, get_bundle_filename, get_source_files
+
+
+class TestSLFBundle(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp()) / "slfoutput"
+        shutil.copytree(Path(__file__).parents[1] / "sample/sample1/slfoutput", self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory.parent)
+
+    def get_slfs(self, directory, geometry=True):
+        slf = SLF(directory, 0.3, 2, geometry, 1.0, True)
+        func, SLFs = slf.select_file_type()
+        return slf, func, SLFs
+
+    def test_bundle_matches_pickles(self):
+        for geometry in (True, False):
+            slf, func, SLFs = self.get_slfs(self.directory, geometry)
+
+            bundle = Path(tempfile.mkdtemp(dir=self.directory.parent))
+            shutil.copy(SLF.pack_bundle(self.directory), bundle / BUNDLE)
+            slf_bundle, func_bundle, SLFs_bundle = self.get_slfs(bundle, geometry)
+
+            self.assertAlmostEqual(slf.MAXCOST, slf_bundle.MAXCOST, delta=1e-9 * slf.MAXCOST)
+            self.assertIsInstance(SLFs_bundle["Non-directional"]["PFA_NS"]["0"]["loss"], np.memmap)
+            np.testing.assert_array_equal(func.y, func_bundle.y)
+            np.testing.assert_array_equal(SLFs["Directional"]["PSD_S"]["dir1"]["2"]["loss"],
+                                          SLFs_bundle["Directional"]["PSD_S"]["dir1"]["2"]["loss"])
+
+    def test_bundle_store(self):
+        store = self.directory.parent / "store"
+        store.mkdir()
+        bundle = SLF.pack_bundle(self.directory, get_bundle_filename(self.directory, store))
+        self.assertEqual(bundle.parent, store)
+        self.assertFalse((self.directory / BUNDLE).exists())
+
+        slf = SLF(self.directory, 0.3, 2, True, 1.0, True, bundle=bundle)
+        self.assertTrue(slf.check_bundle())
+        np.testing.assert_array_equal(slf.select_file_type()[0].y, self.get_slfs(self.directory)[1].y)
+
+    def test_source_files(self):
+        key = get_hash(get_source_files(self.directory))
+        self.assertIn("st1_psd.pickle", get_source_files(self.directory))
+
+        # Bundles are derived from the SLF files, and left out of the key
+        SLF.pack_bundle(self.directory)
+        (self.directory / "slfs.tmp.npz").write_bytes(b"partial")
+        self.assertEqual(get_hash(get_source_files(self.directory)), key)
+
+        # Directory holding the bundle only
+        bundle = Path(tempfile.mkdtemp(dir=self.directory.parent))
+        shutil.copy(self.directory / BUNDLE, bundle / BUNDLE)
+        self.assertEqual(list(get_source_files(bundle)), [BUNDLE])
+
+    def test_outdated_bundle(self):
+        SLF.pack_bundle(self.directory)
+        slf = SLF(self.directory, 0.3, 2, True, 1.0, True)
+        self.assertTrue(slf.check_bundle())
+
+        # Bundle is out of date after an SLF file changes
+        os.utime(self.directory / "st1_psd.pickle", ns=(0, 0))
+        self.assertFalse(slf.check_bundle())
+        np.testing.assert_array_equal(self.get_slfs(self.directory)[1].y,
+                                      self.get_slfs(Path(__file__).parents[1] / "sample/sample1/slfoutput")[1].y)
+
+    def test_interrupted_bundle(self):
+        # Temporary bundle left behind by an interrupted packing
+        (self.directory / "slfs.tmp.npz").write_bytes(b"partial")
+        self.assertNotIn("slfs.tmp.npz", SLF(self.directory, 0.3, 2, True, 1.0, True).get_files())
+        np.testing.assert_array_equal(self.get_slfs(self.directory)[1].y,
+                                      self.get_slfs(Path(__file__).parents[1] / "sample/sample1/slfoutput")[1].y)
+
+        SLF.pack_bundle(self.directory)
+        self.assertEqual(sorted(file.name for file in self.directory.glob("*.npz")), [BUNDLE, "slfs.tmp.npz"])
+
+
+class TestSLFTable(unittest.TestCase):
+    def test_matches_interpolators(self):
+        slf = SLF(Path(__file__).parents[1] / "sample/sample1/slfoutput", 0.3, 2, True, 1.0, True)
+        table = slf.select_file_type()[0]
+
+        edps = table.get_edp(table.y)
+        losses = table.get_loss(0.5 * edps)
+        for i, (group, direction, storey) in enumerate(table.keys):
+            edp = slf.pfa if group == "PFA_NS" else slf.psd
+            loss = table.loss[i, :len(edp)]
+            self.assertEqual(edps[i], float(interp1d(loss, edp)(table.y[i])))
+            self.assertEqual(losses[i], float(interp1d(edp, loss)(0.5 * edps[i])))
+
+        # Selection of SLFs
+        rows = table.get_rows("PSD_S", "dir2")
+        self.assertEqual([table.keys[i] for i in rows], [("PSD_S", "dir2", "1"), ("PSD_S", "dir2", "2")])
+        np.testing.assert_array_equal(table.get_edp(table.y[rows], rows), edps[rows])
+
+        with self.assertRaises(ValueError):
+            table.get_loss(1e3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+import tempfile
+
+import numpy as np
+
+from tools.spo2ida import SPO2IDA, SPO2IDABatch
+from tools.spo2idaTable import SPO2IDATable
+
+
+class TestSPO2IDABatch(unittest.TestCase):
+    # Backbones covering the hardening, capping and residual regions (mc, a, ac, r, mf, pw)
+    BACKBONES = np.array([[2., 0.1, 0.5, 0.3, 6., 1.], [4., 0.05, 1.5, 0.1, 8., 0.5], [1.5, 0.3, 0.1, 0.6, 3., 0.],
+                          [3., 0.2, 0.8, 0., 5., 1.], [1., 0.1, 0.5, 0.3, 2., 1.]])
+    PERIODS = np.array([0.3, 1.0, 2.5])
+
+    def test_matches_scalar(self):
+        mc, a, ac, r, mf, pw = self.BACKBONES.T
+        batch = SPO2IDABatch(mc[:, None], a[:, None], ac[:, None], r[:, None], mf[:, None], self.PERIODS,
+                             pw[:, None])
+        R16, R50, R84, idacm, idacr, spom, spor = batch.run_spo2ida_allT(curves=True)
+        self.assertEqual(R50.shape, (5, 3))
+
+        for i, backbone in enumerate(self.BACKBONES):
+            for j, period in enumerate(self.PERIODS):
+                mc, a, ac, r, mf, pw = backbone
+                outputs = SPO2IDA(mc, a, ac, r, mf, period, pw).run_spo2ida_allT()
+                np.testing.assert_allclose([R16[i, j], R50[i, j], R84[i, j]], outputs[:3], rtol=1e-10)
+                for k in range(3):
+                    active = ~np.isnan(idacm[i, j, k])
+                    np.testing.assert_allclose(idacm[i, j, k][active], outputs[3][k], rtol=1e-10)
+                    np.testing.assert_allclose(idacr[i, j, k][active], outputs[4][k], rtol=1e-10)
+                np.testing.assert_allclose(spom[i, j], outputs[5])
+
+    def test_outside_ranges(self):
+        R16, R50, R84 = SPO2IDABatch(2., 0.1, 0.5, 0.3, 6., [1., 5.], 1.).run_spo2ida_allT()[:3]
+        self.assertFalse(np.isnan(R50[0]))
+        self.assertTrue(np.isnan(R50[1]))
+
+
+class TestSPO2IDATable(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.table = SPO2IDATable.build(f"{cls.directory.name}/table", mc=[2., 2.5, 3.], a=[0.05, 0.1], ac=[0.4, 0.6],
+                                       r=[0.2, 0.3], mf=[5., 6.], T=[0.8, 1.0, 1.2], pw=1., n_check=20)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def test_interpolation(self):
+        exact = SPO2IDA(2.2, 0.08, 0.5, 0.25, 5.5, 0.9, 1.).run_spo2ida_allT()[:3]
+        R16, R50, R84, bounds = self.table.evaluate(2.2, 0.08, 0.5, 0.25, 5.5, 0.9, 1., bounds=True)
+
+        np.testing.assert_allclose([R16, R50, R84], exact, rtol=0.02)
+        self.assertTrue(np.all(np.abs([R16, R50, R84] - np.array(exact)) <= bounds))
+        # Grid points are reproduced exactly
+        np.testing.assert_allclose(self.table.evaluate(2.5, 0.1, 0.4, 0.3, 5., 1.0, 1.),
+                                   SPO2IDA(2.5, 0.1, 0.4, 0.3, 5., 1.0, 1.).run_spo2ida_allT()[:3])
+        self.assertIsNotNone(self.table.errors)
+
+    def test_exact_fallback(self):
+        table = SPO2IDATable(f"{self.directory.name}/table")
+        # Outside of the grid and a different pinching model weight
+        R50 = table.evaluate([2.2, 4., 2.2], 0.08, 0.5, 0.25, 5.5, 0.9, [1., 1., 0.5])[1]
+        self.assertEqual(table.get_stats(), {"hits": 1, "fallbacks": 2})
+        self.assertAlmostEqual(R50[1], SPO2IDA(4., 0.08, 0.5, 0.25, 5.5, 0.9, 1.).run_spo2ida_allT()[1])
+
+        table = SPO2IDATable(f"{self.directory.name}/table", exact=True)
+        table.evaluate(2.2, 0.08, 0.5, 0.25, 5.5, 0.9, 1.)
+        self.assertEqual(table.get_stats()["hits"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
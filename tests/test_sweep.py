@@ -0,0 +1,87 @@
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+from src.master import Master, STAGES, get_invalidated_stages, get_memoised_depends
+from sweep import Sweep
+
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        self.base = {"input_filename": "ipbsd_input.csv", "hazard_filename": "hazard.pkl", "spo_filename": "spo.csv",
+                     "slf_directory": "slfoutput", "limit_eal": 1.0, "target_mafc": 2e-4, "fstiff": 0.5}
+
+    def test_invalidated_stages(self):
+        self.assertEqual(get_invalidated_stages(["limit_eal"]), ["loss_curve"])
+        self.assertEqual(get_invalidated_stages(["fstiff"]), ["sections", "iterations"])
+        self.assertEqual(get_invalidated_stages(["overstrength", "rebar_cover"]), ["iterations"])
+        self.assertEqual(get_invalidated_stages(["target_mafc"]),
+                         ["loss_curve", "spectra", "period_range", "sections", "iterations"])
+        # Downstream stages of the SLFs
+        self.assertIn("sections", get_invalidated_stages(["slf_directory"]))
+
+    def test_stage_depends(self):
+        names = list(STAGES)
+        for name, stage in STAGES.items():
+            # Upstream stages are run before the stage
+            self.assertTrue(all(names.index(depend) < names.index(name) for depend in stage["depends"]), name)
+        self.assertEqual(get_memoised_depends("hazard"), ("input", ))
+        self.assertEqual(get_memoised_depends("transformations"), ("input", "design_limits"))
+        self.assertEqual(get_memoised_depends("sections"), ("input", "hazard", "transformations"))
+
+        # The stages of Master are keyed by the upstream stages declared in STAGES
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            master = Master(SimpleNamespace(output_path=directory, pipeline_cache_dir=directory / "pipeline"))
+            for name in ("input", "hazard", "design_limits", "transformations", "sections"):
+                master.run_stage(name, lambda: name, {})
+                with open(next((directory / "pipeline").glob(f"{name}_*.json"))) as f:
+                    self.assertEqual(tuple(json.load(f)["depends"]), get_memoised_depends(name))
+
+    def test_points(self):
+        grids = {"fstiff": [0.4, 0.5, 0.6], "target_mafc": [1e-4, 2e-4]}
+        sweep = Sweep(self.base, grids, "sweep")
+        self.assertEqual(len(sweep.points), 6)
+        # Upstream stages are shared by the points of the same stiffness reduction factor
+        groups = sweep.get_upstream_groups()
+        self.assertEqual(len(groups), 3)
+        self.assertTrue(all(len({sweep.points[i]["fstiff"] for i in indices}) == 1 for indices in groups.values()))
+
+        sweep = Sweep(self.base, grids, "sweep", mode="one_at_a_time")
+        self.assertEqual(len(sweep.points), 4)
+        self.assertIn({"fstiff": 0.5, "target_mafc": 1e-4}, sweep.points)
+        self.assertEqual(sweep.get_arguments(0)["fstiff"], 0.4)
+        self.assertEqual(sweep.get_arguments(0)["limit_eal"], 1.0)
+
+        sweep = Sweep(self.base, {"limit_eal": [0.5, 1.0], "overstrength": [1.0, 1.5]}, "sweep")
+        self.assertEqual(len(sweep.get_upstream_groups()), 1)
+
+    def test_failed_upstream(self):
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            sample = Path(__file__).parents[1] / "sample/sample1"
+            shutil.copytree(sample / "hazard", directory / "hazard")
+            shutil.copytree(sample / "slfoutput", directory / "slfoutput")
+            base = {**self.base, "input_filename": str(directory / "ipbsd_input.csv"),
+                    "hazard_filename": str(directory / "hazard/hazard.pkl"),
+                    "slf_directory": str(directory / "slfoutput"), "flag3d": True, "hold_flag": True}
+            sweep = Sweep(base, {"fstiff": [0.4, 0.5], "limit_eal": [0.5, 1.0]}, directory / "sweep", workers=1)
+            self.assertEqual(sweep.base["slf_directory"], directory / "slfoutput")
+
+            # The input file is missing, the points of the failed groups are reported as such
+            results = sweep.run()
+            self.assertEqual(results["Status"].tolist(), ["failed upstream"] * 4)
+            self.assertEqual(results["Point"].tolist(), ["Point1", "Point2", "Point3", "Point4"])
+            self.assertIn("ipbsd_input.csv", (directory / "sweep/Upstream1/ipbsd.log").read_text())
+            self.assertTrue((directory / "sweep/sweep.csv").is_file())
+
+    def test_unknown_argument(self):
+        with self.assertRaises(ValueError):
+            Sweep(self.base, {"stiffness": [0.5]}, "sweep")
+
+
+if __name__ == "__main__":
+    unittest.main()
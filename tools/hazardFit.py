@@ -8,6 +8,34 @@ import scipy.optimize as optimization
 import os
 
 
+def fit_coefficients(s, apoe, points):
+    """
+    Second-order fits through selected points of hazard curves, solved for any number of curves at once, e.g. all
+    intensity measures of a site or of many sites
+    :param s: array                                             Intensities, of shape (..., number of points)
+    :param apoe: array                                          Annual probabilities of exceedance, of the same shape
+    :param points: array                                        Indices of the three points the fits go through
+    :return: array                                              Coefficients k0, k1 and k2, of shape (..., 3)
+    """
+    log_s = np.log(np.asarray(s, dtype=float)[..., points])
+    r = np.stack([np.ones(log_s.shape), -log_s, -log_s ** 2], axis=-1)
+    coefs = np.linalg.solve(r, np.log(np.asarray(apoe, dtype=float)[..., points])[..., None])[..., 0]
+    coefs[..., 0] = np.exp(coefs[..., 0])
+    return coefs
+
+
+def get_hazard_fit(coefs, s):
+    """
+    Evaluates second-order hazard fits
+    :param coefs: array                                         Coefficients k0, k1 and k2, of shape (..., 3)
+    :param s: array                                             Intensities
+    :return: array                                              H of the fits, of shape (..., number of intensities)
+    """
+    coefs = np.asarray(coefs, dtype=float)[..., None, :]
+    log_s = np.log(s)
+    return coefs[..., 0] * np.exp(-coefs[..., 2] * np.power(log_s, 2) - coefs[..., 1] * log_s)
+
+
 class HazardFit:
     def __init__(self, filename, export_directory, haz_fit=1, export=True):
         """
@@ -19,6 +47,7 @@ class HazardFit:
         :return: None
         """
         self.ITERATOR = np.array([0, 3, 5])  # Where to prioritize for fitting
+        self.coefs = None                       # 2nd-order fit coefficients (k0, k1, k2) of each intensity measure
 
         self.filename = filename
         self.export_directory = export_directory
@@ -69,6 +98,19 @@ class HazardFit:
         with open(self.export_directory / f"fit_{filename}", 'wb') as handle:
             pickle.dump(hazard_data, handle)
 
+    @staticmethod
+    def get_frames(im, coefs, s_fit):
+        """
+        Evaluates the fits of all intensity measures and arranges them as in the exported data
+        :param im: numpy array                                  Intensity measures
+        :param coefs: array                                     2nd-order fit coefficients, of shape (im, 3)
+        :param s_fit: array                                     Sa of the fitted hazard
+        :return: DataFrame, DataFrame                           H of the fitted hazard and 2nd-order fit coefficients
+        """
+        hazard_fit = pd.DataFrame(get_hazard_fit(coefs, s_fit).T, columns=list(im))
+        coefs = pd.DataFrame(coefs.T, index=['k0', 'k1', 'k2'], columns=list(im))
+        return hazard_fit, coefs
+
     def generate_fitted_data(self, im, coefs, hazard_fit, s_fit):
         """
         Generates dictionary for saving hazard data
@@ -103,36 +145,12 @@ class HazardFit:
         s = data['s']
         apoe = data['apoe']
         s_fit = np.linspace(min(s[0]), max(s[0]), 1000)
-        hazard_fit = pd.DataFrame(np.nan, index=range(len(s_fit)), columns=list(im))
-        coefs = pd.DataFrame(np.nan, index=['k0', 'k1', 'k2'], columns=list(im))
 
-        # Fitting the hazard curves
-        for tag in range(len(im)):
-            coef = np.zeros(3)
-            # select iterator depending on where we want to have a better fit
-            iterator = self.ITERATOR
-            r = np.zeros((len(iterator), len(iterator)))
-            a = np.zeros(len(iterator))
-            cnt = 0
-            for i in iterator:
-                r_temp = np.array([1])
-                for j in range(1, len(iterator)):
-                    r_temp = np.append(r_temp, -np.power(np.log(s[tag][i]), j))
-                r[cnt] = r_temp
-                a[cnt] = apoe[tag][i]
-                cnt += 1
-
-            temp1 = np.log(a)
-            temp2 = np.linalg.inv(r).dot(temp1)
-            temp2 = temp2.tolist()
-            coef[0] = np.exp(temp2[0])
-            coef[1] = temp2[1]
-            coef[2] = temp2[2]
-            H_fit = coef[0] * np.exp(-coef[2] * np.power(np.log(s_fit), 2) -
-                                     coef[1] * np.log(s_fit))
-            hazard_fit[im[tag]] = H_fit
-            coefs[im[tag]] = coef
+        # Fitting the hazard curves, all at once
+        # select iterator depending on where we want to have a better fit
+        self.coefs = fit_coefficients(s, apoe, self.ITERATOR)
 
+        hazard_fit, coefs = self.get_frames(im, self.coefs, s_fit)
         self.generate_fitted_data(im, coefs, hazard_fit, s_fit)
 
         return hazard_fit, s_fit
@@ -148,8 +166,7 @@ class HazardFit:
         s = data['s']
         apoe = data['apoe']
         s_fit = np.linspace(min(s[0]), max(s[0]), 1000)
-        hazard_fit = pd.DataFrame(np.nan, index=range(len(s_fit)), columns=list(im))
-        coefs = pd.DataFrame(np.nan, index=['k0', 'k1', 'k2'], columns=list(im))
+        self.coefs = np.zeros((len(im), 3))
         x0 = np.array([0, 0, 0])
         sigma = np.array([1.0] * len(s[0]))
 
@@ -157,12 +174,9 @@ class HazardFit:
             return a * np.exp(-c * np.power(np.log(x), 2) - b * np.log(x))
 
         for tag in range(len(im)):
-            p, pcov = optimization.curve_fit(func, s[tag], apoe[tag], x0, sigma)
-            H_fit = p[0] * np.exp(-p[2] * np.power(np.log(s_fit), 2) -
-                                  p[1] * np.log(s_fit))
-            hazard_fit[im[tag]] = H_fit
-            coefs[im[tag]] = p
+            self.coefs[tag], pcov = optimization.curve_fit(func, s[tag], apoe[tag], x0, sigma)
 
+        hazard_fit, coefs = self.get_frames(im, self.coefs, s_fit)
         self.generate_fitted_data(im, coefs, hazard_fit, s_fit)
 
         return hazard_fit, s_fit
@@ -178,20 +192,16 @@ class HazardFit:
         s = data['s']
         apoe = data['apoe']
         s_fit = np.linspace(min(s[0]), max(s[0]), 1000)
-        hazard_fit = pd.DataFrame(np.nan, index=range(len(s_fit)), columns=list(im))
-        coefs = pd.DataFrame(np.nan, index=['k0', 'k1', 'k2'], columns=list(im))
+        self.coefs = np.zeros((len(im), 3))
         x0 = np.array([0, 0, 0])
 
         def func(x, s, a):
             return a - x[0] * np.exp(-x[2] * np.power(np.log(s), 2) - x[1] * np.log(s))
 
         for tag in range(len(im)):
-            p = optimization.leastsq(func, x0, args=(s[tag], apoe[tag]))[0]
-            H_fit = p[0] * np.exp(-p[2] * np.power(np.log(s_fit), 2) -
-                                  p[1] * np.log(s_fit))
-            hazard_fit[im[tag]] = H_fit
-            coefs[im[tag]] = p
+            self.coefs[tag] = optimization.leastsq(func, x0, args=(s[tag], apoe[tag]))[0]
 
+        hazard_fit, coefs = self.get_frames(im, self.coefs, s_fit)
         self.generate_fitted_data(im, coefs, hazard_fit, s_fit)
 
         return hazard_fit, s_fit
@@ -1,16 +1,54 @@
 """
 User defines storey-loss function parameters
 """
-from scipy.interpolate import interp1d
+import hashlib
 import os
 import re
+import tempfile
 import numpy as np
 import pickle
 import pandas as pd
+from pathlib import Path
+
+from tools.slfTable import SLFTable
+from utils.ipbsd_utils import load_npz
+
+# Binary bundle of the SLFs of a building, packed from the SLF pickles of the directory
+BUNDLE = "slfs.npz"
+
+
+def get_bundle_filename(slf_directory, store_dir=None):
+    """
+    Gets the bundle of the SLFs of a directory
+    :param slf_directory: str                       Directory of SLFs derived via SLF Generator
+    :param store_dir: str                           Directory of the SLF bundles, keyed by the SLF directory, e.g.
+                                                    shared by several cases. If None, the bundle is within the SLF
+                                                    directory
+    :return: Path                                   Path of the bundle
+    """
+    if store_dir is None:
+        return Path(slf_directory) / BUNDLE
+    key = hashlib.sha1(str(Path(slf_directory).resolve()).encode()).hexdigest()
+    return Path(store_dir) / f"slfs_{key}.npz"
+
+def get_source_files(slf_directory):
+    """
+    Gets the files the SLFs are read from: the files of the directory except the bundles, which are derived from them,
+    or the bundle if the directory holds the bundle only
+    :param slf_directory: str                       Directory of SLFs derived via SLF Generator
+    :return: dict                                   Paths of the files, by file name
+    """
+    slf_directory = Path(slf_directory)
+    files = {file: slf_directory / file for file in sorted(os.listdir(slf_directory))
+             if not file.endswith(".npz") and not os.path.isdir(slf_directory / file)}
+    if not files and (slf_directory / BUNDLE).is_file():
+        files[BUNDLE] = slf_directory / BUNDLE
+    return files
 
 
 class SLF:
-    def __init__(self, slf_directory, y_sls, nst, geometry=False, replacement_cost=None, perform_scaling=True):
+    def __init__(self, slf_directory, y_sls, nst, geometry=False, replacement_cost=None, perform_scaling=True,
+                 bundle=None):
         """
         initialize storey loss function definition
         :param slf_directory: dict                  SLF data file
@@ -19,8 +57,11 @@ class SLF:
         :param geometry: int                        False for "2d", True for "3d"
         :param replacement_cost: float              Replacement cost of the entire building
         :param perform_scaling: bool                Perform scaling of SLFs to add up to 1.0
+        :param bundle: str                          Binary bundle of the SLFs, see pack_bundle. If None, the bundle
+                                                    within the SLF directory is used, if any
         """
         self.slf_directory = slf_directory
+        self.bundle = Path(bundle) if bundle is not None else Path(slf_directory) / BUNDLE
         self.y_sls = y_sls
         self.nst = nst
         self.geometry = geometry
@@ -49,20 +90,28 @@ class SLF:
         :return: None
         """
         for file in os.listdir(self.slf_directory):
+            # The bundle, or a temporary bundle left behind by an interrupted packing
+            if file.endswith(".npz"):
+                continue
             if not os.path.isdir(self.slf_directory / file) and (file.endswith(".csv") or file.endswith(".xlsx")):
-                func = self._load_csv()
-                return func
+                func, SLFs = self._load_csv()
+                return func, SLFs
             elif not os.path.isdir(self.slf_directory / file) and (file.endswith(".pickle") or file.endswith(".pkl")):
                 func, SLFs = self._load_pickle()
                 return func, SLFs
             else:
                 raise ValueError("[EXCEPTION] Wrong SLF file format provided! Should be .csv or .pickle")
 
+        # SLF bundle only
+        if os.path.isfile(self.bundle):
+            func, SLFs = self._load_pickle()
+            return func, SLFs
+
     def _load_csv(self):
         """
         SLFs are read and ELRs per performance group are derived from a single .csv file
         SLFs for both PFA- and PSD-sensitive components are lumped at storey level, and not at each floor
-        :return: dict                               SLF 1d interpolation functions and ELRs as arrays within a dict
+        :return: SLFTable, None                     SLFs and ELRs
         """
         for file in os.listdir(self.slf_directory):
             if not os.path.isdir(self.slf_directory / file):
@@ -102,16 +151,12 @@ class SLF:
                     loss = loss / maxCost
 
                 # Assumption: typical storey SLFs are the same
-                func = {"y": {}, "interpolation": {}, "edp_interpolation": {}}
+                keys, grids, losses, peak = [], [], [], []
 
                 for i in range(ngroups):
                     # Select group name
                     group = edp_cols[i][:-2]
 
-                    # Initialize
-                    func["y"][group] = {}
-                    func["interpolation"][group] = {}
-                    func["edp_interpolation"][group] = {}
                     for st in range(self.nst):
                         if st != 0 and st != self.nst - 1:
                             st_id = 1
@@ -120,18 +165,20 @@ class SLF:
                         else:
                             st_id = st
                         l = loss[:, i + ngroups * st_id]
-                        edp = edps_array[:, i + ngroups * st_id]
-                        func["y"][group][st] = max(l) * self.y_sls
-                        func["interpolation"][group][st] = interp1d(l, edp)
-                        func["edp_interpolation"][group][st] = interp1d(edp, l)
+                        keys.append((group, "dir1", str(st)))
+                        grids.append(edps_array[:, i + ngroups * st_id])
+                        losses.append(l)
+                        peak.append(max(l))
+
+                func = SLFTable(keys, grids, range(len(keys)), losses, peak, self.y_sls)
 
                 # a single file
-                return func
+                return func, None
 
     def _load_pickle(self):
         """
         SLFs are read and ELRs per performance group are derived
-        :return: dict                               SLF 1d interpolation functions and ELRs as arrays within a dict
+        :return: SLFTable, dict                     SLFs and ELRs, and SLFs as read
         """
         '''
         Inputs:
@@ -150,8 +197,11 @@ class SLF:
         # IPBSD currently supports use of 3 distinct performance groups (more to be added)
         # i.e. PSD_NS, PSD_S, PFA_NS
 
-        # Loop for each pickle file in the relevant directory
-        SLFs = self._load_file()
+        # Loop for each pickle file in the relevant directory, or read the SLF bundle if up to date
+        if self.check_bundle():
+            SLFs = self._load_bundle()
+        else:
+            SLFs = self._load_file()
 
         # SLFs should be exported for use in LOSS
         # SLFs are disaggregated based on story, direction and EDP-sensitivity
@@ -215,126 +265,219 @@ class SLF:
                             loss = SLFs[i][j][st]["loss"]
                             slf_functions[j][k][st] += loss / factor
 
-        # SLF interpolation functions and ELRs
-        func = self.derive_slf_interpolation_functions(slf_functions)
+        # SLF table and ELRs
+        func = self.derive_slf_table(slf_functions)
 
         return func, SLFs
 
-    def derive_slf_interpolation_functions(self, functions):
+    def derive_slf_table(self, functions):
+        """
+        Arranges the SLFs in a table
+        :param functions: dict                      SLFs by EDP group, direction and storey (or floor) level
+        :return: SLFTable                           SLFs and ELRs
+        """
         # Scaling factor
         if self.perform_scaling:
             scale = 1 / (self.MAXCOST / self.replacement_cost)
         else:
             scale = 1.
 
-        # SLF interpolation functions and ELRs
-        func = {"y": {}, "interpolation": {}, "edp_interpolation": {}}
+        # EPD range for both NS and S should be the same
+        grids = [self.psd, self.pfa]
+        keys, grid, losses, peak = [], [], [], []
         for i in functions:
-            if i == "PFA_NS" or i == "PFA":
-                edp = self.pfa
-            else:
-                # EPD range for both NS and S should be the same
-                edp = self.psd
-
-            # Expected loss ratios (ELR)
-            func["y"][i] = {}
-            # Interpolation function for edp vs elr
-            func["interpolation"][i] = {}
-            # Interpolation function for elr vs edp
-            func["edp_interpolation"][i] = {}
-
             for k in functions[i]:
-                func["y"][i][k] = {}
-                func["interpolation"][i][k] = {}
-                func["edp_interpolation"][i][k] = {}
                 for st in functions[i][k]:
-                    func["y"][i][k][st] = max(functions[i][k][st]) * self.y_sls * scale
-                    func["interpolation"][i][k][st] = interp1d(functions[i][k][st] * scale, edp)
-                    func["edp_interpolation"][i][k][st] = interp1d(edp, functions[i][k][st] * scale)
-        return func
-
-    def _load_file(self):
-        # Initialize dictionary to store the SLF functions pertaining to all storeys, floors and directions
-        SLFs = {"Directional": {"PSD_NS": {}, "PSD_S": {}},
-                "Non-directional": {"PFA_NS": {}, "PSD_NS": {}, "PSD_S": {}}}
+                    keys.append((i, k, st))
+                    grid.append(1 if i == "PFA_NS" or i == "PFA" else 0)
+                    losses.append(functions[i][k][st] * scale)
+                    peak.append(max(functions[i][k][st]))
 
-        for file in os.listdir(self.slf_directory):
-            if not os.path.isdir(self.slf_directory / file) and not file.endswith(".csv") and not file.endswith(".xlsx"):
+        # Expected loss ratios (ELR) follow from the maximum losses
+        return SLFTable(keys, grids, grid, losses, peak, self.y_sls, scale)
 
-                # Open slf file
-                f = open(self.slf_directory / file, "rb")
-                df = pickle.load(f)
-                f.close()
+    def get_files(self):
+        """
+        Gets the SLF pickles of the directory
+        :return: list                               File names
+        """
+        return [file for file in sorted(os.listdir(self.slf_directory)) if not file.endswith(".npz") and
+                not os.path.isdir(self.slf_directory / file) and not file.endswith(".csv") and
+                not file.endswith(".xlsx")]
 
-                # Split file name into words ([direction, storey, EDP] or [storey, EDP])
-                str_list = re.split("_+", file)
+    def read_file(self, file):
+        """
+        Reads the SLFs of a pickle
+        :param file: str                            File name, e.g. dir1_st1_psd.pickle or fl1_pfa.pickle
+        :return: list                               SLFs as (non-directional flag, performance group, direction,
+                                                    storey, {"loss", "edp"})
+        """
+        # Open slf file
+        with open(self.slf_directory / file, "rb") as f:
+            df = pickle.load(f)
 
-                # Test if "2d" structure is being considered only (SEEMS REDUNDANT)
-                if not self.geometry:
-                    if str_list[0][-1] == "1" or len(str_list) == 2:
-                        # Perform the loop if dir1 or non-directional components
-                        pass
-                    else:
-                        # Skip the loop
-                        continue
+        # Split file name into words ([direction, storey, EDP] or [storey, EDP])
+        str_list = re.split("_+", file)
 
-                # Check if non-directional or not
-                if len(str_list) == 2:
-                    direction = None
-                    non_dir = "Non-directional"
+        # Check if non-directional or not
+        if len(str_list) == 2:
+            direction = None
+            non_dir = "Non-directional"
+        else:
+            direction = str_list[0][-1]
+            non_dir = "Directional"
+
+        # EDP name (psd or pfa)
+        edp = str_list[-1][0:3]
+
+        entries = []
+        for key in df.keys():
+            if key.startswith("SLF"):
+                continue
+            # PFA-sensitive components
+            if edp == "pfa":
+                story = str(int(re.search(r"\d+$", str_list[0]).group()) - 1)
+                tag = "PFA_NS"
+            # PSD-sensitive components
+            else:
+                story = re.search(r"\d+$", str_list[-2]).group()
+                if key == str(self.S_KEY):
+                    tag = "PSD_S"
+                elif key == str(self.NS_KEY):
+                    tag = "PSD_NS"
                 else:
-                    direction = str_list[0][-1]
-                    non_dir = "Directional"
+                    raise ValueError("[EXCEPTION] Wrong group name provided!")
+            entries.append((non_dir, tag, direction, story, self.derive_slf(df, key)))
 
-                # EDP name (psd or pfa)
-                edp = str_list[-1][0:3]
+        return entries
 
-                # PFA-sensitive components
-                if edp == "pfa":
-                    story = str_list[0][-1]
-                    for key in df.keys():
-                        if not key.startswith("SLF"):
-                            # get the SLF curve
-                            data = self.derive_slf(df, key)
+    def store_slf(self, SLFs, non_dir, tag, direction, story, data):
+        """
+        Stores an SLF, skipping the second direction of 2D structures
+        :param SLFs: dict                           SLFs pertaining to all storeys, floors and directions
+        :param non_dir: str                         Directional or Non-directional
+        :param tag: str                             Performance group
+        :param direction: str                       Direction, None for non-directional components
+        :param story: str                           Storey (or floor for PFA-sensitive components)
+        :param data: dict                           SLF, loss and EDP
+        :return: None
+        """
+        # Test if "2d" structure is being considered only, dir1 or non-directional components
+        if not self.geometry and direction not in (None, "1"):
+            return
+
+        if tag == "PFA_NS":
+            SLFs[non_dir][tag][story] = data
+            # PFA distribution
+            if self.pfa is None:
+                self.pfa = data["edp"]
+        else:
+            if direction is not None:
+                SLFs[non_dir][tag].setdefault("dir" + direction, {})[story] = data
+            else:
+                SLFs[non_dir][tag][story] = data
+            # PSD distribution
+            if self.psd is None:
+                self.psd = data["edp"]
 
-                            # store the SLF curve
-                            SLFs[non_dir]["PFA_NS"][str(int(story) - 1)] = data
+        # increment max cost
+        self.MAXCOST += np.max(data['loss'])
 
-                            # increment max cost
-                            self.MAXCOST += max(data['loss'])
+    def _load_file(self):
+        # Initialize dictionary to store the SLF functions pertaining to all storeys, floors and directions
+        SLFs = {"Directional": {"PSD_NS": {}, "PSD_S": {}},
+                "Non-directional": {"PFA_NS": {}, "PSD_NS": {}, "PSD_S": {}}}
 
-                            # PFA distribution
-                            if self.pfa is None:
-                                self.pfa = df[key]["edp"]
+        for file in self.get_files():
+            for entry in self.read_file(file):
+                self.store_slf(SLFs, *entry)
 
-                # PSD-sensitive components
-                else:
-                    story = str_list[-2][-1]
-                    for key in df.keys():
-                        if not key.startswith("SLF"):
-                            if key == str(self.S_KEY):
-                                # if key == str(s_key):
-                                tag = "PSD_S"
-                            elif key == str(self.NS_KEY):
-                                tag = "PSD_NS"
-                            else:
-                                raise ValueError("[EXCEPTION] Wrong group name provided!")
-
-                            if direction is not None:
-                                if "dir" + direction not in SLFs[non_dir][tag].keys():
-                                    SLFs[non_dir][tag]["dir" + direction] = {}
-
-                                data = self.derive_slf(df, key)
-                                SLFs[non_dir][tag]["dir" + direction].update({story: data})
-                                self.MAXCOST += max(data['loss'])
-                            else:
-                                data = self.derive_slf(df, key)
-                                SLFs[non_dir][tag].update({story: data})
-                                self.MAXCOST += max(data['loss'])
-
-                            # PSD distribution
-                            if self.psd is None:
-                                self.psd = df[key]["edp"]
+        return SLFs
+
+    @staticmethod
+    def pack_bundle(slf_directory, bundle=None):
+        """
+        Packs the SLF pickles of a building into a single binary bundle
+        The EDP ranges and losses of all SLFs are stored as contiguous arrays, indexed by group, direction and storey
+        :param slf_directory: Path                  Directory of SLFs derived via SLF Generator
+        :param bundle: Path                         Path of the bundle. If None, within the SLF directory
+        :return: Path                               Path of the bundle
+        """
+        slf = SLF(slf_directory, None, None, geometry=True, bundle=bundle)
+        files = slf.get_files()
+
+        entries, sources = [], []
+        for file in files:
+            for entry in slf.read_file(file):
+                entries.append(entry)
+                sources.append(file)
+
+        if not entries:
+            raise ValueError("[EXCEPTION] No SLF pickles to pack!")
+
+        lengths = [len(entry[-1]["loss"]) for entry in entries]
+        stats = [os.stat(slf_directory / file) for file in files]
+
+        # Written under a unique temporary name first, so that an interrupted run leaves no partial bundle behind, and
+        # concurrent runs do not write to the same file. Any .npz file is skipped when reading the SLFs
+        fd, tmp = tempfile.mkstemp(dir=slf.bundle.parent, prefix=f"{slf.bundle.stem}.", suffix=".npz")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f,
+                         offsets=np.concatenate(([0], np.cumsum(lengths))),
+                         loss=np.concatenate([np.asarray(entry[-1]["loss"], dtype=float) for entry in entries]),
+                         edp=np.concatenate([np.asarray(entry[-1]["edp"], dtype=float) for entry in entries]),
+                         non_dir=np.array([entry[0] for entry in entries]),
+                         group=np.array([entry[1] for entry in entries]),
+                         direction=np.array([entry[2] or "" for entry in entries]),
+                         story=np.array([entry[3] for entry in entries]),
+                         source=np.array(sources),
+                         files=np.array(files),
+                         sizes=np.array([stat.st_size for stat in stats]),
+                         mtimes=np.array([stat.st_mtime_ns for stat in stats]))
+            os.replace(tmp, slf.bundle)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+        return slf.bundle
+
+    def check_bundle(self):
+        """
+        Checks whether the SLF bundle exists and is up to date with the SLF pickles of the directory, if any
+        :return: bool                               Bundle to be used
+        """
+        if not os.path.isfile(self.bundle):
+            return False
+
+        files = self.get_files()
+        if not files:
+            return True
+
+        with np.load(self.bundle) as data:
+            packed = (data["files"].tolist(), data["sizes"].tolist(), data["mtimes"].tolist())
+        stats = [os.stat(self.slf_directory / file) for file in files]
+        if packed != (files, [stat.st_size for stat in stats], [stat.st_mtime_ns for stat in stats]):
+            print("[WARNING] SLF bundle is out of date, the SLF files are read instead")
+            return False
+        return True
+
+    def _load_bundle(self):
+        """
+        Reads the SLFs from the memory-mapped bundle, losses and EDP ranges are views of the bundle and are read
+        only when used
+        :return: dict                               SLFs pertaining to all storeys, floors and directions
+        """
+        SLFs = {"Directional": {"PSD_NS": {}, "PSD_S": {}},
+                "Non-directional": {"PFA_NS": {}, "PSD_NS": {}, "PSD_S": {}}}
+
+        data = load_npz(self.bundle)
+        offsets = data["offsets"]
+        for i, (non_dir, tag, direction, story) in enumerate(zip(data["non_dir"], data["group"], data["direction"],
+                                                                 data["story"])):
+            rows = slice(offsets[i], offsets[i + 1])
+            self.store_slf(SLFs, str(non_dir), str(tag), str(direction) or None, str(story),
+                           {"loss": data["loss"][rows], "edp": data["edp"][rows]})
 
         return SLFs
 
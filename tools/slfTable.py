@@ -0,0 +1,119 @@
+"""
+Array-backed storey loss function (SLF) tables
+All SLFs of a building are held as rows of 2-D arrays, on EDP ranges shared by the SLFs of the same EDP, and are
+interpolated linearly for all storeys, performance groups and directions at once, as interp1d would for each of them
+"""
+import numpy as np
+
+
+def pad_rows(rows):
+    """
+    Stacks arrays of different lengths as rows of a 2-D array, repeating their last values
+    :param rows: list                           Arrays
+    :return: ndarray                            Rows
+    """
+    n = max(len(row) for row in rows)
+    return np.array([np.concatenate((row, np.full(n - len(row), row[-1]))) for row in rows], dtype=float)
+
+
+def interpolate_rows(x, xp, fp):
+    """
+    Linear interpolation along the rows, with the lookup and arithmetic of interp1d
+    :param x: ndarray                           Query points, with a trailing axis along the rows
+    :param xp: ndarray                          Non-decreasing grids, one per row
+    :param fp: ndarray                          Values at the grid points
+    :return: ndarray                            Interpolated values
+    """
+    if np.any((x < xp[:, 0]) | (x > xp[:, -1])):
+        raise ValueError("[EXCEPTION] Values to interpolate outside of the range of the SLFs!")
+
+    hi = np.zeros(x.shape, dtype=int)
+    for row in range(xp.shape[0]):
+        hi[..., row] = np.searchsorted(xp[row], x[..., row])
+    hi = np.minimum(np.maximum(hi, 1), xp.shape[1] - 1)
+    lo = hi - 1
+
+    rows = np.arange(xp.shape[0])
+    x_lo, x_hi = xp[rows, lo], xp[rows, hi]
+    y_lo, y_hi = fp[rows, lo], fp[rows, hi]
+    slope = (y_hi - y_lo) / (x_hi - x_lo)
+    return slope * (x - x_lo) + y_lo
+
+
+class SLFTable:
+    def __init__(self, keys, grids, grid, loss, peak, y_sls, scale=1.):
+        """
+        Initializes the SLF table
+        :param keys: list                       Performance group, direction and storey (or floor) of each SLF
+        :param grids: list                      EDP ranges
+        :param grid: list                       Index of the EDP range of each SLF
+        :param loss: list                       Losses of each SLF along its EDP range
+        :param peak: list                       Maximum losses of each SLF, before scaling
+        :param y_sls: float                     Expected loss ratio (ELR) associated with SLS
+        :param scale: float                     Scaling factor of the SLFs
+        """
+        self.keys = list(keys)
+        self.group = np.array([key[0] for key in self.keys])
+        self.direction = np.array([key[1] for key in self.keys])
+        self.storey = np.array([key[2] for key in self.keys])
+        self.peak = np.array(peak, dtype=float)
+        self.scale = scale
+
+        # Expected loss ratios (ELRs) of each SLF
+        self.y = self.get_elr(y_sls)
+
+        self.grids = pad_rows(grids)
+        self.grid = np.array(grid, dtype=int)
+        self.loss = pad_rows(loss)
+
+        # Losses sorted in a stable manner along each row, and the corresponding EDPs, for the inverse interpolation
+        edp = pad_rows([grids[i] for i in grid])
+        order = np.argsort(self.loss, axis=1, kind="mergesort")
+        self.sorted_loss = np.take_along_axis(self.loss, order, axis=1)
+        self.sorted_edp = np.take_along_axis(edp, order, axis=1)
+
+    def get_elr(self, y_sls):
+        """
+        Gets the ELRs of each SLF
+        :param y_sls: float or array            ELRs associated with SLS
+        :return: ndarray                        ELRs of each SLF, with a trailing axis along the SLFs
+        """
+        return self.peak * np.asarray(y_sls, dtype=float)[..., None] * self.scale
+
+    def get_rows(self, group=None, direction=None):
+        """
+        Selects SLFs
+        :param group: str                       Performance group (all if None)
+        :param direction: str                   Direction, e.g. dir1 (all if None)
+        :return: ndarray                        Indices of the SLFs
+        """
+        mask = np.ones(len(self.keys), dtype=bool)
+        if group is not None:
+            mask &= self.group == group
+        if direction is not None:
+            mask &= self.direction == direction
+        return np.flatnonzero(mask)
+
+    def get_loss(self, edp, rows=None):
+        """
+        Forward interpolation, EDP to loss
+        :param edp: float or array              EDPs, with a trailing axis along the SLFs or a single value for all
+        :param rows: array                      Indices of the SLFs (all if None)
+        :return: ndarray                        Losses
+        """
+        rows = np.arange(len(self.keys)) if rows is None else np.asarray(rows)
+        edp = np.asarray(edp, dtype=float)
+        edp = np.broadcast_to(edp, np.broadcast_shapes(edp.shape, rows.shape))
+        return interpolate_rows(edp, self.grids[self.grid[rows]], self.loss[rows])
+
+    def get_edp(self, loss, rows=None):
+        """
+        Inverse interpolation, loss to EDP
+        :param loss: float or array             Losses, with a trailing axis along the SLFs or a single value for all
+        :param rows: array                      Indices of the SLFs (all if None)
+        :return: ndarray                        EDPs
+        """
+        rows = np.arange(len(self.keys)) if rows is None else np.asarray(rows)
+        loss = np.asarray(loss, dtype=float)
+        loss = np.broadcast_to(loss, np.broadcast_shapes(loss.shape, rows.shape))
+        return interpolate_rows(loss, self.sorted_loss[rows], self.sorted_edp[rows])
@@ -3,6 +3,274 @@ from scipy.interpolate import interp1d
 
 from utils.spo2ida_utils import *
 
+# Regression coefficients of SPO2IDA, one column per fractile IDA curve
+# Residual plateau region (mXXrXX)
+FB0_MXXRXX = np.array([[-0.2226, 0.1401, 0.7604],
+                       [-0.0992, -0.0817, -0.1035],
+                       [-0.4537, -0.5091, -0.5235],
+                       [-0.0398, -0.0236, -0.0287],
+                       [0.0829, -0.0364, -0.0174],
+                       [0.0193, -0.0126, -0.0118],
+                       [-0.1831, -0.2732, -0.5651],
+                       [-0.0319, 0.0015, 0.0437],
+                       [0.1461, 0.1101, 0.0841],
+                       [-0.0227, -0.0045, 0.0159],
+                       [-0.0108, 0.0333, 0.0033],
+                       [-0.0081, -0.0000, 0.0033],
+                       [0.1660, 0.1967, 0.0929],
+                       [-0.0124, -0.0304, 0.0130],
+                       [0.0273, 0.0396, 0.0580],
+                       [-0.0167, -0.0209, -0.0144],
+                       [-0.0182, 0.0311, 0.0221],
+                       [-0.0097, -0.0047, 0.0007]])
+FB1_MXXRXX = np.array([[1.0595, 1.0635, 1.0005],
+                       [0.0236, 0.0177, 0.0283],
+                       [0.1237, 0.1466, 0.1607],
+                       [0.0111, 0.0048, -0.0004],
+                       [-0.0023, 0.0102, 0.0021],
+                       [0.0008, 0.0019, 0.0035],
+                       [-0.0881, -0.1044, -0.1276],
+                       [-0.0077, -0.0137, -0.0413],
+                       [-0.0239, -0.0090, -0.0085],
+                       [0.0025, -0.0014, -0.0198],
+                       [0.0082, -0.0003, 0.0037],
+                       [0.0007, -0.0013, -0.0043],
+                       [0.0317, 0.0038, 0.0673],
+                       [0.0006, 0.0065, 0.0074],
+                       [-0.0173, -0.0484, -0.0737],
+                       [0.0056, 0.0068, 0.0255],
+                       [0.0007, -0.0112, -0.0073],
+                       [0.0004, 0.0008, 0.0005]])
+
+# Negative slope (capping) region, pinching model
+PINCH50_F_MXX = np.array([[0.2391, 0.3846, 0.5834],
+                          [0.0517, 0.0887, 0.1351],
+                          [-1.2399, -1.3531, -1.4585],
+                          [-0.0976, -0.1158, -0.1317],
+                          [0.0971, 0.1124, 0.1100],
+                          [0.0641, 0.0501, 0.0422],
+                          [-0.0009, 0.0041, 0.0056],
+                          [0.0072, 0.0067, 0.0074]])
+PINCH50_F_P0MXXCXX = np.array([[-0.2508, -0.2762, -0.2928],
+                               [-0.5517, -0.1992, -0.4394],
+                               [0.0941, -0.0031, 0.0683],
+                               [0.0059, 0.0101, 0.0131],
+                               [0.1681, 0.2451, 0.1850],
+                               [0.1357, -0.0199, 0.1783],
+                               [-0.0127, 0.0091, -0.0305],
+                               [0.0010, -0.0075, -0.0066],
+                               [-0.1579, -0.0135, 0.0027],
+                               [0.2551, -0.0841, 0.0447],
+                               [-0.0602, 0.0222, -0.0151],
+                               [0.0087, -0.0003, -0.0025]])
+
+# Negative slope (capping) region, moderately pinching (McLough) model
+MCLOUGH_F_MXX = np.array([[0.2573, 0.3821, 0.5449],
+                          [0.0496, 0.0753, 0.0977],
+                          [-1.2305, -1.3289, -1.4270],
+                          [-0.0739, -0.0894, -0.1035],
+                          [0.0780, 0.0929, 0.1060],
+                          [0.0452, 0.0392, 0.0467],
+                          [-0.0038, -0.0005, 0.0039],
+                          [0.0019, 0.0027, 0.0058]])
+MCLOUGH_F_P0MXXCXX = np.array([[-0.5111, -0.3817, -0.4118],
+                               [-0.6194, -0.3599, -0.2610],
+                               [0.0928, -0.0019, -0.0070],
+                               [0.0163, 0.0186, 0.0158]])
+
+# Hardening region, pinching model
+PINCH50_FB0_PXX = np.array([[-0.9309, 0.0288, 0.2987],
+                            [0.43, -0.1718, 0.0438],
+                            [-0.2934, 0.1189, -0.1008],
+                            [0.3409, -0.0986, -0.0267],
+                            [0.7201, 0.8073, 0.0962],
+                            [0.3105, -0.2548, 0.3569],
+                            [-0.3343, -0.0561, -0.4138],
+                            [0.0778, -0.343, -0.151],
+                            [0.1358, -0.85, -0.4004],
+                            [-0.7301, 0.4165, -0.3644],
+                            [0.6055, -0.0806, 0.4698],
+                            [-0.4094, 0.4322, 0.1895]])
+PINCH50_FB1_PXX = np.array([[0.1151, -0.4671, -0.5994],
+                            [-0.0940, 0.4071, 0.2858],
+                            [0.0539, -0.2373, -0.1310],
+                            [0.0073, 0.4093, 0.4984],
+                            [-0.4092, -1.0761, -0.9235],
+                            [0.1534, 0.7899, 0.5074],
+                            [0.0216, -0.2518, -0.0910],
+                            [0.1651, 0.6914, 0.7160],
+                            [0.2733, 1.5106, 1.5379],
+                            [-0.0338, -1.1673, -0.7999],
+                            [-0.0801, 0.4927, 0.2387],
+                            [-0.1586, -1.0815, -1.2277]])
+
+# Hardening region, moderately pinching (McLough) model
+MCLOUGH_FB0_PXX = np.array([[-0.6157, -0.1842, 0.2155],
+                            [0.0260, -0.0027, 0.0760],
+                            [0.0140, 0.0215, -0.1458],
+                            [0.8605, 0.4986, 0.1693],
+                            [0.2264, 0.2026, 0.4712],
+                            [-0.3041, -0.3542, -0.7131],
+                            [-0.3316, -0.3536, -0.3827],
+                            [-0.2613, -0.2011, -0.5240],
+                            [0.2689, 0.3055, 0.8093]])
+MCLOUGH_FB1_PXX = np.array([[0.1433, 0.0882, 0.0552],
+                            [-0.1074, -0.1635, -0.3562],
+                            [0.0538, 0.1062, 0.2745],
+                            [-0.1705, -0.1486, -0.1009],
+                            [-0.0813, -0.1489, -0.3903],
+                            [0.1661, 0.2618, 0.5810],
+                            [0.0313, 0.0587, 0.0363],
+                            [0.1957, 0.3185, 0.7552],
+                            [-0.2086, -0.3550, -0.8369]])
+
+
+
+def ab_mXXrXXtXX(ac, r, T):
+    """
+    Coefficients of the residual plateau region
+    Inputs may be floats or arrays of equal shape, outputs gain a trailing axis of the three fractiles
+    :param ac: float or ndarray             Negative (capping) slope
+    :param r: float or ndarray              Residual plateau height
+    :param T: float or ndarray              Period
+    :return: ndarray, ndarray               Coefficients b0 and b1
+    """
+    lac, lr, lT = np.log(ac), np.log(r), np.log(T)
+    X = np.stack([np.ones_like(lT), lac, lr, lac * lr, np.power(lr, -1), lac * np.power(lr, -1), lT, lac * lT,
+                  lr * lT, lac * lr * lT, np.power(lr, -1) * lT, lac * np.power(lr, -1) * lT, np.power(lT, 2),
+                  lac * np.power(lT, 2), lr * np.power(lT, 2), lac * lr * np.power(lT, 2),
+                  np.power(lr, -1) * np.power(lT, 2), lac * np.power(lr, -1) * np.power(lT, 2)], axis=-1)
+    return X @ FB0_MXXRXX, X @ FB1_MXXRXX
+
+
+def pinch50_Rcap_pXXmXXcXXtXX(a, ac, T, meq, mpeak, Rmc):
+    """
+    Strength ratio at the onset of the negative slope region for the pinching model
+    :param a: float or ndarray              Hardening slope
+    :param ac: float or ndarray             Negative (capping) slope
+    :param T: float or ndarray              Period
+    :param meq: float or ndarray            Equivalent ductility
+    :param mpeak: float or ndarray          Ductility at peak
+    :param Rmc: ndarray                     Strength ratios at the end of the hardening region
+    :return: ndarray, ndarray               Strength ratios at capping and capping factors
+    """
+    ac = np.asarray(ac, dtype=float)
+    lT, lac, lmeq = np.log(T), np.log(ac), np.log(meq)
+    X = np.stack([np.ones_like(lT), lT, lac, lac * lT, np.power(lac, 2), np.power(lac, 2) * lT, np.power(lac, 3),
+                  np.power(lac, 3) * lT], axis=-1)
+    Rc_mXX = ac[..., None] * np.exp(X @ PINCH50_F_MXX)[..., ::-1]
+    X = np.stack([lmeq, ac * lmeq, np.power(ac, 2) * lmeq, np.power(ac, -1) * lmeq, lmeq * lT, ac * lmeq * lT,
+                  np.power(ac, 2) * lmeq * lT, np.power(ac, -1) * lmeq * lT, lmeq * np.power(lT, 2),
+                  ac * lmeq * np.power(lT, 2), np.power(ac, 2) * lmeq * np.power(lT, 2),
+                  np.power(ac, -1) * lmeq * np.power(lT, 2)], axis=-1)
+    Rfrac_p0mXXcXX = np.exp(X @ PINCH50_F_P0MXXCXX)[..., ::-1]
+    a, mpeak = (np.asarray(x, dtype=float)[..., None] for x in (a, mpeak))
+    Rfrac_pXXmXXcXX = Rfrac_p0mXXcXX + a * (mpeak - Rfrac_p0mXXcXX)
+    Rcap = Rmc + (Rc_mXX - 1) * Rfrac_pXXmXXcXX
+    return Rcap, Rc_mXX
+
+
+def mclough_Rcap_pXXmXXcXXtXX(a, ac, T, meq, mpeak, Rmc):
+    """
+    Strength ratio at the onset of the negative slope region for the moderately pinching model
+    :param a: float or ndarray              Hardening slope
+    :param ac: float or ndarray             Negative (capping) slope
+    :param T: float or ndarray              Period
+    :param meq: float or ndarray            Equivalent ductility
+    :param mpeak: float or ndarray          Ductility at peak
+    :param Rmc: ndarray                     Strength ratios at the end of the hardening region
+    :return: ndarray, ndarray               Strength ratios at capping and capping factors
+    """
+    ac = np.asarray(ac, dtype=float)
+    lT, lac, lmeq = np.log(T), np.log(ac), np.log(meq)
+    X = np.stack([np.ones_like(lT), lT, lac, lac * lT, np.power(lac, 2), np.power(lac, 2) * lT, np.power(lac, 3),
+                  np.power(lac, 3) * lT], axis=-1)
+    Rc_mXX = ac[..., None] * np.exp(X @ MCLOUGH_F_MXX)[..., ::-1]
+    X = np.stack([lmeq, ac * lmeq, np.power(ac, 2) * lmeq, np.power(ac, -1) * lmeq], axis=-1)
+    Rfrac_p0mXXcXX = np.exp(X @ MCLOUGH_F_P0MXXCXX)[..., ::-1]
+    a, mpeak = (np.asarray(x, dtype=float)[..., None] for x in (a, mpeak))
+    Rfrac_pXXmXXcXX = Rfrac_p0mXXcXX + a * (mpeak - Rfrac_p0mXXcXX)
+    Rcap = Rmc + (Rc_mXX - 1) * Rfrac_pXXmXXcXX
+    return Rcap, Rc_mXX
+
+
+def Rcap_pXXmXXcXXtXX(a, ac, T, pw, meq, mpeak, Rmc):
+    """
+    Strength ratio at the onset of the negative slope region, weighted between the two hysteretic models
+    :param pw: float or ndarray             Pinching model weight
+    Other parameters as in pinch50_Rcap_pXXmXXcXXtXX
+    :return: ndarray, ndarray               Strength ratios at capping and capping factors
+    """
+    pRcap, pRc_mXX = pinch50_Rcap_pXXmXXcXXtXX(a, ac, T, meq, mpeak, Rmc)
+    mRcap, mRc_mXX = mclough_Rcap_pXXmXXcXXtXX(a, ac, T, meq, mpeak, Rmc)
+    pw = np.asarray(pw, dtype=float)[..., None]
+    Rcap = pw * pRcap + (1 - pw) * mRcap
+    Rc_mXX = pw * pRc_mXX + (1 - pw) * mRc_mXX
+    return Rcap, Rc_mXX
+
+
+def pinch50_ab_pXXtXX(a, T):
+    """
+    Coefficients of the hardening region for the pinching model
+    :param a: float or ndarray              Hardening slope
+    :param T: float or ndarray              Period
+    :return: ndarray, ndarray               Coefficients b0 and b1
+    """
+    lT, lT1, sa = np.log(T), np.power(np.log(T + 1), -1), np.sqrt(a)
+    X = np.stack([np.ones_like(lT), lT, np.power(lT, 2), lT1, a * np.ones_like(lT), a * lT, a * np.power(lT, 2),
+                  a * lT1, sa * np.ones_like(lT), sa * lT, sa * np.power(lT, 2), sa * lT1], axis=-1)
+    b0 = np.exp(X @ PINCH50_FB0_PXX)
+    b1 = np.exp(X @ PINCH50_FB1_PXX) - 1
+    return b0, b1
+
+
+def mclough_ab_pXXtXX(a, T):
+    """
+    Coefficients of the hardening region for the moderately pinching model
+    :param a: float or ndarray              Hardening slope
+    :param T: float or ndarray              Period
+    :return: ndarray, ndarray               Coefficients b0 and b1
+    """
+    lT, sa = np.log(T), np.sqrt(a)
+    X = np.stack([np.ones_like(lT), lT, np.power(lT, 2), a * np.ones_like(lT), a * lT, a * np.power(lT, 2),
+                  sa * np.ones_like(lT), sa * lT, sa * np.power(lT, 2)], axis=-1)
+    b0 = np.exp(X @ MCLOUGH_FB0_PXX)
+    b1 = np.exp(X @ MCLOUGH_FB1_PXX) - 1
+    return b0, b1
+
+
+def ab_pXXtXX(a, T, pw):
+    """
+    Coefficients of the hardening region, weighted between the two hysteretic models
+    :param a: float or ndarray              Hardening slope
+    :param T: float or ndarray              Period
+    :param pw: float or ndarray             Pinching model weight
+    :return: ndarray, ndarray               Coefficients b0 and b1
+    """
+    pb0, pb1 = pinch50_ab_pXXtXX(a, T)
+    mb0, mb1 = mclough_ab_pXXtXX(a, T)
+    pw = np.asarray(pw, dtype=float)[..., None]
+    b0 = pw * pb0 + (1 - pw) * mb0
+    b1 = pw * pb1 + (1 - pw) * mb1
+    return b0, b1
+
+
+def Rmc_pXX(mc, b0, b1):
+    """
+    Strength ratio and slope at the end of the hardening region
+    :param mc: float or ndarray             Ductility at the end of the hardening region
+    :param b0: ndarray                      Coefficients b0 of the hardening region
+    :param b1: ndarray                      Coefficients b1 of the hardening region
+    :return: ndarray, ndarray               Strength ratios and slopes
+    """
+    lmc = np.log(np.asarray(mc, dtype=float))[..., None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        Delta = np.power(b0, 2) + 4 * b1 * lmc
+        lRmc1 = np.where(b1 != 0, np.divide(-b0 + np.sqrt(Delta), 2 * b1), np.divide(lmc, b0))
+    Rmc = np.exp(lRmc1)
+    slmc = b0 + b1 * 2 * lRmc1
+    return Rmc, slmc
+
 
 class SPO2IDA:
     def __init__(self, mc, a, ac, r, mf, T, pw):
@@ -80,228 +348,33 @@ class SPO2IDA:
         return R16, R50, R84, idacm, idacr, spom, spor
 
     def get_ab_mXXrXXtXX(self, r=None):
-        ac = self.ac
         if r is None:
             r = self.r
-        T = self.T
-        fb0_mXXrXX = np.matrix([[-0.2226, 0.1401, 0.7604],
-                                [-0.0992, -0.0817, -0.1035],
-                                [-0.4537, -0.5091, -0.5235],
-                                [-0.0398, -0.0236, -0.0287],
-                                [0.0829, -0.0364, -0.0174],
-                                [0.0193, -0.0126, -0.0118],
-                                [-0.1831, -0.2732, -0.5651],
-                                [-0.0319, 0.0015, 0.0437],
-                                [0.1461, 0.1101, 0.0841],
-                                [-0.0227, -0.0045, 0.0159],
-                                [-0.0108, 0.0333, 0.0033],
-                                [-0.0081, -0.0000, 0.0033],
-                                [0.1660, 0.1967, 0.0929],
-                                [-0.0124, -0.0304, 0.0130],
-                                [0.0273, 0.0396, 0.0580],
-                                [-0.0167, -0.0209, -0.0144],
-                                [-0.0182, 0.0311, 0.0221],
-                                [-0.0097, -0.0047, 0.0007]])
-
-        fb1_mXXrXX = np.matrix([[1.0595, 1.0635, 1.0005],
-                                [0.0236, 0.0177, 0.0283],
-                                [0.1237, 0.1466, 0.1607],
-                                [0.0111, 0.0048, -0.0004],
-                                [-0.0023, 0.0102, 0.0021],
-                                [0.0008, 0.0019, 0.0035],
-                                [-0.0881, -0.1044, -0.1276],
-                                [-0.0077, -0.0137, -0.0413],
-                                [-0.0239, -0.0090, -0.0085],
-                                [0.0025, -0.0014, -0.0198],
-                                [0.0082, -0.0003, 0.0037],
-                                [0.0007, -0.0013, -0.0043],
-                                [0.0317, 0.0038, 0.0673],
-                                [0.0006, 0.0065, 0.0074],
-                                [-0.0173, -0.0484, -0.0737],
-                                [0.0056, 0.0068, 0.0255],
-                                [0.0007, -0.0112, -0.0073],
-                                [0.0004, 0.0008, 0.0005]])
-
-
-        X = np.matrix([1, np.log(ac), np.log(r), np.log(ac) * np.log(r), np.power(np.log(r), -1),
-                       np.log(ac) * np.power(np.log(r), -1), np.log(T), np.log(ac) * np.log(T), np.log(r) * np.log(T),
-                       np.log(ac) * np.log(r) * np.log(T), np.power(np.log(r), -1) * np.log(T),
-                       np.log(ac) * np.power(np.log(r), -1) * np.log(T), np.power(np.log(T), 2),
-                       np.log(ac) * np.power(np.log(T), 2), np.log(r) * np.power(np.log(T), 2),
-                       np.log(ac) * np.log(r) * np.power(np.log(T), 2),
-                       np.power(np.log(r), -1) * np.power(np.log(T), 2),
-                       np.log(ac) * np.power(np.log(r), -1) * np.power(np.log(T), 2)])
-
-        b0 = X * fb0_mXXrXX
-        b1 = X * fb1_mXXrXX
-        b0 = b0.tolist()[0]
-        b1 = b1.tolist()[0]
-        return b0, b1
+        b0, b1 = ab_mXXrXXtXX(self.ac, r, self.T)
+        return b0.tolist(), b1.tolist()
 
     def get_pinch50_Rcap_pXXmXXcXXtXX(self, meq, mpeak, Rmc):
-        a = self.a
-        ac = self.ac
-        T = self.T
-
-        Rmc = np.array(Rmc)
-        f_mXXtXX = np.matrix([[0.2391, 0.3846, 0.5834],
-                              [0.0517, 0.0887, 0.1351],
-                              [-1.2399, -1.3531, -1.4585],
-                              [-0.0976, -0.1158, -0.1317],
-                              [0.0971, 0.1124, 0.1100],
-                              [0.0641, 0.0501, 0.0422],
-                              [-0.0009, 0.0041, 0.0056],
-                              [0.0072, 0.0067, 0.0074]])
-        f_p0mXXcXXtXX = np.matrix([[-0.2508, -0.2762, -0.2928],
-                                   [-0.5517, -0.1992, -0.4394],
-                                   [0.0941, -0.0031, 0.0683],
-                                   [0.0059, 0.0101, 0.0131],
-                                   [0.1681, 0.2451, 0.1850],
-                                   [0.1357, -0.0199, 0.1783],
-                                   [-0.0127, 0.0091, -0.0305],
-                                   [0.0010, -0.0075, -0.0066],
-                                   [-0.1579, -0.0135, 0.0027],
-                                   [0.2551, -0.0841, 0.0447],
-                                   [-0.0602, 0.0222, -0.0151],
-                                   [0.0087, -0.0003, -0.0025]])
-        X = np.matrix(
-            [1, np.log(T), np.log(ac), np.log(ac) * np.log(T), np.power(np.log(ac), 2),
-             np.power(np.log(ac), 2) * np.log(T),  np.power(np.log(ac), 3), np.power(np.log(ac), 3) * np.log(T)])
-        Rc_mXX = ac * np.exp(X * f_mXXtXX)
-        Rc_mXX = np.array(Rc_mXX.tolist()[0][::-1])
-        X = np.matrix([np.log(meq), ac * np.log(meq), np.power(ac, 2) * np.log(meq), np.power(ac, -1) * np.log(meq),
-                       np.log(meq) * np.log(T), ac * np.log(meq) * np.log(T), np.power(ac, 2) * np.log(meq) * np.log(T),
-                       np.power(ac, -1) * np.log(meq) * np.log(T), np.log(meq) * np.power(np.log(T), 2),
-                       ac * np.log(meq) * np.power(np.log(T), 2), np.power(ac, 2) * np.log(meq) * np.power(np.log(T), 2),
-                       np.power(ac, -1) * np.log(meq) * np.power(np.log(T), 2)])
-        Rfrac_p0mXXcXX = np.exp(X * f_p0mXXcXXtXX)
-        Rfrac_p0mXXcXX = Rfrac_p0mXXcXX.tolist()[0][::-1]
-        Rfrac_pXXmXXcXX = np.array(Rfrac_p0mXXcXX) + a * (mpeak - np.array(Rfrac_p0mXXcXX))
-        Rcap = Rmc + (Rc_mXX - 1) * Rfrac_pXXmXXcXX
-        return Rcap, Rc_mXX
+        return pinch50_Rcap_pXXmXXcXXtXX(self.a, self.ac, self.T, meq, mpeak, np.array(Rmc))
 
     def get_mclough_Rcap_pXXmXXcXXtXX(self, meq, mpeak, Rmc):
-        a = self.a
-        ac = self.ac
-        T = self.T
-        Rmc = np.array(Rmc)
-        f_mXXtXX = np.matrix([[0.2573, 0.3821, 0.5449],
-                              [0.0496, 0.0753, 0.0977],
-                              [-1.2305, -1.3289, -1.4270],
-                              [-0.0739, -0.0894, -0.1035],
-                              [0.0780, 0.0929, 0.1060],
-                              [0.0452, 0.0392, 0.0467],
-                              [-0.0038, -0.0005, 0.0039],
-                              [0.0019, 0.0027, 0.0058]])
-        f_p0mXXcXX = np.matrix([[-0.5111, -0.3817, -0.4118],
-                                [-0.6194, -0.3599, -0.2610],
-                                [0.0928, -0.0019, -0.0070],
-                                [0.0163, 0.0186, 0.0158]])
-        X = np.matrix(
-            [1, np.log(T), np.log(ac), np.log(ac) * np.log(T), np.power(np.log(ac), 2),
-             np.power(np.log(ac), 2) * np.log(T), np.power(np.log(ac), 3), np.power(np.log(ac), 3) * np.log(T)])
-        Rc_mXX = ac * np.exp(X * f_mXXtXX)
-        Rc_mXX = np.array(Rc_mXX.tolist()[0][::-1])
-        X = np.matrix([np.log(meq), ac * np.log(meq), np.power(ac, 2) * np.log(meq), np.power(ac, -1) * np.log(meq)])
-        Rfrac_p0mXXcXX = np.exp(X * f_p0mXXcXX)
-        Rfrac_p0mXXcXX = np.array(Rfrac_p0mXXcXX.tolist()[0][::-1])
-        Rfrac_pXXmXXcXX = np.array(Rfrac_p0mXXcXX) + a * (mpeak - np.array(Rfrac_p0mXXcXX))
-        Rcap = Rmc + (Rc_mXX - 1) * Rfrac_pXXmXXcXX
-        return Rcap, Rc_mXX
+        return mclough_Rcap_pXXmXXcXXtXX(self.a, self.ac, self.T, meq, mpeak, np.array(Rmc))
 
     def get_Rcap_pXXmXXcXXtXX(self, meq, mpeak, Rmc):
-        pRcap, pRc_mXX = self.get_pinch50_Rcap_pXXmXXcXXtXX(meq, mpeak, Rmc)
-        mRcap, mRc_mXX = self.get_mclough_Rcap_pXXmXXcXXtXX(meq, mpeak, Rmc)
-        Rcap = self.pw * np.array(pRcap) + (1 - self.pw) * np.array(mRcap)
-        Rc_mXX = self.pw * np.array(pRc_mXX) + (1 - self.pw) * np.array(mRc_mXX)
-        return Rcap, Rc_mXX
+        return Rcap_pXXmXXcXXtXX(self.a, self.ac, self.T, self.pw, meq, mpeak, np.array(Rmc))
 
     def get_pinch50_ab_pXXtXX(self):
-        a = self.a
-        T = self.T
-        fb0_pXXtXX = np.matrix([[-0.9309, 0.0288, 0.2987],
-                                [0.43, -0.1718, 0.0438],
-                                [-0.2934, 0.1189, -0.1008],
-                                [0.3409, -0.0986, -0.0267],
-                                [0.7201, 0.8073, 0.0962],
-                                [0.3105, -0.2548, 0.3569],
-                                [-0.3343, -0.0561, -0.4138],
-                                [0.0778, -0.343, -0.151],
-                                [0.1358, -0.85, -0.4004],
-                                [-0.7301, 0.4165, -0.3644],
-                                [0.6055, -0.0806, 0.4698],
-                                [-0.4094, 0.4322, 0.1895]])
-        fb1_pXXtXX = np.matrix([[0.1151, -0.4671, -0.5994],
-                                [-0.0940, 0.4071, 0.2858],
-                                [0.0539, -0.2373, -0.1310],
-                                [0.0073, 0.4093, 0.4984],
-                                [-0.4092, -1.0761, -0.9235],
-                                [0.1534, 0.7899, 0.5074],
-                                [0.0216, -0.2518, -0.0910],
-                                [0.1651, 0.6914, 0.7160],
-                                [0.2733, 1.5106, 1.5379],
-                                [-0.0338, -1.1673, -0.7999],
-                                [-0.0801, 0.4927, 0.2387],
-                                [-0.1586, -1.0815, -1.2277]])
-
-        X = np.matrix([1, np.log(T), np.power(np.log(T), 2), np.power(np.log(T + 1), -1), a, a * np.log(T),
-                       a * np.power(np.log(T), 2), a * np.power(np.log(T + 1), -1), np.sqrt(a), np.sqrt(a) * np.log(T),
-                       np.sqrt(a) * np.power(np.log(T), 2), np.sqrt(a) * np.power(np.log(T + 1), -1)])
-        b0 = np.exp(X * fb0_pXXtXX)
-        b1 = np.exp(X * fb1_pXXtXX) - 1
-        return b0, b1
+        return pinch50_ab_pXXtXX(self.a, self.T)
 
     def get_mclough_ab_pXXtXX(self):
-        a = self.a
-        T = self.T
-        fb0_pXXtXX = np.matrix([[-0.6157, -0.1842, 0.2155],
-                                [0.0260, -0.0027, 0.0760],
-                                [0.0140, 0.0215, -0.1458],
-                                [0.8605, 0.4986, 0.1693],
-                                [0.2264, 0.2026, 0.4712],
-                                [-0.3041, -0.3542, -0.7131],
-                                [-0.3316, -0.3536, -0.3827],
-                                [-0.2613, -0.2011, -0.5240],
-                                [0.2689, 0.3055, 0.8093]])
-        fb1_pXXtXX = np.matrix([[0.1433, 0.0882, 0.0552],
-                                [-0.1074, -0.1635, -0.3562],
-                                [0.0538, 0.1062, 0.2745],
-                                [-0.1705, -0.1486, -0.1009],
-                                [-0.0813, -0.1489, -0.3903],
-                                [0.1661, 0.2618, 0.5810],
-                                [0.0313, 0.0587, 0.0363],
-                                [0.1957, 0.3185, 0.7552],
-                                [-0.2086, -0.3550, -0.8369]])
-
-        X = np.matrix([1, np.log(T), np.power(np.log(T), 2), a, a * np.log(T), a * np.power(np.log(T), 2), np.sqrt(a),
-                       np.sqrt(a) * np.log(T), np.sqrt(a) * np.power(np.log(T), 2)])
-        b0 = np.exp(X * fb0_pXXtXX)
-        b1 = np.exp(X * fb1_pXXtXX) - 1
-        return b0, b1
+        return mclough_ab_pXXtXX(self.a, self.T)
 
     def get_ab_pXXtXX(self):
-        pb0, pb1 = self.get_pinch50_ab_pXXtXX()
-        mb0, mb1 = self.get_mclough_ab_pXXtXX()
-        b0 = self.pw * pb0 + (1 - self.pw) * mb0
-        b1 = self.pw * pb1 + (1 - self.pw) * mb1
-        b0 = b0.tolist()[0]
-        b1 = b1.tolist()[0]
-        return b0, b1
+        b0, b1 = ab_pXXtXX(self.a, self.T, self.pw)
+        return b0.tolist(), b1.tolist()
 
     def get_Rmc(self, b0, b1):
-        b0 = np.array(b0)
-        b1 = np.array(b1)
-        Rmc = []
-        slmc = []
-        for i in range(3):
-            if b1[i] != 0:
-                Delta = np.power(b0[i], 2) + 4 * b1[i] * np.log(self.mc)
-                lRmc1 = (np.divide(-b0[i] + np.sqrt(Delta), 2 * b1[i]))
-            else:
-                lRmc1 = (np.divide(np.log(self.mc), b0[i]))
-            Rmc.append(np.exp(lRmc1))
-            slmc.append(b0[i] + b1[i] * 2 * lRmc1)
-        return Rmc, slmc
+        Rmc, slmc = Rmc_pXX(self.mc, np.array(b0), np.array(b1))
+        return Rmc.tolist(), slmc.tolist()
 
     def model_pXX(self, idacm, idacr, n):
         b0, b1 = self.get_ab_pXXtXX()
@@ -473,3 +546,229 @@ class SPO2IDA:
         ax.set_xlabel(r'$\mathrm{\mu}$', fontsize=axis_label_fontsize)
         ax.set_ylabel(r'$\mathrm{R}$', fontsize=axis_label_fontsize)
         f.tight_layout()
+
+
+class SPO2IDABatch:
+    def __init__(self, mc, a, ac, r, mf, T, pw):
+        """
+        SPO2IDA tool evaluating many backbones at once, equivalent to SPO2IDA.run_spo2ida_allT with spline fillets
+        Parameters are broadcast against each other, e.g. backbones along one axis and periods along another
+        :param mc: float or array       mu of end of hardening slope
+        :param a: float or array        hardening slope in [0,1]
+        :param ac: float or array       negative (capping) slope in [0.02,4]
+        :param r: float or array        residual plateau height, a fraction of Fy
+        :param mf: float or array       fracturing mu (end of SPO)
+        :param T: float or array        period (sec)
+        :param pw: float or array       pinching model weight.
+        """
+        params = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (mc, a, ac, r, mf, T, pw)))
+        self.shape = params[0].shape
+        self.mc, self.a, self.ac, self.r, self.mf, self.T, self.pw = (x.ravel() for x in params)
+        self.ac = np.abs(self.ac)
+
+    def get_valid(self):
+        """
+        Checks the backbones against the ranges of applicability of SPO2IDA
+        :return: ndarray                True for backbones within the ranges
+        """
+        return (self.mc >= 1) & (self.mc <= 9) & (self.a >= 0) & (self.a <= 0.90) & (self.ac >= 0.02) & \
+               (self.ac <= 4) & (self.r >= 0) & (self.r <= 0.95) & (self.mf >= 1) & (self.T >= 0.1) & (self.T <= 4)
+
+    def run_spo2ida_allT(self, n=10, curves=False):
+        """
+        Runs SPO2IDA for all backbones
+        The IDA curves are returned with the 84th, 50th and 16th percentiles along the second last axis, padded with
+        NaN at the end, since the number of points differs between backbones. Where the residual plateau is extended
+        up to mf by a linear segment, the capacity at mf is returned
+        :param n: int                   Number of points of the linear segments of the IDA curves
+        :param curves: bool             Whether to return the IDA and SPO curves
+        :return: ndarrays               R16, R50, R84 of the shape of the parameters (NaN outside the ranges of
+                                        applicability), IDA curves idacm, idacr and SPO curves spom, spor (None, if
+                                        curves is False)
+        """
+        valid = self.get_valid()
+        if not valid.all():
+            print(f"[WARNING] {np.count_nonzero(~valid)} backbones outside the ranges of applicability of SPO2IDA")
+
+        mc, a, ac, r, mf = self.mc, self.a, self.ac, self.r, self.mf
+        with np.errstate(all="ignore"):
+            mr = mc + (1 + (mc - 1) * a - r) / ac
+            rpeak = 1 + a * (mc - 1)
+            mend = mc + rpeak / ac
+            meq = mend - 1 / ac
+            Rpeak = 1 + np.minimum(a, 0.05) * (mc - 1)
+            req = r / Rpeak
+            mpeak = mend * ac / (1 + ac)
+            pxx, mxx, rxx = self.regions2model(mr)
+            mr = np.minimum(mr, mf)
+
+            # Segments of the IDA curves of shape (backbones, 3, points), points of inactive segments are NaN
+            idacm = [np.broadcast_to(np.linspace(0, 1, n + 1), mc.shape + (3, n + 1))]
+            idacr = [idacm[0]]
+
+            Rmc, slmc = self.model_pXX(idacm, idacr, pxx, n)
+            self.model_mXX(idacm, idacr, mxx, mr, meq, mend, mpeak, Rmc, slmc)
+            self.model_rXX(idacm, idacr, rxx, mr, req, n)
+
+            idacm = np.concatenate(idacm, axis=-1)
+            idacr = np.concatenate(idacr, axis=-1)
+            R = self.get_last_points(idacm, idacr)[1][1]
+            R[~valid] = np.nan
+
+        R84, R50, R16 = (R[:, i].reshape(self.shape) for i in range(3))
+        if not curves:
+            return R16, R50, R84, None, None, None, None
+
+        idacm = np.concatenate([idacm, np.broadcast_to(np.stack([mf, mf + 2], axis=-1)[:, None, :], R.shape + (2, ))],
+                               axis=-1)
+        idacr = np.concatenate([idacr, np.repeat(R[..., None], 2, axis=-1)], axis=-1)
+        idacm, idacr = self.compact(idacm, idacr)
+        idacm[~valid] = idacr[~valid] = np.nan
+
+        spom, spor = self.run_spo2ida_spo(np.minimum(mc, mf))
+        return R16, R50, R84, idacm.reshape(self.shape + idacm.shape[1:]), \
+            idacr.reshape(self.shape + idacr.shape[1:]), spom.reshape(self.shape + (5, )), \
+            spor.reshape(self.shape + (5, ))
+
+    def model_pXX(self, idacm, idacr, pxx, n):
+        b0, b1 = ab_pXXtXX(self.a, self.T, self.pw)
+        Rmc, slmc = Rmc_pXX(self.mc, b0, b1)
+        Rmc = np.where(pxx[:, None], Rmc, 1.)
+        slmc = np.where(pxx[:, None], slmc, 1.)
+
+        RpXX = np.linspace(1, Rmc, n + 1, axis=-1)[..., 1:]
+        newMu = np.exp(b0[..., None] * np.log(RpXX) + b1[..., None] * np.power(np.log(RpXX), 2))
+        active = pxx[:, None, None]
+        idacm.append(np.where(active, newMu, np.nan))
+        idacr.append(np.where(active, RpXX, np.nan))
+        return Rmc, slmc
+
+    def model_mXX(self, idacm, idacr, mxx, mr, meq, mend, mpeak, Rmc, slmc):
+        Rcap, Rcap_mXX = Rcap_pXXmXXcXXtXX(self.a, self.ac, self.T, self.pw, meq, mpeak, Rmc)
+        lmc = np.log(self.mc)[:, None]
+        xi = (np.log(Rcap) - np.log(Rmc)) * slmc + lmc
+        cp_mu = np.stack([2 * lmc - xi, xi, 2 * np.log(mend)[:, None] - xi], axis=-1)
+        cp_R = np.stack([2 * np.log(Rmc) - np.log(Rcap), np.log(Rcap), np.log(Rcap)], axis=-1)
+        newcx, newcy = spline(cp_mu, cp_R)
+
+        mc, mr = self.mc[:, None], np.broadcast_to(mr[:, None], Rcap.shape)
+        indy = (newcx > mc[..., None]) & (newcx <= mr[..., None])
+        R_rXX = self.extrapolate(newcx, newcy, indy, mc, mr)
+
+        active = mxx[:, None, None]
+        idacm.append(np.where(active & indy, newcx, np.nan))
+        idacr.append(np.where(active & indy, newcy, np.nan))
+        idacm.append(np.where(active, mr[..., None], np.nan))
+        idacr.append(np.where(active, R_rXX[..., None], np.nan))
+
+    def model_rXX(self, idacm, idacr, rxx, mr, req, n):
+        b0, b1 = ab_mXXrXXtXX(self.ac, req, self.T)
+        (m_prev, R_prev), (m_last, Rmr) = self.get_last_points(np.concatenate(idacm, axis=-1),
+                                                               np.concatenate(idacr, axis=-1))
+        lmr, lRmr = np.log(mr)[:, None], np.log(Rmr)
+
+        # Slope of the last segment of the curve, the fillet starts from its intersection with the fitted line
+        dlR = lRmr - np.log(R_prev)
+        slope_mXXend = (np.log(m_last) - np.log(m_prev)) / dlR
+        slope_mXXend = np.where(slope_mXXend == b1, b1 + 0.05, slope_mXXend)
+        lRmi = np.where(np.round(dlR, 3) != 0, (lmr - slope_mXXend * lRmr - b0) / (b1 - slope_mXXend), lRmr)
+        redo = lRmi < lRmr
+        slope_mXXend = np.where(redo, np.where(b1 >= slope_mXXend, b1 + 0.05, b1 - 0.05), slope_mXXend)
+        lRmi = np.where(redo, (lmr - slope_mXXend * lRmr - b0) / (b1 - slope_mXXend), lRmi)
+
+        lmmi = b0 + b1 * lRmi
+        new_mmi = np.exp(lmmi)
+        cp_mu = np.stack([2 * lmr - lmmi, lmmi, 3 * lmmi], axis=-1)
+        cp_R = np.stack([2 * lRmr - lRmi, lRmi, (3 * lmmi - b0) / b1], axis=-1)
+        newcx, newcy = spline(cp_mu, cp_R)
+
+        mr, mf = np.broadcast_to(mr[:, None], b0.shape), np.broadcast_to(self.mf[:, None], b0.shape)
+        indy = (newcx > mr[..., None]) & (newcx <= mf[..., None])
+
+        # Beyond the fillet, either a segment along the fitted line up to mf or a linear extrapolation to mf
+        extend = (mf > np.power(new_mmi, 2))[..., None]
+        m_rXX = np.linspace(new_mmi ** 2, mf, n + 1, axis=-1)
+        R_rXX = np.exp((np.log(m_rXX) - b0[..., None]) / b1[..., None])
+        m_end = np.full(m_rXX.shape, np.nan)
+        R_end = np.full(m_rXX.shape, np.nan)
+        m_end[..., -1] = mf
+        R_end[..., -1] = self.extrapolate(newcx, newcy, indy, mr, mf)
+
+        active = rxx[:, None, None]
+        idacm.append(np.where(active & indy, newcx, np.nan))
+        idacr.append(np.where(active & indy, newcy, np.nan))
+        idacm.append(np.where(active, np.where(extend, m_rXX, m_end), np.nan))
+        idacr.append(np.where(active, np.where(extend, R_rXX, R_end), np.nan))
+
+    def regions2model(self, mr):
+        pxx = (self.mc > 1) & (self.mf > 1)
+        mxx = (self.ac != 0) & (self.mf > self.mc) & (mr > self.mc)
+        rxx = (self.r != 0) & (self.mf > mr)
+        return pxx, mxx, rxx
+
+    def run_spo2ida_spo(self, mc):
+        spocm = np.zeros(mc.shape + (5, ))
+        spocr = np.zeros(mc.shape + (5, ))
+        spocm[:, 1] = 1
+        spocr[:, 1] = 1
+        spocm[:, 2] = np.minimum(mc, self.mf)
+        spocr[:, 2] = 1 + (spocm[:, 2] - 1) * self.a
+        spocm[:, 3] = np.minimum(self.mf, spocm[:, 2] - (self.r - spocr[:, 2]) / self.ac)
+        spocr[:, 3] = np.where((self.r == 0) & (self.mf > spocm[:, 3]), 0,
+                               spocr[:, 2] - (spocm[:, 3] - spocm[:, 2]) * self.ac)
+        spocr[:, 4] = self.r
+        spocm[:, 4] = self.mf
+        return spocm, spocr
+
+    @staticmethod
+    def get_last_points(idacm, idacr):
+        """
+        Gets the last two points of the IDA curves, skipping the points of inactive segments (NaN)
+        :param idacm: ndarray           Ductilities along the curves
+        :param idacr: ndarray           Strength ratios along the curves
+        :return: tuple                  Second last and last points as (mu, R)
+        """
+        idx = np.arange(idacm.shape[-1])
+        active = ~np.isnan(idacm)
+        last = np.where(active, idx, -1).max(axis=-1)
+        previous = np.where(active & (idx < last[..., None]), idx, -1).max(axis=-1)
+        return [tuple(np.take_along_axis(curve, i[..., None], axis=-1)[..., 0] for curve in (idacm, idacr))
+                for i in (previous, last)]
+
+    @staticmethod
+    def extrapolate(newcx, newcy, indy, lower, x):
+        """
+        Extrapolates the fillets linearly to a ductility, from their last two points within a region
+        :param newcx: ndarray           Ductilities along the fillets
+        :param newcy: ndarray           Strength ratios along the fillets
+        :param indy: ndarray            Points of the fillets within the region
+        :param lower: ndarray           Lower ductility bound of the region
+        :param x: ndarray               Ductility to extrapolate to
+        :return: ndarray                Strength ratios at x
+        """
+        size = newcx.shape[-1]
+        idx = np.arange(size)
+        last = np.where(indy, idx, -1).max(axis=-1)
+        previous = np.where(indy & (idx < last[..., None]), idx, -1).max(axis=-1)
+        below = np.where(newcx <= lower[..., None], idx, -1).max(axis=-1)
+        i1 = np.where(last < 0, below, np.where(last == size - 1, previous, last))
+        i2 = np.where(last < 0, below + 1, np.where(last == size - 1, last, last + 1))
+
+        x1, x2 = (np.take_along_axis(newcx, np.clip(i, 0, size - 1)[..., None], axis=-1)[..., 0] for i in (i1, i2))
+        y1, y2 = (np.take_along_axis(newcy, np.clip(i, 0, size - 1)[..., None], axis=-1)[..., 0] for i in (i1, i2))
+        return y2 + (y2 - y1) / (x2 - x1) * (x - x2)
+
+    @staticmethod
+    def compact(idacm, idacr):
+        """
+        Moves the points of inactive segments (NaN) to the end of the curves and drops the trailing padding shared by
+        all curves
+        :param idacm: ndarray           Ductilities along the curves
+        :param idacr: ndarray           Strength ratios along the curves
+        :return: ndarray, ndarray       Compacted curves
+        """
+        order = np.argsort(np.isnan(idacm), axis=-1, kind="stable")
+        idacm = np.take_along_axis(idacm, order, axis=-1)
+        idacr = np.take_along_axis(idacr, order, axis=-1)
+        npoints = np.count_nonzero(~np.isnan(idacm), axis=-1).max(initial=0)
+        return idacm[..., :npoints], idacr[..., :npoints]
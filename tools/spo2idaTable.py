@@ -0,0 +1,189 @@
+"""
+Precomputed SPO2IDA collapse capacity tables
+The R16, R50 and R84 collapse capacities are tabulated on a grid of SPO shape parameters and periods, and queries are
+answered by multilinear interpolation, without running SPO2IDA. Each query comes with an error bound, the spread of
+the tabulated values at the corners of its grid cell, which is exact for capacities monotonic within the cell.
+Queries outside the grid, or with error bounds above a tolerance, are left to the exact tool
+"""
+import itertools
+import json
+
+import numpy as np
+
+from tools.spo2ida import SPO2IDABatch
+
+# Tabulated parameters, in the order of the grid axes
+PARAMETERS = ("mc", "a", "ac", "r", "mf", "T", "pw")
+
+
+class SPO2IDATable:
+    def __init__(self, filename, exact=False, rtol=None):
+        """
+        Loads a precomputed table
+        :param filename: str                    Path of the table without extension (.npy holds the memory-mapped
+                                                capacities, .json the grid and validation errors)
+        :param exact: bool                      Accuracy flag, if True all queries are run through the exact tool
+        :param rtol: float                      Relative error bound above which queries are run through the exact
+                                                tool (optional)
+        """
+        self.filename = filename
+        self.exact = exact
+        self.rtol = rtol
+
+        with open(f"{filename}.json") as f:
+            meta = json.load(f)
+        self.axes = tuple(np.array(meta[param]) for param in PARAMETERS)
+        self.errors = meta.get("errors")
+
+        self.load()
+
+        # Statistics
+        self.hits = 0
+        self.fallbacks = 0
+
+    def __getstate__(self):
+        # The memory-mapped table is reopened, rather than copied, in worker processes
+        state = self.__dict__.copy()
+        del state["table"], state["values"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.load()
+
+    def load(self):
+        """
+        Maps the table into memory and sets up the cell corners used by the interpolation
+        :return: None
+        """
+        self.table = np.load(f"{self.filename}.npy", mmap_mode="r")
+        # Flat view of the capacities, indexed by grid point
+        self.values = np.asarray(self.table).reshape(-1, 3)
+        # Corners of the grid cells, constant parameters do not span a cell
+        self.corners = np.array(list(itertools.product(*[(0, ) if len(axis) == 1 else (0, 1) for axis in self.axes])))
+        self.strides = np.array(self.table.strides[:-1]) // self.table.strides[-2]
+
+    @staticmethod
+    def build(filename, mc, a, ac, r, mf, T, pw, chunk=100000, n_check=200, seed=0):
+        """
+        Tabulates the collapse capacities with the exact tool and stores them as a memory-mapped array
+        Parameters kept constant are given as single values, e.g. pw=1.0
+        :param filename: str                    Path of the table without extension
+        :param mc: array                        Ductilities at the end of hardening, within [1, 9]
+        :param a: array                         Hardening slopes, within [0, 0.9]
+        :param ac: array                        Negative (capping) slopes, within [0.02, 4]
+        :param r: array                         Residual plateau heights, within [0, 0.95]
+        :param mf: array                        Fracturing ductilities
+        :param T: array                         Periods in s, within [0.1, 4]
+        :param pw: array                        Pinching model weights
+        :param chunk: int                       Number of grid points evaluated at once
+        :param n_check: int                     Number of random points at which the interpolation is validated
+        :param seed: int                        Seed of the validation points
+        :return: SPO2IDATable                   Loaded table
+        """
+        axes = [np.unique(np.atleast_1d(np.asarray(axis, dtype=float))) for axis in (mc, a, ac, r, mf, T, pw)]
+        shape = tuple(len(axis) for axis in axes)
+
+        table = np.lib.format.open_memmap(f"{filename}.npy", mode="w+", dtype=np.float64, shape=shape + (3, ))
+        flat = table.reshape(-1, 3)
+        for start in range(0, flat.shape[0], chunk):
+            idx = np.unravel_index(np.arange(start, min(start + chunk, flat.shape[0])), shape)
+            params = [axis[i] for axis, i in zip(axes, idx)]
+            flat[start:start + chunk] = np.column_stack(SPO2IDABatch(*params).run_spo2ida_allT()[:3])
+        table.flush()
+
+        meta = {param: axis.tolist() for param, axis in zip(PARAMETERS, axes)}
+        with open(f"{filename}.json", "w") as f:
+            json.dump(meta, f, indent=2)
+
+        # Validate the interpolation against the exact tool at random points within the grid
+        spo2ida_table = SPO2IDATable(filename)
+        if n_check > 0:
+            rng = np.random.default_rng(seed)
+            params = [rng.uniform(axis[0], axis[-1], n_check) for axis in axes]
+            exact = np.column_stack(SPO2IDABatch(*params).run_spo2ida_allT()[:3])
+            values = np.column_stack(spo2ida_table.evaluate(*params)[:3])
+            error = np.abs(values - exact) / np.abs(exact)
+            valid = ~np.isnan(error).any(axis=1)
+            meta["errors"] = {"max": np.max(error[valid], axis=0, initial=0.).tolist(),
+                              "p95": np.percentile(error[valid], 95, axis=0).tolist() if valid.any() else None}
+            with open(f"{filename}.json", "w") as f:
+                json.dump(meta, f, indent=2)
+            spo2ida_table.errors = meta["errors"]
+
+        return spo2ida_table
+
+    def interpolate(self, params):
+        """
+        Multilinear interpolation of the tabulated capacities
+        :param params: list                     Flattened query parameters, in the order of PARAMETERS
+        :return: ndarray, ndarray, ndarray      Capacities (R16, R50, R84), error bounds and the queries within the
+                                                grid
+        """
+        inside = np.ones(params[0].shape, dtype=bool)
+        lower = np.zeros(params[0].shape + (len(self.axes), ), dtype=int)
+        weights = np.zeros(lower.shape)
+        for k, (axis, x) in enumerate(zip(self.axes, params)):
+            if len(axis) == 1:
+                # Constant parameter of the table
+                inside &= np.abs(x - axis[0]) <= 1e-9 * max(abs(axis[0]), 1.)
+                continue
+            inside &= (x >= axis[0]) & (x <= axis[-1])
+            i = np.minimum(np.maximum(np.searchsorted(axis, x, side="right") - 1, 0), len(axis) - 2)
+            lower[:, k] = i
+            weights[:, k] = (x - axis[i]) / (axis[i + 1] - axis[i])
+
+        flat = (lower[:, None, :] + self.corners) @ self.strides
+        corner_values = self.values[flat]
+        corner_weights = np.prod(np.where(self.corners, weights[:, None, :], 1 - weights[:, None, :]), axis=-1)
+
+        values = np.einsum("ij,ijk->ik", corner_weights, corner_values)
+        error = corner_values.max(axis=1) - corner_values.min(axis=1)
+        return values, error, inside
+
+    def evaluate(self, mc, a, ac, r, mf, T, pw, bounds=False):
+        """
+        Gets the collapse capacities, parameters are broadcast against each other as in SPO2IDABatch
+        :param mc: float or array               mu of end of hardening slope
+        :param a: float or array                hardening slope
+        :param ac: float or array               negative (capping) slope
+        :param r: float or array                residual plateau height, a fraction of Fy
+        :param mf: float or array               fracturing mu (end of SPO)
+        :param T: float or array                period (sec)
+        :param pw: float or array               pinching model weight
+        :param bounds: bool                     Whether to return the error bounds as well
+        :return: ndarray                        R16, R50, R84 of the shape of the parameters (and error bounds with
+                                                a trailing axis for R16, R50, R84, zero for exact queries)
+        """
+        params = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (mc, a, ac, r, mf, T, pw)))
+        shape = params[0].shape
+        params = [x.ravel() for x in params]
+
+        if self.exact:
+            values = np.full(params[0].shape + (3, ), np.nan)
+            error = np.zeros(values.shape)
+            fallback = np.ones(params[0].shape, dtype=bool)
+        else:
+            values, error, inside = self.interpolate(params)
+            fallback = ~inside | np.isnan(values).any(axis=1)
+            if self.rtol is not None:
+                fallback |= (error > self.rtol * np.abs(values)).any(axis=1)
+
+        if fallback.any():
+            values[fallback] = np.column_stack(SPO2IDABatch(*(x[fallback] for x in params)).run_spo2ida_allT()[:3])
+            error[fallback] = 0.
+
+        self.fallbacks += int(np.count_nonzero(fallback))
+        self.hits += int(fallback.size - np.count_nonzero(fallback))
+
+        R16, R50, R84 = (values[:, i].reshape(shape) for i in range(3))
+        if bounds:
+            return R16, R50, R84, error.reshape(shape + (3, ))
+        return R16, R50, R84
+
+    def get_stats(self):
+        """
+        Gets interpolation statistics
+        :return: dict                           Number of interpolated queries and of fallbacks to the exact tool
+        """
+        return {"hits": self.hits, "fallbacks": self.fallbacks}
@@ -0,0 +1,463 @@
+"""
+Structured store of the outputs written to Cache/
+A cache file is an uncompressed NumPy archive (.npz) of two members: a data block holding the arrays, the homogeneous
+lists of numbers and the columns of DataFrames and Series one after the other, and a JSON index holding the nested
+structure (dicts, lists, tuples, scalars) and the data type, shape and offset of each array in the data block. Arrays
+are only read when accessed, with a single seek, so that reading one array of a results file does not deserialise the
+whole object graph. Objects that cannot be stored as arrays are pickled into the data block
+Files written as pickles by earlier versions are read as before
+"""
+import contextlib
+import json
+import os
+import pickle
+import zipfile
+from collections.abc import Mapping, Sequence
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Members of the archive holding the JSON index and the data block, and version of the layout
+INDEX = "__index__"
+DATA = "data"
+VERSION = 1
+# Alignment of the arrays in the data block, [bytes]
+ALIGNMENT = 64
+# Lists of at least this many numbers of a single type are stored as arrays
+MIN_ARRAY_LENGTH = 8
+
+
+def is_json_scalar(value):
+    """
+    Checks whether a value is stored as is in the JSON index
+    :param value: object                    Value
+    :return: bool                           True for None, bool, int, float and str
+    """
+    return value is None or type(value) in (bool, int, float, str)
+
+
+def add_member(members, array):
+    """
+    Adds an array to the data block
+    :param members: list                    Arrays of the data block
+    :param array: ndarray                   Array
+    :return: int                            Position of the array in the data block
+    """
+    members.append(array)
+    return len(members) - 1
+
+
+def encode_pickle(value, members):
+    """
+    Encodes a value that cannot be stored as arrays, pickled into the data block
+    :param value: object                    Value
+    :param members: list                    Arrays of the data block
+    :return: dict                           Node of the index
+    """
+    return {"type": "pickle", "member": add_member(members, np.frombuffer(pickle.dumps(value), dtype=np.uint8))}
+
+
+def encode_values(values, members):
+    """
+    Encodes the values of a column or of an index
+    :param values: ndarray                  Values
+    :param members: list                    Arrays of the data block
+    :return: dict                           Node of the index
+    """
+    if isinstance(values, np.ndarray) and values.dtype.names is None and not values.dtype.hasobject:
+        return {"type": "array", "member": add_member(members, values)}
+    if isinstance(values, np.ndarray) and all(type(v) is str for v in values):
+        return {"type": "strings", "member": add_member(members, values.astype(str))}
+    return encode_pickle(values, members)
+
+
+def encode_axis(index, members):
+    """
+    Encodes an index (or the columns) of a DataFrame or Series
+    :param index: Index                     Index
+    :param members: list                    Arrays of the data block
+    :return: dict                           Node of the index
+    """
+    if not is_json_scalar(index.name) or isinstance(index, pd.MultiIndex):
+        return encode_pickle(index, members)
+    if isinstance(index, pd.RangeIndex):
+        return {"type": "range", "start": index.start, "stop": index.stop, "step": index.step, "name": index.name}
+    return {"type": "index", "values": encode_values(index.to_numpy(), members), "name": index.name}
+
+
+def encode(value, members):
+    """
+    Encodes a value, adding its arrays to the data block
+    :param value: object                    Value
+    :param members: list                    Arrays of the data block
+    :return: dict                           Node of the index
+    """
+    if is_json_scalar(value):
+        return {"type": "value", "value": value}
+
+    if isinstance(value, np.generic) and value.dtype.kind in "biuf":
+        return {"type": "scalar", "dtype": value.dtype.str, "value": value.item()}
+
+    if isinstance(value, np.ndarray) and value.dtype.names is None and not value.dtype.hasobject:
+        return {"type": "array", "member": add_member(members, value)}
+
+    if isinstance(value, pd.DataFrame):
+        columns = [encode_values(value.iloc[:, i].to_numpy(), members)
+                   if isinstance(value.dtypes.iloc[i], np.dtype) else encode_pickle(value.iloc[:, i], members)
+                   for i in range(value.shape[1])]
+        return {"type": "frame", "columns": encode_axis(value.columns, members), "data": columns,
+                "index": encode_axis(value.index, members)}
+
+    if isinstance(value, pd.Series) and isinstance(value.dtype, np.dtype) and is_json_scalar(value.name):
+        return {"type": "series", "data": encode_values(value.to_numpy(), members),
+                "index": encode_axis(value.index, members), "name": value.name}
+
+    if type(value) is dict and all(is_json_scalar(k) for k in value):
+        items = [[k, encode(v, members)] for k, v in value.items()]
+        return {"type": "dict", "items": items, "lazy": any(is_lazy(node) for _, node in items)}
+
+    if type(value) in (list, tuple):
+        # Lists of numbers of a single type
+        if type(value) is list and len(value) >= MIN_ARRAY_LENGTH and type(value[0]) in (int, float) \
+                and all(type(v) is type(value[0]) for v in value):
+            return {"type": "numbers", "member": add_member(members, np.array(value))}
+        items = [encode(v, members) for v in value]
+        return {"type": type(value).__name__, "items": items, "lazy": any(is_lazy(node) for node in items)}
+
+    return encode_pickle(value, members)
+
+
+def is_lazy(node):
+    """
+    Checks whether a node refers to arrays of the data block
+    :param node: dict                       Node of the index
+    :return: bool                           True if the node is read lazily
+    """
+    return "member" in node or node.get("lazy", False) or node["type"] in ("frame", "series")
+
+
+def read_npy_header(f, info):
+    """
+    Reads the header of an array stored without compression in a NumPy archive
+    :param f: file                                  Archive opened in binary mode
+    :param info: ZipInfo                            Member of the archive
+    :return: int, tuple, bool, dtype                Offset of the array data in the archive, shape, whether in Fortran
+                                                    order and data type
+    """
+    # Skip the local header of the member, then the header of the array
+    f.seek(info.header_offset + 26)
+    name_length, extra_length = np.frombuffer(f.read(4), dtype="<u2")
+    f.seek(info.header_offset + 30 + int(name_length) + int(extra_length))
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+    return f.tell(), shape, fortran_order, dtype
+
+
+def write_cache(filepath, data):
+    """
+    Writes a cache file
+    :param filepath: str                    Filepath, e.g. "Cache/lossCurve.npz"
+    :param data: object                     Data to be stored
+    :return: None
+    """
+    filepath = Path(filepath)
+    members = []
+    root = encode(data, members)
+
+    # Offsets of the arrays in the data block
+    arrays = []
+    size = 0
+    for array in members:
+        offset = -(-size // ALIGNMENT) * ALIGNMENT
+        arrays.append({"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset})
+        size = offset + array.nbytes
+    index = json.dumps({"version": VERSION, "arrays": arrays, "root": root}).encode()
+
+    # Written under a temporary name first, so that an interrupted run leaves no partial file behind. The data block
+    # is streamed array by array
+    tmp = filepath.with_name(f"{filepath.name}.{os.getpid()}.tmp")
+    with zipfile.ZipFile(tmp, "w", zipfile.ZIP_STORED) as archive:
+        with archive.open(f"{INDEX}.npy", "w") as f:
+            np.lib.format.write_array(f, np.frombuffer(index, dtype=np.uint8))
+        with archive.open(f"{DATA}.npy", "w", force_zip64=True) as f:
+            np.lib.format.write_array_header_1_0(f, {"descr": "|u1", "fortran_order": False, "shape": (size, )})
+            position = 0
+            for array, entry in zip(members, arrays):
+                f.write(bytes(entry["offset"] - position))
+                f.write(np.ascontiguousarray(array).reshape(-1).view(np.uint8).data)
+                position = entry["offset"] + array.nbytes
+    os.replace(tmp, filepath)
+
+
+class CacheFile:
+    def __init__(self, filepath):
+        """
+        Opens a cache file, only the index is read
+        :param filepath: str                    Filepath of the .npz cache file
+        """
+        self.filepath = Path(filepath)
+        self.file = open(self.filepath, "rb")
+        try:
+            with zipfile.ZipFile(self.file) as archive:
+                with archive.open(f"{INDEX}.npy") as f:
+                    index = json.loads(np.lib.format.read_array(f).tobytes().decode())
+                if index.get("version") != VERSION:
+                    raise ValueError(f"[EXCEPTION] Unsupported cache file version: {self.filepath}!")
+                self.offset = read_npy_header(self.file, archive.getinfo(f"{DATA}.npy"))[0]
+        except Exception:
+            self.file.close()
+            raise
+        self.arrays = index["arrays"]
+        self.index = index["root"]
+        # Arrays read so far
+        self.members = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        return False
+
+    def close(self):
+        self.file.close()
+
+    def read_member(self, i):
+        """
+        Reads an array of the data block, once: as with a dict, the same array is returned on each access
+        :param i: int                           Position of the array in the data block
+        :return: ndarray                        Array
+        """
+        if i not in self.members:
+            entry = self.arrays[i]
+            dtype = np.dtype(entry["dtype"])
+            buffer = bytearray(dtype.itemsize * int(np.prod(entry["shape"], dtype=np.int64)))
+            self.file.seek(self.offset + entry["offset"])
+            if self.file.readinto(buffer) != len(buffer):
+                raise ValueError(f"[EXCEPTION] Truncated cache file: {self.filepath}!")
+            self.members[i] = np.frombuffer(buffer, dtype=dtype).reshape(entry["shape"])
+        return self.members[i]
+
+    def get_root(self):
+        """
+        Gets the stored data, containers holding arrays are read lazily
+        :return: object                         Data, LazyDict or LazyList for the containers holding arrays
+        """
+        return self.decode(self.index)
+
+    def load(self):
+        """
+        Reads all the stored data
+        :return: object                         Data
+        """
+        return self.decode(self.index, lazy=False)
+
+    def decode_axis(self, node):
+        if node["type"] == "range":
+            return pd.RangeIndex(node["start"], node["stop"], node["step"], name=node["name"])
+        if node["type"] == "pickle":
+            return self.decode(node)
+        return pd.Index(self.decode(node["values"]), name=node["name"])
+
+    def decode_frame(self, node, columns=None):
+        """
+        Reads a DataFrame, or some of its columns
+        :param node: dict                       Node of the index
+        :param columns: list                    Names of the columns to read. If None, all
+        :return: DataFrame                      DataFrame
+        """
+        names = self.decode_axis(node["columns"])
+        positions = range(len(names)) if columns is None else [names.get_loc(column) for column in columns]
+        index = self.decode_axis(node["index"])
+        frame = pd.DataFrame({i: self.decode(node["data"][p]) for i, p in enumerate(positions)}, index=index)
+        frame.columns = names[list(positions)]
+        return frame
+
+    def decode(self, node, lazy=True):
+        """
+        Decodes a node of the index
+        :param node: dict                       Node of the index
+        :param lazy: bool                       Whether containers holding arrays are read lazily
+        :return: object                         Value
+        """
+        kind = node["type"]
+        if kind == "value":
+            return node["value"]
+        if kind == "scalar":
+            return np.dtype(node["dtype"]).type(node["value"])
+        if kind == "array":
+            return self.read_member(node["member"])
+        if kind == "strings":
+            return self.read_member(node["member"]).astype(object)
+        if kind == "numbers":
+            return self.read_member(node["member"]).tolist()
+        if kind == "pickle":
+            return pickle.loads(self.read_member(node["member"]).tobytes())
+        if kind == "frame":
+            return self.decode_frame(node)
+        if kind == "series":
+            return pd.Series(self.decode(node["data"]), index=self.decode_axis(node["index"]), name=node["name"])
+        if kind == "dict":
+            if lazy and node["lazy"]:
+                return LazyDict(self, node)
+            return {k: self.decode(v, lazy) for k, v in node["items"]}
+        if kind in ("list", "tuple"):
+            if lazy and node["lazy"]:
+                return LazyList(self, node)
+            items = [self.decode(v, lazy) for v in node["items"]]
+            return items if kind == "list" else tuple(items)
+        raise ValueError(f"[EXCEPTION] Unknown node of cache file {self.filepath}: {kind}!")
+
+
+class LazyContainer:
+    """
+    Container of a cache file, whose values are read when accessed. The file is kept open until the container is
+    closed, either with close() or by using it as a context manager
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        return False
+
+    def close(self):
+        """
+        Closes the cache file, values not read so far can no longer be accessed
+        :return: None
+        """
+        self.cache.close()
+
+
+class LazyDict(LazyContainer, Mapping):
+    def __init__(self, cache, node):
+        """
+        Dict of a cache file, whose values are read when accessed
+        :param cache: CacheFile                 Cache file
+        :param node: dict                       Node of the index
+        """
+        self.cache = cache
+        self.nodes = {k: v for k, v in node["items"]}
+
+    def __getitem__(self, key):
+        return self.cache.decode(self.nodes[key])
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __repr__(self):
+        return f"LazyDict({list(self.nodes)})"
+
+    def get_frame(self, key, columns=None):
+        """
+        Reads some of the columns of a DataFrame
+        :param key: str                         Key of the DataFrame
+        :param columns: list                    Names of the columns to read. If None, all
+        :return: DataFrame                      DataFrame
+        """
+        if self.nodes[key]["type"] != "frame":
+            raise ValueError(f"[EXCEPTION] {key} is not a DataFrame!")
+        return self.cache.decode_frame(self.nodes[key], columns)
+
+    def load(self):
+        """
+        Reads all values
+        :return: dict                           Data
+        """
+        return {k: self.cache.decode(v, lazy=False) for k, v in self.nodes.items()}
+
+
+class LazyList(LazyContainer, Sequence):
+    def __init__(self, cache, node):
+        """
+        List or tuple of a cache file, whose items are read when accessed
+        :param cache: CacheFile                 Cache file
+        :param node: dict                       Node of the index
+        """
+        self.cache = cache
+        self.nodes = node["items"]
+        self.kind = node["type"]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.cache.decode(node) for node in self.nodes[i]]
+        return self.cache.decode(self.nodes[i])
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __repr__(self):
+        return f"LazyList({self.kind}, {len(self.nodes)} items)"
+
+    def load(self):
+        """
+        Reads all items
+        :return: list or tuple                  Data
+        """
+        items = [self.cache.decode(node, lazy=False) for node in self.nodes]
+        return items if self.kind == "list" else tuple(items)
+
+
+def get_cache_filename(filepath):
+    """
+    Gets the file of a cache entry given with or without extension, the structured store is preferred to pickles
+    :param filepath: str                    Filepath, e.g. "Cache/lossCurve" or "Cache/lossCurve.pickle"
+    :return: Path                           Filepath
+    """
+    filepath = Path(filepath)
+    if filepath.suffix in (".npz", ".pickle", ".pkl"):
+        return filepath
+    for suffix in (".npz", ".pickle", ".pkl"):
+        if Path(f"{filepath}{suffix}").is_file():
+            return Path(f"{filepath}{suffix}")
+    raise ValueError(f"[EXCEPTION] Cache file not found: {filepath}!")
+
+
+def read_cache(filepath, lazy=True):
+    """
+    Reads a cache file
+    :param filepath: str                    Filepath, with or without extension (.npz, or .pickle written by earlier
+                                            versions)
+    :param lazy: bool                       Whether arrays are read when accessed (.npz only), otherwise all data is
+                                            read at once
+    :return: object                         Data, dicts and lists holding arrays as LazyDict and LazyList if lazy,
+                                            which keep the file open until closed (see open_cache)
+    """
+    filepath = get_cache_filename(filepath)
+    if filepath.suffix != ".npz":
+        with open(filepath, "rb") as f:
+            return pickle.load(f)
+
+    if lazy:
+        cache = CacheFile(filepath)
+        data = cache.get_root()
+        # The file is kept open by the lazy containers only
+        if not isinstance(data, (LazyDict, LazyList)):
+            cache.close()
+        return data
+    with CacheFile(filepath) as cache:
+        return cache.load()
+
+
+@contextlib.contextmanager
+def open_cache(filepath):
+    """
+    Reads a cache file lazily, the file is closed on exit
+    with open_cache("Cache/modelOutputs") as data:
+        spo = data["SPO"]["x"]
+    :param filepath: str                    Filepath, with or without extension
+    :return: object                         Data, as returned by read_cache
+    """
+    data = read_cache(filepath)
+    try:
+        yield data
+    finally:
+        if isinstance(data, LazyContainer):
+            data.close()
@@ -3,6 +3,7 @@ Utility functions for IPBSD
 """
 import timeit
 import os
+import zipfile
 import numpy as np
 import pickle
 import json
@@ -11,6 +12,8 @@ from numpy.linalg import lstsq
 import pandas as pd
 from colorama import Fore
 
+from utils.cache_store import read_npy_header, write_cache
+
 
 def get_init_time():
     """
@@ -81,7 +84,7 @@ def export_results(filepath, data, filetype):
     Store results in the database
     :param filepath: str                            Filepath, e.g. "directory/name"
     :param data:                                    Data to be stored
-    :param filetype: str                            Filetype, e.g. npy, json, pkl, csv
+    :param filetype: str                            Filetype, e.g. npy, json, pkl, csv, npz (cache store)
     :return: None
     """
     if filetype == "npy":
@@ -94,6 +97,29 @@ def export_results(filepath, data, filetype):
             json.dump(data, json_file)
     elif filetype == "csv":
         data.to_csv(f"{filepath}.csv", index=False)
+    elif filetype == "npz":
+        write_cache(f"{filepath}.npz", data)
+
+
+def load_npz(filepath, mmap=True):
+    """
+    Loads a NumPy archive, memory mapping the members stored without compression
+    :param filepath: str                            Filepath of the .npz archive
+    :param mmap: bool                               Memory map the members (read-only), or read them into memory
+    :return: dict                                   Arrays of the archive by name
+    """
+    data = {}
+    with zipfile.ZipFile(filepath) as archive, open(filepath, "rb") as f:
+        for info in archive.infolist():
+            name = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            if not mmap or info.compress_type != zipfile.ZIP_STORED:
+                with archive.open(info) as member:
+                    data[name] = np.lib.format.read_array(member)
+                continue
+            offset, shape, fortran_order, dtype = read_npy_header(f, info)
+            data[name] = np.memmap(filepath, dtype=dtype, mode="r", offset=offset, shape=shape,
+                                   order="F" if fortran_order else "C")
+    return data
 
 
 def geo_mean(iterable):
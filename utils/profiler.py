@@ -0,0 +1,215 @@
+"""
+Instrumentation of IPBSD: wall and CPU times of the framework stages and iteration phases, and counters of the
+expensive calls (fsolve, OpenSees model builds, eigen-solves, M-phi evaluations)
+Profiling is disabled by default, in which case spans and counters reduce to a check of a global. When enabled, the
+records are exported as a JSON summary or as a Chrome trace (chrome://tracing, Perfetto)
+Only the calls of the process in which profiling is enabled are recorded, not those of worker processes
+"""
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+# Active profiler, None if profiling is disabled
+PROFILER = None
+
+
+class Span:
+    def __init__(self, profiler, name, category):
+        """
+        Timed section of code, used as a context manager
+        :param profiler: Profiler                   Profiler recording the span
+        :param name: str                            Name of the span
+        :param category: str                        Category, e.g. stage or iteration
+        """
+        self.profiler = profiler
+        self.name = name
+        self.category = category
+        self.wall = None
+        self.cpu = None
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        return self
+
+    def __exit__(self, *args):
+        self.profiler.record(self.name, self.category, self.wall, time.perf_counter() - self.wall,
+                             time.process_time() - self.cpu)
+        return False
+
+
+class NullSpan:
+    # Span of a disabled profiler, does nothing
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Profiler:
+    def __init__(self):
+        """
+        Initializes the profiler
+        """
+        self.start = time.perf_counter()
+        self.events = []
+        self.counters = defaultdict(int)
+
+    def span(self, name, category="stage"):
+        """
+        Creates a timed span
+        :param name: str                            Name of the span
+        :param category: str                        Category, e.g. stage or iteration
+        :return: Span                               Span, to be used as a context manager
+        """
+        return Span(self, name, category)
+
+    def record(self, name, category, start, wall, cpu):
+        """
+        Records a span
+        :param name: str                            Name of the span
+        :param category: str                        Category
+        :param start: float                         Start time, [s]
+        :param wall: float                          Wall time, [s]
+        :param cpu: float                           CPU time of the process, [s]
+        :return: None
+        """
+        self.events.append({"name": name, "category": category, "start": start - self.start, "wall": wall,
+                            "cpu": cpu, "tid": threading.get_ident()})
+
+    def count(self, name, n=1):
+        """
+        Increments a counter
+        :param name: str                            Name of the counter
+        :param n: int                               Increment
+        :return: None
+        """
+        self.counters[name] += n
+
+    def get_summary(self):
+        """
+        Gets the total wall and CPU times of the spans, by name, and the counters
+        :return: dict                               Summary
+        """
+        spans = {}
+        for event in self.events:
+            span = spans.setdefault(event["name"], {"category": event["category"], "calls": 0, "wall": 0., "cpu": 0.})
+            span["calls"] += 1
+            span["wall"] += event["wall"]
+            span["cpu"] += event["cpu"]
+        return {"total": time.perf_counter() - self.start, "spans": spans, "counters": dict(self.counters)}
+
+    def get_trace(self):
+        """
+        Gets the records in the Chrome trace event format, times in microseconds
+        :return: dict                               Trace
+        """
+        pid = os.getpid()
+        events = [{"name": event["name"], "cat": event["category"], "ph": "X", "ts": event["start"] * 1e6,
+                   "dur": event["wall"] * 1e6, "pid": pid, "tid": event["tid"], "args": {"cpu": event["cpu"]}}
+                  for event in self.events]
+        events.append({"name": "counters", "ph": "C", "ts": (time.perf_counter() - self.start) * 1e6, "pid": pid,
+                       "args": dict(self.counters)})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, filename, filetype="json"):
+        """
+        Exports the records
+        :param filename: str                        File name
+        :param filetype: str                        "json": summary and spans
+                                                    "chrome": Chrome trace
+        :return: None
+        """
+        if filetype == "json":
+            data = {**self.get_summary(), "events": self.events}
+        elif filetype == "chrome":
+            data = self.get_trace()
+        else:
+            raise ValueError("[EXCEPTION] Wrong profile file type! filetype must be 'json' or 'chrome'!")
+        with open(filename, "w") as f:
+            json.dump(data, f, indent=2)
+
+
+def enable():
+    """
+    Enables profiling, with a new profiler
+    :return: Profiler                               Active profiler
+    """
+    global PROFILER
+    PROFILER = Profiler()
+    return PROFILER
+
+
+def disable():
+    """
+    Disables profiling
+    :return: Profiler                               Profiler that was active, if any
+    """
+    global PROFILER
+    profiler, PROFILER = PROFILER, None
+    return profiler
+
+
+def profile(name, category="stage"):
+    """
+    Times a section of code, e.g. with profile("spectra"): ...
+    :param name: str                                Name of the span
+    :param category: str                            Category, e.g. stage or iteration
+    :return: Span                                   Context manager
+    """
+    if PROFILER is None:
+        return NULL_SPAN
+    return PROFILER.span(name, category)
+
+
+def count(name, n=1):
+    """
+    Increments a counter of the active profiler, if any
+    :param name: str                                Name of the counter
+    :param n: int                                   Increment
+    :return: None
+    """
+    if PROFILER is not None:
+        PROFILER.counters[name] += n
+
+
+def profiled(name=None, category="stage"):
+    """
+    Decorator timing each call of a function
+    :param name: str                                Name of the span (name of the function if None)
+    :param category: str                            Category, e.g. stage or iteration
+    :return: callable                               Decorator
+    """
+    def decorator(function):
+        span_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if PROFILER is None:
+                return function(*args, **kwargs)
+            with PROFILER.span(span_name, category):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def counted(function, name):
+    """
+    Wraps a function, counting its calls
+    :param function: callable                       Function, e.g. scipy.optimize.fsolve
+    :param name: str                                Name of the counter
+    :return: callable                               Wrapped function
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if PROFILER is not None:
+            PROFILER.counters[name] += 1
+        return function(*args, **kwargs)
+    return wrapper
@@ -3,37 +3,19 @@ import pandas as pd
 
 
 def spline(cp_mu, cp_R):
+    """
+    Fillets a polyline by repeated corner cutting of its control points in log space
+    Control points may be batched along leading axes, the fillet is applied along the last axis
+    :param cp_mu: list or ndarray           Control points of ductility (log)
+    :param cp_R: list or ndarray            Control points of strength ratio (log)
+    :return: ndarray, ndarray               Ductility and strength ratio along the fillet
+    """
     N = [4, 6, 10, 18, 34]
-    mu_d = []
-    R_d = []
+    cp_mu = np.asarray(cp_mu, dtype=float)
+    cp_R = np.asarray(cp_R, dtype=float)
     for j in range(0, len(N)):
-        for ele in cp_mu:
-            mu_d.append(ele)
-            mu_d.append(ele)
-        mu_d_av = np.array(mu_d)
-
-        for i in range(1, len(mu_d)):
-            mu_d_av[i] = (mu_d[i] + mu_d[i - 1]) / 2
-
-        mu_d_av2 = np.array(mu_d_av)
-        for i in range(1, len(mu_d_av)):
-            mu_d_av2[i] = (mu_d_av[i] + mu_d_av[i - 1]) / 2
-        cp_mu = mu_d_av2[-N[j]:]
-        mu_d = []
-
-        for ele in cp_R:
-            R_d.append(ele)
-            R_d.append(ele)
-        R_d_av = np.array(R_d)
-
-        for i in range(1, len(R_d)):
-            R_d_av[i] = (R_d[i] + R_d[i - 1]) / 2
-        R_d_av2 = np.array(R_d_av)
-
-        for i in range(1, len(R_d_av)):
-            R_d_av2[i] = (R_d_av[i] + R_d_av[i - 1]) / 2
-        cp_R = R_d_av2[-N[j]:]
-        R_d = []
+        cp_mu = cut_corners(cp_mu)[..., -N[j]:]
+        cp_R = cut_corners(cp_R)[..., -N[j]:]
 
     # ductility and R factor
     mu = np.exp(cp_mu)
@@ -41,6 +23,20 @@ def spline(cp_mu, cp_R):
     return mu, R
 
 
+def cut_corners(points):
+    """
+    Doubles the control points and averages consecutive points twice
+    :param points: ndarray                  Control points along the last axis
+    :return: ndarray                        Refined control points
+    """
+    doubled = np.repeat(points, 2, axis=-1)
+    for _ in range(2):
+        averaged = doubled.copy()
+        averaged[..., 1:] = (doubled[..., 1:] + doubled[..., :-1]) / 2
+        doubled = averaged
+    return doubled
+
+
 def read_spo_data(filename):
     """
     spo parameters, initial assumption for the definition of the backbone curve
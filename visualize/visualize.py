@@ -2,9 +2,9 @@ import matplotlib
 import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
-import pickle
 from pathlib import Path
 
+from utils.cache_store import open_cache, read_cache
 from utils.ipbsd_utils import create_folder
 from utils.utils_plotter import *
 
@@ -33,18 +33,16 @@ class Visualize:
     def plot_loss_curve(self, filename):
         """
         Plots the loss curves
-        :param filename: str                    Loss curve path
+        :param filename: str                    Loss curve cache file (.npz or .pickle, or without extension)
         :return: None
         """
-        with open(filename, "rb") as f:
-            data = pickle.load(f)
-
-        y = data["y"]
-        y_fit = data["y_fit"]
-        lam = data["mafe"]
-        lam_fit = data["mafe_fit"]
-        eal = data["eal"]
-        PLS = data["PLS"]
+        with open_cache(filename) as data:
+            y = data["y"]
+            y_fit = data["y_fit"]
+            lam = data["mafe"]
+            lam_fit = data["mafe_fit"]
+            eal = data["eal"]
+            PLS = data["PLS"]
 
         fig, ax = plt.subplots(figsize=(4, 3), dpi=100)
         plt.plot(y, lam, 'b')
@@ -133,17 +131,15 @@ class Visualize:
         :param direction: int                   Direction of interest, 0 or 1
         :return: None
         """
-        with open(filename, "rb") as f:
-            data = pickle.load(f)
-
         spectrum = pd.read_csv(spectrum_filename)
 
         # Reading the information
         d = "x" if direction == 0 else "y"
-        say = data["cy"]
-        dy = data["dy"][direction]
-        period_range = data["Period range"][d]
-        muc = data["spo2ida"][d]["mc"]
+        with open_cache(filename) as data:
+            say = data["cy"]
+            dy = data["dy"][direction]
+            period_range = data["Period range"][d]
+            muc = data["spo2ida"][d]["mc"]
 
         # Initial secant to yield period
         T1 = 2 * np.pi * (dy / say / 9.81) ** 0.5
@@ -263,19 +259,19 @@ class Visualize:
         """
         d = "x" if direction == 0 else "y"
 
-        with open(filename, "rb") as f:
-            data = pickle.load(f)
-
-        data = data[d]
+        # All of the outputs of the direction are plotted
+        data = read_cache(filename, lazy=False)[d]
         R16 = data["R16"]
         R50 = data["R50"]
         R84 = data["R84"]
 
         fig, ax = plt.subplots(figsize=(5, 3), dpi=100)
         plt.plot(data["spom"], data["spor"], color=self.grayscale[0], label="SPO")
-        plt.plot(data["idacm"][0], data["idacr"][0], color=self.grayscale[2], label=r"IDA, $84^{th}$ percentile")
-        plt.plot(data["idacm"][1], data["idacr"][1], color=self.grayscale[4], label=r"IDA, $50^{th}$ percentile")
-        plt.plot(data["idacm"][2], data["idacr"][2], color=self.grayscale[6], label=r"IDA, $16^{th}$ percentile")
+        # IDA curves are not available if the collapse capacities were read from a precomputed table
+        if data["idacm"] is not None:
+            plt.plot(data["idacm"][0], data["idacr"][0], color=self.grayscale[2], label=r"IDA, $84^{th}$ percentile")
+            plt.plot(data["idacm"][1], data["idacr"][1], color=self.grayscale[4], label=r"IDA, $50^{th}$ percentile")
+            plt.plot(data["idacm"][2], data["idacr"][2], color=self.grayscale[6], label=r"IDA, $16^{th}$ percentile")
         plt.scatter([data["spom"][-1]] * 3, [R16, R50, R84], color="k", label="Collapse capacity")
 
         plt.xlabel(r"Ductility, $\mu$", fontsize=self.FONTSIZE)
@@ -283,7 +279,7 @@ class Visualize:
         plt.grid(True, which="major", axis='both', ls="--", lw=1.0)
         plt.grid(True, which="minor", axis='both', ls="--", lw=0.5)
         plt.xlim([0, int(max(data["spom"])) + 3])
-        plt.ylim([0, int(max(data["idacr"][0])) + 2])
+        plt.ylim([0, int(max(data["idacr"][0]) if data["idacm"] is not None else R84) + 2])
         plt.rc('xtick', labelsize=self.FONTSIZE)
         plt.rc('ytick', labelsize=self.FONTSIZE)
         plt.legend(frameon=False, loc='upper right', bbox_to_anchor=(1.7, 1), fontsize=self.FONTSIZE)
@@ -336,46 +332,42 @@ class Visualize:
         :param direction: str
         :return: None
         """
-        if solution_filename is not None:
-            with open(solution_filename, "rb") as f:
-                sol = pickle.load(f)
-        if spo2ida_filename is not None:
-            with open(spo2ida_filename, "rb") as f:
-                spo2ida = pickle.load(f)
-
-        with open(filename, "rb") as f:
-            data = pickle.load(f)
-
         # IPBSD outputs
-        if sol is not None:
+        if solution_filename is not None:
             d = 0 if direction == "x" else 1
-            # Yield Sa (SDOF) (used for designing the structure), reference value
-            cy = sol["cy"]
-            # Yield Sa (MDOF) including overstrength factor
-            say = cy * sol["overstrength"][d] * sol["part_factor"][d]
-            # Yield displacement (MDOF)
-            dy = sol["dy"][d] * sol["overstrength"][d] * sol["part_factor"][d]
-            # Yield base shear
-            Vy = 9.81 * sol["Mstar"][d] * say
-            period = 2 * np.pi * np.sqrt(sol["dy"][d] / cy / 9.81)
+            with open_cache(solution_filename) as sol:
+                # Yield Sa (SDOF) (used for designing the structure), reference value
+                cy = sol["cy"]
+                # Yield Sa (MDOF) including overstrength factor
+                say = cy * sol["overstrength"][d] * sol["part_factor"][d]
+                # Yield displacement (MDOF)
+                dy = sol["dy"][d] * sol["overstrength"][d] * sol["part_factor"][d]
+                # Yield base shear
+                Vy = 9.81 * sol["Mstar"][d] * say
+                period = 2 * np.pi * np.sqrt(sol["dy"][d] / cy / 9.81)
             print(f"[PERIOD] {period:.2f}")
 
-        # Nonlinear model outputs
-        try:
-            model = data["SPO"][direction]
-            spo = data["SPO_idealized"][direction]
-        except:
-            model = data["SPO"]
-            spo = data["SPO_idealized"]
+        if spo2ida_filename is not None and solution_filename is not None:
+            with open_cache(spo2ida_filename) as spo2ida:
+                spom = spo2ida[direction]["spom"]
+                spor = spo2ida[direction]["spor"]
+
+        # Nonlinear model outputs, read before the file is closed
+        with open_cache(filename) as data:
+            try:
+                model = list(data["SPO"][direction])
+                spo = list(data["SPO_idealized"][direction])
+            except:
+                model = list(data["SPO"])
+                spo = list(data["SPO_idealized"])
 
         fig, ax = plt.subplots(figsize=(4, 3), dpi=100)
         plt.plot(spo[0] * 100, spo[1], color=self.grayscale[0], label="Idealized shape")
         plt.plot(model[0] * 100, model[1], color=self.grayscale[-2], label="Nonlinear model")
 
-        if spo2ida is not None and sol is not None:
+        if spo2ida_filename is not None and solution_filename is not None:
             # Plotting the SPO2IDA shape
-            plt.plot(spo2ida[direction]["spom"] * dy * 100, spo2ida[direction]["spor"] * Vy * n_seismic,
-                     color="r", ls="--", label="Design")
+            plt.plot(spom * dy * 100, spor * Vy * n_seismic, color="r", ls="--", label="Design")
 
         plt.xlabel("Top displacement [cm] ", fontsize=self.FONTSIZE)
         plt.ylabel('Base shear [kN]', fontsize=self.FONTSIZE)
@@ -399,11 +391,11 @@ if __name__ == "__main__":
     export_dir = path / "sample/figs"
     create_folder(export_dir)
 
-    loss_curve = path / "sample/sample1/Cache/lossCurve.pickle"
+    loss_curve = path / "sample/sample1/Cache/lossCurve"
     spectrum = path / "sample/sample1/Cache/sls_spectrum.csv"
-    solution = path / "sample/sample1/Cache/ipbsd.pickle"
-    spo2ida = path / "sample/sample1/Cache/spoAnalysisCurveShape.pickle"
-    spo_model = path / "sample/sample1/Cache/modelOutputs.pickle"
+    solution = path / "sample/sample1/Cache/ipbsd"
+    spo2ida = path / "sample/sample1/Cache/spoAnalysisCurveShape"
+    spo_model = path / "sample/sample1/Cache/modelOutputs"
     n_seismic = 1
     direction = "x"
 